@@ -3,6 +3,8 @@ import calendar
 import numpy as np
 import pandas as pd
 
+import GraffitiAnalysis.columns as grafcolumns
+
 # XXX: do we do something special with the timestamps in the *_to_dataframe()
 #      routines?
 
@@ -56,6 +58,38 @@ def correct_photo_timestamp( timestamp, remove=False ):
 
     return timestamp
 
+def _columns_to_dataframe( columns, column_names ):
+    """
+    Wraps a ColumnStore's columns in a Pandas DataFrame indexed by the
+    records' identifiers.  Numeric columns are not copied, and categorical
+    columns are wrapped around the store's codes.
+
+    Takes 2 arguments:
+
+      columns      - ColumnStore whose columns are wrapped.
+      column_names - List of column names to include in the DataFrame.  The
+                     first must be "id", which becomes the index.
+
+    Returns 1 value:
+
+      df - A DataFrame object with len( columns ) many rows.
+
+    """
+
+    arrays = columns.get_columns()
+
+    data = dict()
+    for column_name in column_names[1:]:
+        if column_name in columns.categories:
+            data[column_name] = pd.Categorical.from_codes( arrays[column_name],
+                                                           categories=columns.categories[column_name] )
+        else:
+            data[column_name] = arrays[column_name]
+
+    return pd.DataFrame( data,
+                         index=pd.Index( arrays["id"], name="id" ),
+                         copy=False )
+
 def photos_to_dataframe( photos ):
     """
     Converts a list of PhotoRecord objects into a Pandas DataFrame.  Each
@@ -63,9 +97,14 @@ def photos_to_dataframe( photos ):
     row in the DataFrame also includes a reference to the PhotoRecord object
     it is derived from.
 
+    The photos may also be supplied in columnar form (see
+    Database.get_photo_columns()), in which case the DataFrame is built
+    without visiting each record and shares memory with the columns.
+
     Takes 1 argument:
 
-      photos - A list of PhotoRecord objects to convert.
+      photos - A list of PhotoRecord objects to convert, or a ColumnStore
+               containing them.
 
     Returns 1 value:
 
@@ -91,6 +130,14 @@ def photos_to_dataframe( photos ):
                      "tags",
                      "record"]
 
+    # wrap the columns we were given.
+    if isinstance( photos, grafcolumns.ColumnStore ):
+        photos_df = _columns_to_dataframe( photos, photo_columns )
+        photos_df["state"] = photos_df["state"].cat.set_categories( photo_states,
+                                                                    ordered=True )
+
+        return photos_df
+
     # create a list of tuples containing the contents of the PhotoRecords.
     photo_tuples = []
     for photo in photos:
@@ -138,9 +185,17 @@ def arts_to_dataframe( arts, photos_df=None ):
     PhotoRecord object it is derived from as well as Pandas Series object
     representing the parent PhotoRecord's information.
 
-    Takes 1 argument:
+    The art may also be supplied in columnar form (see
+    Database.get_art_columns()), in which case the DataFrame is built without
+    visiting each record and shares memory with the columns.
 
-      arts - A list of ArtRecord objects to convert.
+    Takes 2 arguments:
+
+      arts      - A list of ArtRecord objects to convert, or a ColumnStore
+                  containing them.
+      photos_df - Optional DataFrame of the parent PhotoRecords, see
+                  photos_to_dataframe().  If omitted, the photo_series column
+                  is None.
 
     Returns 1 value:
 
@@ -198,6 +253,29 @@ def arts_to_dataframe( arts, photos_df=None ):
                    "photo_series",
                    "record"]
 
+    # wrap the columns we were given.
+    if isinstance( arts, grafcolumns.ColumnStore ):
+        arts_df = _columns_to_dataframe( arts,
+                                         [column for column in art_columns if column != "photo_series"] )
+
+        # we can't provide Series information if we weren't handed a
+        # DataFrame.
+        if photos_df is None:
+            arts_df.insert( len( art_columns ) - 3, "photo_series", None )
+        else:
+            arts_df.insert( len( art_columns ) - 3,
+                            "photo_series",
+                            [photos_df.loc[photo_id] for photo_id in arts.get_columns()["photo_id"]] )
+
+        for column, categories in [("type",    art_types),
+                                   ("size",    art_sizes),
+                                   ("quality", art_qualities),
+                                   ("state",   art_states)]:
+            arts_df[column] = arts_df[column].cat.set_categories( categories,
+                                                                  ordered=True )
+
+        return arts_df
+
     # create a list of tuples containing the contents of the PhotoRecords.
     art_tuples = []
     for art in arts:
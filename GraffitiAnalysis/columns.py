@@ -0,0 +1,349 @@
+import numpy as np
+
+# kinds of columns held by a ColumnStore and the NumPy types that store them.
+# categorical columns store codes into a list of categories, with -1
+# representing a missing value.
+_COLUMN_DTYPES = { "category": np.int16,
+                   "float":    np.float64,
+                   "int":      np.int64,
+                   "object":   object }
+
+def _get_component( index ):
+    """
+    Creates a conversion function that extracts one component of a sequence,
+    or NaN if the sequence is missing.
+
+    Takes 1 argument:
+
+      index - Index of the component to extract.
+
+    Returns 1 value:
+
+      convert - Function taking a sequence, or None, and returning a float.
+
+    """
+
+    def convert( value ):
+        return np.nan if value is None else value[index]
+
+    return convert
+
+def _get_pair( value ):
+    """
+    Converts a location into the (latitude, longitude) tuple used by photo
+    DataFrames.
+
+    Takes 1 argument:
+
+      value - Location sequence, or None.
+
+    Returns 1 value:
+
+      pair - Tuple of (latitude, longitude), with NaNs for a missing
+             location.
+
+    """
+
+    return (np.nan, np.nan) if value is None else (value[0], value[1])
+
+def _identity( value ):
+    """
+    Returns the supplied value unchanged.
+    """
+
+    return value
+
+# columns held for PhotoRecords.  each entry is (column name, record key,
+# kind, conversion from the key's value to the column's value).  the special
+# key None stores the record itself.
+PHOTO_COLUMNS = [("id",            "id",            "int",      _identity),
+                 ("filename",      "filename",      "object",   _identity),
+                 ("state",         "state",         "category", _identity),
+                 ("location",      "location",      "object",   _get_pair),
+                 ("latitude",      "location",      "float",    _get_component( 0 )),
+                 ("longitude",     "location",      "float",    _get_component( 1 )),
+                 ("width",         "resolution",    "float",    _get_component( 0 )),
+                 ("height",        "resolution",    "float",    _get_component( 1 )),
+                 ("rotation",      "rotation",      "int",      _identity),
+                 ("created_time",  "created_time",  "float",    _identity),
+                 ("modified_time", "modified_time", "float",    _identity),
+                 ("photo_time",    "photo_time",    "float",    _identity),
+                 ("tags",          "tags",          "object",   _identity),
+                 ("record",        None,            "object",   _identity)]
+
+# columns held for ArtRecords.  see PHOTO_COLUMNS for the structure.
+ART_COLUMNS = [("id",            "id",            "int",      _identity),
+               ("photo_id",      "photo_id",      "int",      _identity),
+               ("type",          "type",          "category", _identity),
+               ("size",          "size",          "category", _identity),
+               ("quality",       "quality",       "category", _identity),
+               ("state",         "state",         "category", _identity),
+               ("region",        "region",        "object",   _identity),
+               ("region_x",      "region",        "float",    _get_component( 0 )),
+               ("region_y",      "region",        "float",    _get_component( 1 )),
+               ("region_width",  "region",        "float",    _get_component( 2 )),
+               ("region_height", "region",        "float",    _get_component( 3 )),
+               ("tags",          "tags",          "object",   _identity),
+               ("created_time",  "created_time",  "float",    _identity),
+               ("modified_time", "modified_time", "float",    _identity),
+               ("date",          "date",          "object",   _identity),
+               ("artists",       "artists",       "object",   _identity),
+               ("associates",    "associates",    "object",   _identity),
+               ("vandals",       "vandals",       "object",   _identity),
+               ("record",        None,            "object",   _identity)]
+
+class ColumnStore( object ):
+    """
+    Holds the contents of a set of records as columns of NumPy arrays, one
+    row per record, in the order the records were added.  Numeric values are
+    stored in numeric arrays, categorical values as integer codes into a list
+    of categories, and everything else as references in object arrays.
+
+    The store is kept current by its owner as records are added, changed, and
+    removed.  Removed rows are masked out until enough of them accumulate to
+    be worth compacting.
+    """
+
+    def __init__( self, columns, categories, records ):
+        """
+        Constructs a ColumnStore from the supplied records.
+
+        Takes 3 arguments:
+
+          columns    - List of column specifications, such as PHOTO_COLUMNS or
+                       ART_COLUMNS.
+          categories - Dictionary mapping categorical column names to their
+                       initial list of categories.  Values seen that are not
+                       in the list are appended to it.
+          records    - List of records to populate the store with.
+
+        Returns 1 value:
+
+          self - The newly created ColumnStore object.
+
+        """
+
+        self._columns    = columns
+        self.categories  = {name: list( categories.get( name, [] ) ) for name, _, kind, _ in columns if kind == "category"}
+
+        # map from each category to its code so values can be encoded
+        # without searching the categories.
+        self._codes      = {name: {category: code for code, category in enumerate( column_categories )}
+                            for name, column_categories in self.categories.items()}
+
+        # map from each record key to the columns derived from it.
+        self._key_columns = dict()
+        for column in columns:
+            self._key_columns.setdefault( column[1], [] ).append( column )
+
+        # map from record identifier to its row.
+        self._rows       = dict()
+
+        self._size       = 0
+        self._capacity   = 0
+        self._arrays     = {name: np.empty( 0, dtype=_COLUMN_DTYPES[kind] ) for name, _, kind, _ in columns}
+        self._valid      = np.empty( 0, dtype=bool )
+
+        self.extend( records )
+
+    def __len__( self ):
+        """
+        Returns the number of records in the store.
+        """
+
+        return len( self._rows )
+
+    def _encode( self, name, value ):
+        """
+        Converts a categorical value into its code, adding a new category if
+        the value hasn't been seen before.
+
+        Takes 2 arguments:
+
+          name  - Name of the categorical column.
+          value - Value to encode.
+
+        Returns 1 value:
+
+          code - Integer code for value.  Missing values are encoded as -1.
+
+        """
+
+        if value is None:
+            return -1
+
+        codes = self._codes[name]
+        code  = codes.get( value )
+
+        if code is None:
+            code         = len( self.categories[name] )
+            codes[value] = code
+            self.categories[name].append( value )
+
+        return code
+
+    def _resize( self, capacity ):
+        """
+        Changes the capacity of the store's arrays, preserving their
+        contents.
+
+        Takes 1 argument:
+
+          capacity - Number of rows the arrays can hold.  Must be at least the
+                     number of rows in use.
+
+        Returns nothing.
+
+        """
+
+        for name, array in self._arrays.items():
+            resized_array              = np.empty( capacity, dtype=array.dtype )
+            resized_array[:self._size] = array[:self._size]
+            self._arrays[name]         = resized_array
+
+        resized_valid              = np.zeros( capacity, dtype=bool )
+        resized_valid[:self._size] = self._valid[:self._size]
+        self._valid                = resized_valid
+
+        self._capacity = capacity
+
+    def extend( self, records ):
+        """
+        Appends rows for the supplied records to the store.
+
+        Takes 1 argument:
+
+          records - List of records to append.
+
+        Returns nothing.
+
+        """
+
+        if len( records ) == 0:
+            return
+
+        # grow geometrically so that appending one record at a time doesn't
+        # copy everything each time.
+        if self._size + len( records ) > self._capacity:
+            self._resize( max( self._size + len( records ), 2 * self._capacity ) )
+
+        start = self._size
+        end   = start + len( records )
+
+        for name, key, kind, convert in self._columns:
+            if key is None:
+                values = records
+            else:
+                values = [convert( record[key] ) for record in records]
+
+            if kind == "category":
+                values = [self._encode( name, value ) for value in values]
+
+            # object arrays need to be filled element-wise so that sequence
+            # values aren't interpreted as additional dimensions.
+            if kind == "object":
+                column    = np.empty( len( values ), dtype=object )
+                column[:] = values
+                values    = column
+
+            self._arrays[name][start:end] = values
+
+        self._valid[start:end] = True
+
+        for row, record in enumerate( records, start ):
+            self._rows[record["id"]] = row
+
+        self._size = end
+
+    def update( self, record, key ):
+        """
+        Updates the columns derived from one of a record's keys.
+
+        Takes 2 arguments:
+
+          record - Record whose value changed.  Must be in the store.
+          key    - Key whose value changed.
+
+        Returns nothing.
+
+        """
+
+        row = self._rows[record["id"]]
+
+        for name, _, kind, convert in self._key_columns.get( key, [] ):
+            value = convert( record[key] )
+
+            if kind == "category":
+                value = self._encode( name, value )
+
+            self._arrays[name][row] = value
+
+    def remove( self, record_id ):
+        """
+        Removes a record's row from the store.  Nothing is done if the record
+        isn't in the store.
+
+        Takes 1 argument:
+
+          record_id - Identifier of the record to remove.
+
+        Returns nothing.
+
+        """
+
+        row = self._rows.pop( record_id, None )
+        if row is None:
+            return
+
+        self._valid[row]            = False
+        self._arrays["record"][row] = None
+
+        # reclaim the space once most of the rows are unused.
+        if len( self._rows ) < self._size // 2:
+            self.compact()
+
+    def compact( self ):
+        """
+        Removes the rows of removed records from the store's arrays.
+
+        Takes no arguments.
+
+        Returns nothing.
+
+        """
+
+        valid = self._valid[:self._size]
+
+        for name, array in self._arrays.items():
+            self._arrays[name] = array[:self._size][valid].copy()
+
+        self._size     = len( self._rows )
+        self._capacity = self._size
+        self._valid    = np.ones( self._size, dtype=bool )
+
+        record_ids = self._arrays["id"]
+        self._rows = {record_id: row for row, record_id in enumerate( record_ids.tolist() )}
+
+    def get_columns( self ):
+        """
+        Gets the store's columns.  When no records have been removed since
+        the store was last compacted, the arrays returned are views of the
+        store's own arrays and reflect subsequent changes to existing rows.
+        Categorical columns contain codes into the lists in the categories
+        attribute.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          columns - Dictionary mapping column names to NumPy arrays, one
+                    entry per record in the store.
+
+        """
+
+        if len( self._rows ) == self._size:
+            return {name: array[:self._size] for name, array in self._arrays.items()}
+
+        valid = self._valid[:self._size]
+
+        return {name: array[:self._size][valid] for name, array in self._arrays.items()}
@@ -1,27 +1,757 @@
+import bisect
 import collections
+import concurrent.futures
+import contextlib
+import fcntl
+import functools
+import gc
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import lzma
+import math
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
 import time
+import weakref
 
+import numpy as np
 from lxml import etree
 
-def _read_xml_database( filename ):
+import GraffitiAnalysis.columns as grafcolumns
+import GraffitiAnalysis.indexes as grafindexes
+import GraffitiAnalysis.instrumentation as grafinstr
+import GraffitiAnalysis.mapped as grafmapped
+
+def _validate_art_fields( art_fields, processing_states ):
+    """
+    Validates the art fields and processing states to ensure that they are
+    suitable for processing.  Ensures that there is at least one value
+    for each field and that there aren't duplicates within a field.
+
+    If the supplied arguments are invalid a RuntimeError describing the
+    validation error is raised.
+
+    Takes 2 arguments:
+
+      art_fields        - Dictionary of art fields to validate.
+      processing_states - List of processing states to validate.
+
+    Returns nothing.
+
+    """
+
+    # validate that we did not have any duplicate fields in what we read.
+    duplicate_art_types         = [item for item, count in collections.Counter( art_fields["types"] ).items() if count > 1]
+    duplicate_art_sizes         = [item for item, count in collections.Counter( art_fields["sizes"] ).items() if count > 1]
+    duplicate_art_qualities     = [item for item, count in collections.Counter( art_fields["qualities"] ).items() if count > 1]
+    duplicate_artists           = [item for item, count in collections.Counter( art_fields["artists"] ).items() if count > 1]
+    duplicate_processing_states = [item for item, count in collections.Counter( processing_states ).items() if count > 1]
+
+    if len( duplicate_art_types ) > 0:
+        raise RuntimeError( "Duplicate art types: {:s}".format( ", ".join( duplicate_art_types ) ) )
+    elif len( art_fields["types"] ) == 0:
+        raise RuntimeError( "No art types were parsed." )
+
+    if len( duplicate_art_sizes ) > 0:
+        raise RuntimeError( "Duplicate art sizes: {:s}".format( ", ".join( duplicate_art_sizes ) ) )
+    elif len( art_fields["sizes"] ) == 0:
+        raise RuntimeError( "No art sizes were parsed." )
+
+    if len( duplicate_art_qualities ) > 0:
+        raise RuntimeError( "Duplicate art qualities: {:s}".format( ", ".join( duplicate_art_qualities ) ) )
+    elif len( art_fields["qualities"] ) == 0:
+        raise RuntimeError( "No art qualities were parsed." )
+
+    if len( duplicate_artists ) > 0:
+        raise RuntimeError( "Duplicate artists: {:s}".format( ", ".join( duplicate_artists ) ) )
+    elif len( art_fields["artists"] ) == 0:
+        raise RuntimeError( "No artists were parsed." )
+
+    if len( duplicate_processing_states ) > 0:
+        raise RuntimeError( "Duplicate aprocessing states: {:s}".format( ", ".join( duplicate_processing_states ) ) )
+    elif len( processing_states ) == 0:
+        raise RuntimeError( "No processing states were parsed." )
+
+def _validate_identifiers( photos, art ):
+    """
+    Validates the photo and art records to ensure that they are suitable
+    for processing.  Ensures that every record's identifier is unique
+    within its class, and that every art record has a parent photo record.
+
+    If the supplied arguments are invalid a RuntimeError describing the
+    validation error is raised.
+
+    Takes 2 arguments:
+
+      photos - List of PhotoRecord objects to validate.
+      art    - List of ArtRecord objects to validate.
+
+    Returns nothing.
+
+    """
+
+    # validate that we did not have any duplicates in our photo record
+    # identifiers.
+    photo_ids = dict()
+    for photo in photos:
+        if photo["id"] in photo_ids:
+            photo_ids[photo["id"]] += 1
+        else:
+            photo_ids[photo["id"]] = 1
+
+    duplicate_photo_ids = [photo_id for photo_id, count in photo_ids.items() if count > 1]
+
+    # validate that we don't have duplicate art record identifiers, as well as
+    # seeing if we have any orphaned art records (read: no parent photo
+    # record).
+    art_ids          = dict()
+    orphaned_art_ids = []
+    for record in art:
+        if record["id"] in art_ids:
+            art_ids[record["id"]] += 1
+        else:
+            art_ids[record["id"]] = 1
+
+        if record["photo_id"] not in photo_ids:
+            orphaned_art_ids.append( record["id"] )
+
+    duplicate_art_ids = [art_id for art_id, count in art_ids.items() if count > 1]
+
+    if len( duplicate_photo_ids ) > 0:
+        raise RuntimeError( "Duplicate photo ID: {:s}.".format( ", ".join( map( str, duplicate_photo_ids ) ) ) )
+
+    if len( duplicate_art_ids ) > 0:
+        raise RuntimeError( "Duplicate art ID: {:s}.".format( ", ".join( map( str, duplicate_art_ids ) ) ) )
+
+    if len( orphaned_art_ids ) > 0:
+        raise RuntimeError( "Orphaned art records: {:s}.".format( ", ".join( map( str, orphaned_art_ids ) ) ) )
+
+def _parse_strings( value, default=() ):
+    """
+    Parses a comma delimited list of strings from an attribute's value into
+    a tuple of interned strings.  Whitespace surrounding each string is
+    removed.
+
+    Takes 2 arguments:
+
+      value   - Attribute value to parse.
+      default - Optional tuple of strings returned when value is empty.  If
+                omitted, defaults to an empty tuple.
+
+    Returns 1 value:
+
+      strings - Tuple of interned strings.
+
+    """
+
+    if value == "":
+        return _intern_strings( default )
+
+    return _intern_strings( [string.strip() for string in value.split( "," )] )
+
+def _parse_photo_node( photo_node, photo_index ):
+    """
+    Parses a Photo node into a PhotoRecord object.  No validation is
+    performed on the values parsed.
+
+    Takes 2 arguments:
+
+      photo_node  - Element representing one of the database's photo
+                    records.
+      photo_index - Position of photo_node within its parent.  Used when
+                    reporting errors.
+
+    Returns 1 value:
+
+      photo - PhotoRecord object parsed.
+
+    """
+
+    if photo_node.tag != "Photo":
+        raise RuntimeError( "Expected a Photo node but got {:s} [#{:d}].".format( photo_node.tag,
+                                                                                  photo_index ) )
+
+    # get a proper dictionary of this node's attributes.
+    attributes    = photo_node.attrib
+
+    # these are our mandatory arguments for building a PhotoRecord...
+    id            = int( attributes.pop( "id", None ) )
+    filename      = attributes.pop( "filename", None )
+
+    # ... and these are the optional ones.
+    state         = attributes.pop( "processing_state", "unreviewed" )  # name change.
+    created_time  = float( attributes.pop( "created_time", "0.0" ) )
+    modified_time = float( attributes.pop( "modified_time", "0.0" ) )
+    location      = attributes.pop( "location", None )
+    photo_time    = float( attributes.pop( "photo_time", "0.0" ) )
+    resolution    = attributes.pop( "resolution", None )
+    rotation      = int( attributes.pop( "rotation", "0" ) )
+    tags          = attributes.pop( "tags", "" )
+
+    # handle conversion between our XML and internal Python
+    # representations.  resolutions are specified as "NxM" and
+    # locations as "X, Y".  tags is a comma delimited list of
+    # strings.
+    if resolution is not None:
+        if resolution == "":
+            resolution = None
+        else:
+            resolution = [size for size in map( int, resolution.split( "x" ) )]
+
+    tags = _parse_strings( tags )
+
+    # take care to only create a location if the attribute was more
+    # than just whitespace (or empty).
+    if location is not None:
+        if location == "":
+            location = None
+        else:
+            location = [where for where in map( float, location.split( "," ) )]
+
+    #
+    # NOTE: all of the remaining attributes are fine to be passed as is.
+    #
+    return PhotoRecord( id,
+                        filename,
+                        created_time=created_time,
+                        location=location,
+                        modified_time=modified_time,
+                        photo_time=photo_time,
+                        resolution=resolution,
+                        rotation=rotation,
+                        state=state,
+                        tags=tags,
+                        **attributes )
+
+def _parse_art_node( art_node, art_index ):
+    """
+    Parses an Art node into an ArtRecord object.  No validation is
+    performed on the values parsed.
+
+    Takes 2 arguments:
+
+      art_node  - Element representing one of the database's art records.
+      art_index - Position of art_node within its parent.  Used when
+                  reporting errors.
+
+    Returns 1 value:
+
+      art - ArtRecord object parsed.
+
+    """
+
+    if art_node.tag != "Art":
+        raise RuntimeError( "Expected a Art node but got {:s} [#{:d}].".format( art_node.tag,
+                                                                                art_index ) )
+
+    # get a proper dictionary of this node's attributes.
+    attributes    = art_node.attrib
+
+    # these are our mandatory arguments for building a ArtRecord...
+    id            = int( attributes.pop( "id", None ) )
+    photo_id      = int( attributes.pop( "photo_id", None ) )
+    art_type      = attributes.pop( "type", None )
+
+    # ... and these are the optional ones.
+    date          = attributes.pop( "date", "" )
+    state         = attributes.pop( "processing_state", "unreviewed" )  # name change.
+    artists       = attributes.pop( "artists", "Unknown" )
+    associates    = attributes.pop( "associates", "" )
+    vandals       = attributes.pop( "vandals", "" )
+    created_time  = float( attributes.pop( "created_time", None ) )
+    modified_time = float( attributes.pop( "modified_time", None ) )
+    region        = attributes.pop( "region", None )
+    tags          = attributes.pop( "tags", "" )
+
+    # handle conversion between our XML and internal Python
+    # representations.  artists, associates, tags, and vandals are all
+    # comma delimited lists.  region is a comma delimited 4-tuple of
+    # normalized floats.
+    #
+    # NOTE: the lists are interned, as tuples, since most records share the
+    #       same handful of values.
+    #
+    artists    = _parse_strings( artists, ("Unknown",) )
+    associates = _parse_strings( associates )
+    tags       = _parse_strings( tags )
+    vandals    = _parse_strings( vandals )
+
+    if region is not None:
+        region = tuple( [value for value in map( float, region.split( "," ))] )
+
+    return ArtRecord( id,
+                      photo_id,
+                      art_type,
+                      artists=artists,
+                      associates=associates,
+                      created_time=created_time,
+                      date=date,
+                      modified_time=modified_time,
+                      region=region,
+                      state=state,
+                      tags=tags,
+                      vandals=vandals,
+                      **attributes )
+
+# patterns used to locate sections and nodes within a serialized XML database
+# without parsing it.  they only need to handle the layout
+# _write_xml_database() produces, since anything else is parsed normally.
+#
+# NOTE: identifiers are only searched for in nodes whose attributes are
+#       double quoted, as a double quoted value cannot contain anything that
+#       looks like another double quoted attribute.
+#
+_XML_ENCODING_PATTERN     = re.compile( rb"^\s*<\?xml[^>]*\sencoding\s*=\s*[\"']([^\"']*)[\"']" )
+_XML_ART_PATTERN          = re.compile( rb"<Art\s[^<>]*/>|<Art(?:\s[^<>]*)?>\s*</Art\s*>" )
+_XML_SINGLE_QUOTE_PATTERN = re.compile( rb"=\s*'" )
+_XML_IDENTIFIER_PATTERN   = re.compile( rb"\s(id|photo_id)\s*=\s*\"(\d+)\"" )
+
+class _UnloadedArtRecord( object ):
+    """
+    Stands in for an ArtRecord whose Art node has been located within an XML
+    database but not yet parsed.  Only the record's identifiers are known,
+    and the serialized node is kept so that the record can be parsed on
+    demand, or written back as is if it never is.
+    """
+
+    __slots__ = ("id", "photo_id", "index", "_source", "_start", "_end")
+
+    def __init__( self, id, photo_id, index, source, start, end ):
+        """
+        Constructs an _UnloadedArtRecord for the supplied Art node.
+
+        Takes 6 arguments:
+
+          id       - Identifier of the art record.
+          photo_id - Identifier of the photo record the art belongs to.
+          index    - Position of the record amongst the database's art
+                     records.
+          source   - Bytes containing the serialized Art node.
+          start    - Offset of the Art node within source.
+          end      - Offset one past the end of the Art node within source.
+
+        Returns 1 value:
+
+          self - The newly created _UnloadedArtRecord object.
+
+        """
+
+        self.id       = id
+        self.photo_id = photo_id
+        self.index    = index
+        self._source  = source
+        self._start   = start
+        self._end     = end
+
+    def __getitem__( self, key ):
+        """
+        Gets one of the record's identifiers.  Nothing else is available
+        until the record is loaded.
+        """
+
+        if key == "id":
+            return self.id
+        elif key == "photo_id":
+            return self.photo_id
+
+        raise KeyError( "'{:s}' is not available until the art record is loaded.".format( key ) )
+
+    def copy( self ):
+        """
+        Returns the record itself, as it cannot be modified.
+        """
+
+        return self
+
+    def get_node_bytes( self ):
+        """
+        Gets the serialized Art node.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          node_bytes - Bytes containing the Art node.
+
+        """
+
+        return self._source[self._start:self._end]
+
+    def load( self ):
+        """
+        Parses the record's Art node.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          art - ArtRecord object parsed.
+
+        """
+
+        return _parse_art_node( etree.fromstring( self.get_node_bytes() ), self.index )
+
+# smallest portion of a section, in bytes, worth parsing in another process.
+_XML_CHUNK_SIZE = 256 * 1024
+
+def _is_splittable_xml( data ):
+    """
+    Determines whether pieces of a serialized XML database can be parsed on
+    their own.  This requires that the document is encoded compatibly with
+    ASCII, so pieces can be parsed without its declaration, and that it
+    doesn't have a document type that could define entities.
+
+    Takes 1 argument:
+
+      data - Bytes containing the XML database.
+
+    Returns 1 value:
+
+      splittable - Flag indicating whether pieces of data can be parsed.
+
+    """
+
+    encoding_match = _XML_ENCODING_PATTERN.match( data )
+    if (encoding_match is not None and
+        encoding_match.group( 1 ).lower() not in [b"utf-8", b"utf8", b"us-ascii", b"ascii"]):
+        return False
+
+    return data.find( b"<!DOCTYPE" ) < 0
+
+def _find_xml_section( data, section_name ):
+    """
+    Locates the contents of one of the sections of a serialized XML database.
+
+    Takes 2 arguments:
+
+      data         - Bytes containing the XML database.
+      section_name - Name of the section node to locate, as bytes.
+
+    Returns 2 values:
+
+      start - Offset of the first byte of the section's contents within data.
+              None if the section could not be located or is empty.
+      end   - Offset one past the last byte of the section's contents within
+              data.  None if the section could not be located or is empty.
+
+    """
+
+    section_match = re.search( b"<" + section_name + rb"\s*>", data )
+    if section_match is None:
+        return (None, None)
+
+    start = section_match.end()
+    end   = data.find( b"</" + section_name, start )
+    if end < 0:
+        return (None, None)
+
+    return (start, end)
+
+def _split_xml_section( data, section_name, node_name, chunk_count ):
+    """
+    Splits the contents of one of the sections of a serialized XML database
+    into chunks, between its nodes, that can be parsed independently.
+    Sections are only split when they contain nothing but elements and are
+    large enough to be worth parsing in pieces.
+
+    Takes 4 arguments:
+
+      data         - Bytes containing the XML database.
+      section_name - Name of the section node to split, as bytes.
+      node_name    - Name of the section's children nodes, as bytes.
+      chunk_count  - Maximum number of chunks to split the section into.
+
+    Returns 1 value:
+
+      chunks - List of (start, end) offsets within data of each chunk, in
+               document order.  The chunks cover the section's contents.
+               None if the section could not be split.
+
+    """
+
+    if not _is_splittable_xml( data ):
+        return None
+
+    start, end = _find_xml_section( data, section_name )
+    if start is None:
+        return None
+
+    # comments, processing instructions, and CDATA could hide something
+    # that looks like a node.
+    if data.find( b"<!", start, end ) >= 0 or data.find( b"<?", start, end ) >= 0:
+        return None
+
+    chunk_count = min( chunk_count, (end - start) // _XML_CHUNK_SIZE )
+    if chunk_count < 2:
+        return None
+
+    # move each boundary forward to the start of the next node.  as '<'
+    # cannot appear within attribute values, this is always the start of
+    # markup.
+    node_pattern = re.compile( b"<" + node_name + rb"[\s/>]" )
+    boundaries   = [start]
+
+    for chunk_index in range( 1, chunk_count ):
+        node_match = node_pattern.search( data,
+                                          start + (end - start) * chunk_index // chunk_count,
+                                          end )
+        if node_match is None:
+            break
+        elif node_match.start() > boundaries[-1]:
+            boundaries.append( node_match.start() )
+
+    boundaries.append( end )
+
+    return list( zip( boundaries[:-1], boundaries[1:] ) )
+
+def _parse_xml_chunk( chunk, section_name, first_index ):
+    """
+    Parses a chunk of one of the sections of a serialized XML database.
+    This is run in worker processes, so records are returned as their
+    state rather than as objects.  See _split_xml_section() for the chunks
+    parsed.
+
+    Takes 3 arguments:
+
+      chunk        - Bytes containing a sequence of Photo or Art nodes.
+      section_name - Name of the section the chunk came from, as bytes.
+                     Must be b"Photos" or b"Arts".
+      first_index  - Position of the chunk's first node within its section.
+                     Used when reporting errors.
+
+    Returns 1 value:
+
+      states - List of record states, see Record.__getstate__(), one per
+               node in the chunk.
+
+    """
+
+    section_node = etree.fromstring( b"<" + section_name + b">" + chunk + b"</" + section_name + b">" )
+
+    if section_name == b"Photos":
+        parse_node = _parse_photo_node
+    else:
+        parse_node = _parse_art_node
+
+    return [parse_node( node, node_index ).__getstate__() for node_index, node in enumerate( section_node, first_index )]
+
+def _restore_records( record_class, states ):
+    """
+    Creates records from their pickled state.
+
+    Takes 2 arguments:
+
+      record_class - Class of the records to create, either PhotoRecord or
+                     ArtRecord.
+      states       - Iterable of record states from Record.__getstate__().
+
+    Returns 1 value:
+
+      records - List of record_class objects, one per state.
+
+    """
+
+    records = []
+
+    for state in states:
+        record = record_class.__new__( record_class )
+        record.__setstate__( state )
+        records.append( record )
+
+    return records
+
+def _scan_xml_art_nodes( data ):
     """
-    Reads the database from the specified XML file.
+    Locates the Art nodes within a serialized XML database and creates an
+    _UnloadedArtRecord for each of them.  Nothing is located if the Arts
+    node contains anything other than Art nodes without children, or if
+    pieces of the document can't be parsed on their own (see
+    _is_splittable_xml()), so that such documents can be parsed normally
+    instead.
 
     Takes 1 argument:
 
-      filename - Path to the XML file containing the database contents.
+      data - Bytes containing the XML database.
+
+    Returns 3 values:
+
+      start - Offset of the first byte of the Arts node's contents within
+              data.  None if the Art nodes could not be located.
+      end   - Offset one past the last byte of the Arts node's contents
+              within data.  None if the Art nodes could not be located.
+      arts  - List of _UnloadedArtRecord objects, one per Art node, in
+              document order.  None if the Art nodes could not be located.
+
+    """
+
+    if not _is_splittable_xml( data ):
+        return (None, None, None)
+
+    start, end = _find_xml_section( data, b"Arts" )
+    if start is None:
+        return (None, None, None)
+
+    # keep only the Arts node's contents so the rest of the document can be
+    # released once it's parsed.
+    source   = data[start:end]
+    arts     = []
+    position = 0
+
+    for art_match in _XML_ART_PATTERN.finditer( source ):
+        node_start, node_end = art_match.span()
+
+        # bail if anything besides whitespace separates the nodes, or if we
+        # can't trust what we find within them.
+        if source[position:node_start].strip() != b"":
+            return (None, None, None)
+        elif _XML_SINGLE_QUOTE_PATTERN.search( source, node_start, node_end ) is not None:
+            return (None, None, None)
+
+        identifiers = dict( _XML_IDENTIFIER_PATTERN.findall( source, node_start, node_end ) )
+        if len( identifiers ) != 2:
+            return (None, None, None)
+
+        arts.append( _UnloadedArtRecord( int( identifiers[b"id"] ),
+                                         int( identifiers[b"photo_id"] ),
+                                         len( arts ),
+                                         source,
+                                         node_start,
+                                         node_end ) )
+
+        position = node_end
+
+    if source[position:].strip() != b"":
+        return (None, None, None)
+
+    return (start, end, arts)
+
+# compression formats XML databases may be stored in.  each entry maps the
+# format's name to the file name extension selecting it and the magic bytes
+# that begin its files.
+_XML_COMPRESSIONS = { "gzip": (".gz", b"\x1f\x8b"),
+                      "xz":   (".xz", b"\xfd7zXZ\x00") }
+
+# gzip trades a larger file for much faster compression than xz's default.
+_GZIP_COMPRESSION_LEVEL = 6
+
+def _get_xml_compression( filename, sniff=True ):
+    """
+    Determines which compression format an XML database is stored in.  The
+    file's contents are checked first, if requested and the file exists,
+    so that a database is read correctly regardless of its name, and its
+    extension otherwise.
+
+    Takes 2 arguments:
+
+      filename - Path to the XML database.
+      sniff    - Optional flag specifying whether the file's contents are
+                 checked.  If omitted, defaults to True.
+
+    Returns 1 value:
+
+      compression - Name of the compression format, one of the keys of
+                    _XML_COMPRESSIONS, or None if the database is
+                    uncompressed.
+
+    """
+
+    if sniff and os.path.isfile( filename ):
+        with open( filename, "rb" ) as f:
+            magic = f.read( max( len( magic ) for _, magic in _XML_COMPRESSIONS.values() ) )
+
+        for compression, (_, compression_magic) in _XML_COMPRESSIONS.items():
+            if magic.startswith( compression_magic ):
+                return compression
+
+        return None
+
+    for compression, (extension, _) in _XML_COMPRESSIONS.items():
+        if filename.lower().endswith( extension ):
+            return compression
+
+    return None
+
+def _open_compressed_xml( f, compression, mode ):
+    """
+    Wraps a binary file object so that data are compressed as they're
+    written, or decompressed as they're read.  Nothing is buffered beyond
+    what the compressor needs, so documents stream through in pieces.
+
+    Takes 3 arguments:
+
+      f           - Binary file object to wrap.
+      compression - Name of the compression format, one of the keys of
+                    _XML_COMPRESSIONS.
+      mode        - Either "rb" or "wb".
+
+    Returns 1 value:
+
+      compressed_file - File object that must be closed before f is.
+
+    """
+
+    if compression == "gzip":
+        if mode == "wb":
+            return gzip.GzipFile( fileobj=f, mode=mode, compresslevel=_GZIP_COMPRESSION_LEVEL, mtime=0 )
+
+        return gzip.GzipFile( fileobj=f, mode=mode )
+    elif compression == "xz":
+        return lzma.LZMAFile( f, mode=mode )
+
+    raise ValueError( "Unknown compression format '{:s}'.".format( compression ) )
+
+def _read_xml_database( filename, lazy=False, processes=None, header=True ):
+    """
+    Reads the database from the specified XML file.  Shards of a sharded
+    database are read the same way, though they lack the Fields section.
+
+    Art records may optionally be read lazily, where each Art node is only
+    located rather than parsed and an _UnloadedArtRecord is returned in
+    place of its ArtRecord.  Documents whose Art nodes cannot be located are
+    read normally.
+
+    The photo and art records may also be parsed in parallel by a pool of
+    worker processes, each parsing chunks of the Photos and Arts sections.
+    Sections that are too small to benefit, or that cannot be split, are
+    parsed normally.  The records are validated once they've all been
+    parsed.
+
+    Compressed files (see _XML_COMPRESSIONS) are decompressed as they're
+    parsed, so the decompressed document is never held in memory.  As this
+    precludes locating nodes within it, they are neither read lazily nor
+    parsed by workers.
+
+    Takes 4 arguments:
+
+      filename  - Path to the XML file containing the database contents.
+      lazy      - Optional flag specifying whether art records are read
+                  lazily.  If omitted, defaults to False.
+      processes - Optional number of worker processes used to parse the
+                  records.  If omitted, or less than 2, the records are
+                  parsed by the calling process.
+      header    - Optional flag specifying whether the document begins with
+                  the Fields section.  Should be False for shards.  If
+                  omitted, defaults to True.
 
     Returns 4 values:
 
       art_fields        - Dictionary containing various database field values
                           associated with art records.  Each key's value is
-                          a list of strings.
+                          a list of strings.  None when header is False.
       processing_states - List of values representing the states records may
-                          be in.
+                          be in.  None when header is False.
       photo_records     - A list of photo objects, one per record in the
                           database.
       art_records       - A list of art objects, one per record in the
-                          database.
+                          database.  These are _UnloadedArtRecords when
+                          read lazily.
 
     """
 
@@ -46,6 +776,7 @@ def _read_xml_database( filename ):
         Returns 1 value:
 
            values - List of value strings parsed from the children nodes.
+                    The strings are interned so that records share them.
 
         """
 
@@ -57,7 +788,7 @@ def _read_xml_database( filename ):
                                                                                                       child_node.tag,
                                                                                                       child_index ) )
 
-            values.append( child_node.get( attribute_name ) )
+            values.append( _intern_string( child_node.get( attribute_name ) ) )
 
         return values
 
@@ -185,385 +916,401 @@ def _read_xml_database( filename ):
                   "artists":   artists },
                  processing_states )
 
-    def parse_photos_node( photos_node ):
+    def release_node( node ):
         """
-        Parses a Photos node into a list of PhotoRecord objects.  No
-        validation is performed on the values parsed.
+        Releases the memory associated with a completely parsed node, as well
+        as any of its preceding siblings, so that the partially constructed
+        DOM does not grow as the document is streamed.
 
         Takes 1 argument:
 
-          photos_node - Element whose children represent the database's photo
-                        records.
+          node - Element that has been completely parsed.
 
-        Returns 1 value:
-
-          photos - List of PhotoRecord objects parsed.
+        Returns nothing.
 
         """
 
-        photos = []
-
-        for photo_index, photo_node in enumerate( photos_node ):
-            if photo_node.tag != "Photo":
-                raise RuntimeError( "Expected a Photo node but got {:s} [#{:d}].".format( photo_node.tag,
-                                                                                          photo_index ) )
-
-            # get a proper dictionary of this node's attributes.
-            attributes    = photo_node.attrib
-
-            # these are our mandatory arguments for building a PhotoRecord...
-            id            = int( attributes.pop( "id", None ) )
-            filename      = attributes.pop( "filename", None )
-
-            # ... and these are the optional ones.
-            state         = attributes.pop( "processing_state", "unreviewed" )  # name change.
-            created_time  = float( attributes.pop( "created_time", "0.0" ) )
-            modified_time = float( attributes.pop( "modified_time", "0.0" ) )
-            location      = attributes.pop( "location", None )
-            photo_time    = float( attributes.pop( "photo_time", "0.0" ) )
-            resolution    = attributes.pop( "resolution", None )
-            rotation      = int( attributes.pop( "rotation", "0" ) )
-            tags          = attributes.pop( "tags", "" )
-
-            # handle conversion between our XML and internal Python
-            # representations.  resolutions are specified as "NxM" and
-            # locations as "X, Y".  tags is a comma delimited list of
-            # strings.
-            if resolution is not None:
-                if resolution == "":
-                    resolution = None
-                else:
-                    resolution = [size for size in map( int, resolution.split( "x" ) )]
-
-            if tags == "":
-                tags = []
+        node.clear()
+
+        # siblings are only removed once we're done with them, which is
+        # always the case for those preceding the current node.
+        parent_node = node.getparent()
+        if parent_node is not None:
+            while node.getprevious() is not None:
+                del parent_node[0]
+
+    # stream the XML file's parse events rather than building its DOM in one
+    # go.  records are converted as soon as their node has been completely
+    # read and then released, so memory is bounded by the records we build
+    # rather than by the size of the document.
+    #
+    # NOTE: the Fields node is tiny compared to the records and is parsed as
+    #       a whole once its end has been seen.
+    #
+    section_names = ["Fields", "Photos", "Arts"] if header else ["Photos", "Arts"]
+    section_index = -1
+    record_index  = 0
+    depth         = 0
+
+    fields = None
+    photos = []
+    art    = []
+
+    # sections whose records are located lazily, or parsed by worker
+    # processes, are removed from the document and the remainder of it is
+    # parsed here with empty nodes in their place.
+    source          = filename
+    removed_ranges  = []
+    pending_records = dict()
+    located_art     = False
+
+    compression = _get_xml_compression( filename )
+    if compression is not None:
+        lazy      = False
+        processes = None
+
+    if processes is not None and processes > 1:
+        executor_context = concurrent.futures.ProcessPoolExecutor( max_workers=processes )
+    else:
+        executor_context = contextlib.nullcontext()
+
+    with grafinstr.timed( "xml.parse" ), executor_context as executor, contextlib.ExitStack() as file_stack:
+        if compression is not None:
+            source = file_stack.enter_context( _open_compressed_xml( file_stack.enter_context( open( filename, "rb" ) ),
+                                                                     compression,
+                                                                     "rb" ) )
+
+        if lazy or executor is not None:
+            with open( filename, "rb" ) as f:
+                data = f.read()
+
+            if lazy:
+                start, end, unloaded_art = _scan_xml_art_nodes( data )
+                if unloaded_art is not None:
+                    removed_ranges.append( (start, end) )
+                    art         = unloaded_art
+                    located_art = True
+
+            # hand the workers several chunks each so that they finish at
+            # roughly the same time.
+            if executor is not None:
+                for section_name, node_name in [(b"Photos", b"Photo"), (b"Arts", b"Art")]:
+                    if section_name == b"Arts" and located_art:
+                        continue
+
+                    chunks = _split_xml_section( data, section_name, node_name, processes * 4 )
+                    if chunks is None:
+                        continue
+
+                    removed_ranges.append( (chunks[0][0], chunks[-1][1]) )
+
+                    futures     = []
+                    first_index = 0
+                    for start, end in chunks:
+                        futures.append( executor.submit( _parse_xml_chunk,
+                                                         data[start:end],
+                                                         section_name,
+                                                         first_index ) )
+                        first_index += data.count( b"<" + node_name, start, end )
+
+                    pending_records[section_name] = futures
+
+            if len( removed_ranges ) > 0:
+                pieces   = []
+                position = 0
+
+                for start, end in sorted( removed_ranges ):
+                    pieces.append( data[position:start] )
+                    position = end
+                pieces.append( data[position:] )
+
+                source = io.BytesIO( b"".join( pieces ) )
+
+            del data
+
+        for event, node in etree.iterparse( source, events=("start", "end") ):
+            if event == "start":
+                depth += 1
+
+                # verify that the document's sections arrive in the order
+                # expected.
+                if depth == 2:
+                    section_index += 1
+                    record_index   = 0
+
+                    if section_index >= len( section_names ):
+                        raise RuntimeError( "Expected {:d} elements within the document, but received {:d}.".format( len( section_names ),
+                                                                                                                  section_index + 1 ) )
+                    elif node.tag != section_names[section_index]:
+                        raise RuntimeError( "" )
+
+                continue
+
+            depth -= 1
+
+            # parse the fields, and our photos and art records.
+            if depth == 1 and section_names[section_index] == "Fields":
+                fields = parse_fields_node( node )
+            elif depth == 2 and section_names[section_index] == "Photos":
+                photos.append( _parse_photo_node( node, record_index ) )
+                record_index += 1
+            elif depth == 2 and section_names[section_index] == "Arts":
+                art.append( _parse_art_node( node, record_index ) )
+                record_index += 1
             else:
-                tags = [string for string in map( lambda x: x.strip(), tags.split( "," ) )]
-
-            # take care to only create a location if the attribute was more
-            # than just whitespace (or empty).
-            if location is not None:
-                if location == "":
-                    location = None
-                else:
-                    location = [where for where in map( float, location.split( "," ) )]
+                continue
 
-            #
-            # NOTE: all of the remaining attributes are fine to be passed as is.
-            #
-            photos.append( PhotoRecord( id,
-                                        filename,
-                                        created_time=created_time,
-                                        location=location,
-                                        modified_time=modified_time,
-                                        photo_time=photo_time,
-                                        resolution=resolution,
-                                        rotation=rotation,
-                                        state=state,
-                                        tags=tags,
-                                        **attributes ) )
+            release_node( node )
 
-        return photos
+        if section_index != len( section_names ) - 1:
+            raise RuntimeError( "Expected {:d} elements within the document, but received {:d}.".format( len( section_names ),
+                                                                                                      section_index + 1 ) )
 
-    def parse_arts_node( arts_node ):
-        """
-        Parses a Arts node into a list of ArtRecord objects.  No validation is
-        performed on the values parsed.
+        # collect the records parsed by the workers, in document order.
+        if b"Photos" in pending_records:
+            photos = _restore_records( PhotoRecord,
+                                       itertools.chain.from_iterable( future.result() for future in pending_records[b"Photos"] ) )
+        if b"Arts" in pending_records:
+            art    = _restore_records( ArtRecord,
+                                       itertools.chain.from_iterable( future.result() for future in pending_records[b"Arts"] ) )
 
-        Takes 1 argument:
+    # validate what we received so we don't pass garbage back to the user.
+    with grafinstr.timed( "xml.validate" ):
+        if header:
+            _validate_art_fields( fields[0], fields[1] )
+        else:
+            fields = (None, None)
+        _validate_identifiers( photos, art )
 
-          art_node - Element whose children represent the database's art
-                     records.
+    grafinstr.increment( "xml.photos_read", len( photos ) )
+    grafinstr.increment( "xml.arts_read", len( art ) )
 
-        Returns 1 value:
+    # XXX: rework the interface here
+    return (fields[0], fields[1], photos, art)
 
-          art - List of ArtRecord objects parsed.
+def _read_memory_database( ):
+    """
+    Constructs a test database from internal structures.
 
-        """
+    Takes no arguments.
 
-        art = []
+    Returns 4 values:
 
-        for art_index, art_node in enumerate( arts_node ):
-            if art_node.tag != "Art":
-                raise RuntimeError( "Expected a Art node but got {:s} [#{:d}].".format( art_node.tag,
-                                                                                        art_index ) )
-
-            # get a proper dictionary of this node's attributes.
-            attributes    = art_node.attrib
-
-            # these are our mandatory arguments for building a ArtRecord...
-            id            = int( attributes.pop( "id", None ) )
-            photo_id      = int( attributes.pop( "photo_id", None ) )
-            art_type      = attributes.pop( "type", None )
-
-            # ... and these are the optional ones.
-            date          = attributes.pop( "date", "" )
-            state         = attributes.pop( "processing_state", "unreviewed" )  # name change.
-            artists       = attributes.pop( "artists", "Unknown" )
-            associates    = attributes.pop( "associates", "" )
-            vandals       = attributes.pop( "vandals", "" )
-            created_time  = float( attributes.pop( "created_time", None ) )
-            modified_time = float( attributes.pop( "modified_time", None ) )
-            region        = attributes.pop( "region", None )
-            tags          = attributes.pop( "tags", "" )
-
-            # handle conversion between our XML and internal Python
-            # representations.  artists, associates, tags, and vandals are all
-            # comma delimited lists.  region is a comma delimited 4-tuple of
-            # normalized floats.
-            if artists == "":
-                artists = ["Unknown"]
-            else:
-                artists = [string for string in map( lambda x: x.strip(), artists.split( "," ) )]
-            if associates == "":
-                associates = []
-            else:
-                associates = [string for string in map( lambda x: x.strip(), associates.split( "," ) )]
-            if tags == "":
-                tags = []
-            else:
-                tags = [string for string in map( lambda x: x.strip(), tags.split( "," ) )]
-            if vandals == "":
-                vandals = []
-            else:
-                vandals = [string for string in map( lambda x: x.strip(), vandals.split( "," ) )]
+      art_fields        - Dictionary containing various database field values
+                          associated with art records.  Each key's value is
+                          a list of strings.
+      processing_states - List of values representing the states records may
+                          be in.
+      photo_records     - A list of photo objects, one per record in the
+                          database.
+      art_records       - A list of art objects, one per record in the
+                          database.
 
-            if region is not None:
-                region = tuple( [value for value in map( float, region.split( "," ))] )
+    """
 
-            art.append( ArtRecord( id,
-                                   photo_id,
-                                   art_type,
-                                   artists=artists,
-                                   associates=associates,
-                                   created_time=created_time,
-                                   date=date,
-                                   modified_time=modified_time,
-                                   region=region,
-                                   state=state,
-                                   tags=tags,
-                                   vandals=vandals,
-                                   **attributes ) )
+    art_types     = ["tag", "throwup", "wild_style", "mural", "sticker", "text", "other"]
+    art_sizes     = ["tiny", "small", "medium", "large", "huge"]
+    art_qualities = ["bad", "poor", "fair", "good", "excellent"]
 
-        return art
+    artists = ["Amoz", "Badu", "Daru", "Drip", "EWO", "Fuck", "HBD",
+               "Kolm", "Omar", "PBR", "Rulof", "TV", "Unknown", "Zebra"]
 
-    def validate_art_fields( art_fields, processing_states ):
-        """
-        Validates the art fields and processing states to ensure that they are
-        suitable for processing.  Ensures that there is at least one value
-        for each field and that there aren't duplicates within a field.
+    processing_states = ["needs_review", "reviewed", "unreviewed"]
 
-        If the supplied arguments are invalid a RuntimeError describing the
-        validation error is raised.
+    photos = [PhotoRecord( 1, "images/P9400741.JPG", (4112, 3884), "reviewed", (0,0), 0, 1468507707, 1468507707, None, [] ),
+              PhotoRecord( 2, "images/P9400919.JPG", (4112, 3884), "reviewed", (0,0), 0, 1468507608, 1468507608, None, [] ),
+              PhotoRecord( 3, "images/P9410159.JPG", (4112, 3884), "reviewed", (0,0), 0, 1468507668, 1468507668, None, [] ),
+              PhotoRecord( 4, "images/P9430585.JPG", (4112, 3884), "reviewed", (0,0), 0, 1468507638, 1468507638, None, [] ),
+              PhotoRecord( 5, "images/P9440028.JPG", (4112, 3884), "unreviewed", (0,0), 0, 1468507546, 1468507546, None, [] ),
+              PhotoRecord( 6, "images/P9470260.JPG", (4112, 3884), "needs_review", (0,0), 0, 1468507567, 1468507567, None, [] )]
+    art    = [ArtRecord( 1, 1, "throwup", ["Daru"],    [], "large", "good", [], 1234, 1234, None, [], "reviewed", (0.2, 0.13924050632911392, 0.7142857142857143, 0.3291139240506329) ),
+              ArtRecord( 2, 1, "throwup", ["Amoz"],    [], "large", "fair", [], 1234, 1234, None, [], "reviewed", (0.24952380952380954, 0.41012658227848103, 0.3219047619047619, 0.3012658227848101) ),
+              ArtRecord( 3, 1, "throwup", ["EWO"],     [], "large", "fair", [], 1234, 1234, None, [], "reviewed", (0.5619047619047619, 0.3569620253164557, 0.42857142857142855, 0.3367088607594937) ),
+              ArtRecord( 4, 1, "throwup", ["Unknown"], [], "large", "poor", [], 1234, 1234, None, [], "reviewed", (0.015238095238095238, 0.4, 0.26476190476190475, 0.29873417721518986) ),
 
-        Takes 2 arguments:
+              ArtRecord( 5, 2, "wild_style", ["Fuck"], [], "huge", "excellent", [], 1234, 1234, "2016", [], "reviewed", (0.02857142857142857, 0.31645569620253167, 0.9352380952380952, 0.37721518987341773) ),
 
-          art_fields        - Dictionary (from parse_fields_node()) to validate.
-          processing_states - List of processing states to validate.
+              ArtRecord( 6, 3, "throwup", ["Badu"], ["PBR", "Zebra"], "large", "excellent", [], 1234, 1234, "2016", [], "reviewed", (0.0419047619047619, 0.002531645569620253, 0.8819047619047619, 0.9772151898734177) ),
+              ArtRecord( 7, 3, "tag",     ["Badu"], [],               "small", "good", [], 1234, 1234, None, [], "reviewed", (0.878095238095238, 0.6177215189873417, 0.10857142857142857, 0.10886075949367088) ),
+              ArtRecord( 8, 3, "tag",     ["Badu"], [],               "small", "good", [], 1234, 1234, None, [], "reviewed", (0.8838095238095238, 0.1189873417721519, 0.10857142857142857, 0.10126582278481013) ),
 
-        Returns nothing.
+              ArtRecord( 9, 4,  "throwup", ["PBR"], ["PBR", "Drip"], "small", "good", [], 1234, 1234, None, [], "reviewed", (0.0019047619047619048, 0.22025316455696203, 0.9447619047619048, 0.5569620253164557) ),
+              ArtRecord( 10, 4, "tag",     ["Drip"],             [], "small", "fair", [], 1234, 1234, None, [], "reviewed", (0.7695238095238095, 0.5341772151898734, 0.12761904761904763, 0.10126582278481013) ),
+              ArtRecord( 11, 4, "tag",     ["MR", "Unknown"],    [], "small", "fair", [], 1234, 1234, None, [], "needs_review", (0.7847619047619048, 0.6481012658227848, 0.09523809523809523, 0.1620253164556962) ),
 
-        """
+              ArtRecord( 12, 5, "wild_style", ["Unknown"], ["Rulof"], "huge", "good", [], 1234, 1234, None, [], "needs_review", (0.0019047619047619048, 0.2481012658227848, 1.0, 0.47341772151898737) ),
 
-        # validate that we did not have any duplicate fields in what we read.
-        duplicate_art_types         = [item for item, count in collections.Counter( fields[0]["types"] ).items() if count > 1]
-        duplicate_art_sizes         = [item for item, count in collections.Counter( fields[0]["sizes"] ).items() if count > 1]
-        duplicate_art_qualities     = [item for item, count in collections.Counter( fields[0]["qualities"] ).items() if count > 1]
-        duplicate_artists           = [item for item, count in collections.Counter( fields[0]["artists"] ).items() if count > 1]
-        duplicate_processing_states = [item for item, count in collections.Counter( fields[1] ).items() if count > 1]
+              ArtRecord( 13, 6, "mural", ["HBD"], ["Omar"], "large", "fair", [], 1234, 1234, "2014/11/21", [], "reviewed", (0.08, 0.3189873417721519, 0.4247619047619048, 0.4253164556962025) ),
+              ArtRecord( 14, 6, "text",  ["HBD"], [],       "small", "good", [], 1234, 1234, "2014/11/21", [], "reviewed", (0.4, 0.3240506329113924, 0.4266666666666667, 0.379746835443038) )]
 
-        if len( duplicate_art_types ) > 0:
-            raise RuntimeError( "Duplicate art types: {:s}".format( ", ".join( duplicate_art_types ) ) )
-        elif len( fields[0]["types"] ) == 0:
-            raise RuntimeError( "No art types were parsed." )
+    return ({ "types":     art_types,
+              "sizes":     art_sizes,
+              "qualities": art_qualities,
+              "artists":   artists },
+            processing_states,
+            photos,
+            art)
 
-        if len( duplicate_art_sizes ) > 0:
-            raise RuntimeError( "Duplicate art sizes: {:s}".format( ", ".join( duplicate_art_sizes ) ) )
-        elif len( fields[0]["sizes"] ) == 0:
-            raise RuntimeError( "No art sizes were parsed." )
+@contextlib.contextmanager
+def _paused_garbage_collection():
+    """
+    Pauses the cyclic garbage collector while a large number of objects are
+    created.  Otherwise each collection rescans every record in the database
+    and the time spent collecting dwarfs the time spent creating.
 
-        if len( duplicate_art_qualities ) > 0:
-            raise RuntimeError( "Duplicate art qualities: {:s}".format( ", ".join( duplicate_art_qualities ) ) )
-        elif len( fields[0]["qualities"] ) == 0:
-            raise RuntimeError( "No art qualities were parsed." )
+    Takes no arguments.
 
-        if len( duplicate_artists ) > 0:
-            raise RuntimeError( "Duplicate artists: {:s}".format( ", ".join( duplicate_artists ) ) )
-        elif len( fields[0]["artists"] ) == 0:
-            raise RuntimeError( "No artists were parsed." )
+    Returns nothing.
 
-        if len( duplicate_processing_states ) > 0:
-            raise RuntimeError( "Duplicate aprocessing states: {:s}".format( ", ".join( duplicate_processing_states ) ) )
-        elif len( fields[1] ) == 0:
-            raise RuntimeError( "No processing states were parsed." )
+    """
 
-    def validate_identifiers( photos, art ):
-        """
-        Validates the photo and art records to ensure that they are suitable
-        for processing.  Ensures that every record's identifier is unique
-        within its class, and that every art record has a parent photo record.
+    enabled_flag = gc.isenabled()
 
-        If the supplied arguments are invalid a RuntimeError describing the
-        validation error is raised.
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled_flag:
+            gc.enable()
 
-        Takes 2 arguments:
+@contextlib.contextmanager
+def _atomic_open( filename ):
+    """
+    Opens a temporary file, for binary writing, that replaces the specified
+    file once it has been completely written and closed.  Should writing
+    fail, the temporary file is removed and the specified file is left
+    untouched.  Either way, a crash never leaves a partially written file
+    behind in place of the original.
 
-          photos - List of PhotoRecord objects to validate.
-          art    - List of ArtRecord objects to validate.
+    Takes 1 argument:
 
-        Returns nothing.
+      filename - Path to the file to replace.
 
-        """
+    Returns 1 value:
 
-        # validate that we did not have any duplicates in our photo record
-        # identifiers.
-        photo_ids = dict()
-        for photo in photos:
-            if photo["id"] in photo_ids:
-                photo_ids[photo["id"]] += 1
-            else:
-                photo_ids[photo["id"]] = 1
-
-        duplicate_photo_ids = [photo_id for photo_id, count in photo_ids.items() if count > 1]
-
-        # validate that we don't have duplicate art record identifiers, as well as
-        # seeing if we have any orphaned art records (read: no parent photo
-        # record).
-        art_ids          = dict()
-        orphaned_art_ids = []
-        for record in art:
-            if record["id"] in art_ids:
-                art_ids[record["id"]] += 1
-            else:
-                art_ids[record["id"]] = 1
+      f - File object to write to.
 
-            if record["photo_id"] not in photo_ids:
-                orphaned_art_ids.append( record["id"] )
+    """
 
-        duplicate_art_ids = [art_id for art_id, count in art_ids.items() if count > 1]
+    # the temporary file needs to be on the same file system so that it can
+    # be atomically renamed.
+    descriptor, temporary_filename = tempfile.mkstemp( dir=os.path.dirname( os.path.abspath( filename ) ),
+                                                       prefix=os.path.basename( filename ) + ".",
+                                                       suffix=".tmp" )
+
+    try:
+        # mkstemp() creates files only we can read, so mimic the permissions
+        # of the file we're replacing, or of a newly created file.
+        if os.path.isfile( filename ):
+            os.chmod( temporary_filename, os.stat( filename ).st_mode & 0o7777 )
+        else:
+            umask = os.umask( 0 )
+            os.umask( umask )
+            os.chmod( temporary_filename, 0o666 & ~umask )
 
-        if len( duplicate_photo_ids ) > 0:
-            raise RuntimeError( "Duplicate photo ID: {:s}.".format( ", ".join( map( str, duplicate_photo_ids ) ) ) )
+        with os.fdopen( descriptor, "wb" ) as f:
+            yield f
 
-        if len( duplicate_art_ids ) > 0:
-            raise RuntimeError( "Duplicate art ID: {:s}.".format( ", ".join( map( str, duplicate_art_ids ) ) ) )
+            # make sure the contents are on disk before they're visible.
+            f.flush()
+            os.fsync( f.fileno() )
 
-        if len( orphaned_art_ids ) > 0:
-            raise RuntimeError( "Orphaned art records: {:s}.".format( ", ".join( map( str, orphaned_art_ids ) ) ) )
+        os.replace( temporary_filename, filename )
+    except:
+        os.remove( temporary_filename )
+        raise
 
-    # read the XML file as a giant string and then convert its DOM into
-    # something we can work with.
-    with open( filename, "rt" ) as xml_file:
-        xml_string = xml_file.read()
-    root_node = etree.fromstring( xml_string )
+class _HashingFile( object ):
+    """
+    Wraps a binary file object opened for writing and computes the SHA-1
+    digest of everything written through it.
+    """
 
-    if len( root_node ) != 3:
-        raise RuntimeError( "Expected 3 elements within the document, but received {:d}.".format( len( root_node ) ) )
+    def __init__( self, f ):
+        """
+        Constructs a _HashingFile that writes to the supplied file object.
 
-    # parse the fields, and our photos and art records.
-    if root_node[0].tag != "Fields":
-        raise RuntimeError( "" )
-    fields = parse_fields_node( root_node[0] )
+        Takes 1 argument:
 
-    if root_node[1].tag != "Photos":
-        raise RuntimeError( "" )
-    photos = parse_photos_node( root_node[1] )
+          f - File object to write to.
 
-    if root_node[2].tag != "Arts":
-        raise RuntimeError( "" )
-    art = parse_arts_node( root_node[2] )
+        Returns 1 value:
 
-    # validate what we received so we don't pass garbage back to the user.
-    validate_art_fields( fields[0], fields[1] )
-    validate_identifiers( photos, art )
+          self - The newly created _HashingFile object.
 
-    # XXX: rework the interface here
-    return (fields[0], fields[1], photos, art)
+        """
 
-def _read_memory_database( ):
-    """
-    Constructs a test database from internal structures.
+        self._file = f
+        self._hash = hashlib.sha1()
 
-    Takes no arguments.
+        # time spent writing to the underlying file, when instrumented.
+        self.write_time = 0.0
 
-    Returns 4 values:
+    def write( self, data ):
+        """
+        Writes data to the underlying file and adds it to the digest.
 
-      art_fields        - Dictionary containing various database field values
-                          associated with art records.  Each key's value is
-                          a list of strings.
-      processing_states - List of values representing the states records may
-                          be in.
-      photo_records     - A list of photo objects, one per record in the
-                          database.
-      art_records       - A list of art objects, one per record in the
-                          database.
+        Takes 1 argument:
 
-    """
+          data - Bytes to write.
 
-    art_types     = ["tag", "throwup", "wild_style", "mural", "sticker", "text", "other"]
-    art_sizes     = ["tiny", "small", "medium", "large", "huge"]
-    art_qualities = ["bad", "poor", "fair", "good", "excellent"]
+        Returns nothing.
 
-    artists = ["Amoz", "Badu", "Daru", "Drip", "EWO", "Fuck", "HBD",
-               "Kolm", "Omar", "PBR", "Rulof", "TV", "Unknown", "Zebra"]
+        """
 
-    processing_states = ["needs_review", "reviewed", "unreviewed"]
+        self._hash.update( data )
 
-    photos = [PhotoRecord( 1, "images/P9400741.JPG", (4112, 3884), "reviewed", (0,0), 0, 1468507707, 1468507707, None, [] ),
-              PhotoRecord( 2, "images/P9400919.JPG", (4112, 3884), "reviewed", (0,0), 0, 1468507608, 1468507608, None, [] ),
-              PhotoRecord( 3, "images/P9410159.JPG", (4112, 3884), "reviewed", (0,0), 0, 1468507668, 1468507668, None, [] ),
-              PhotoRecord( 4, "images/P9430585.JPG", (4112, 3884), "reviewed", (0,0), 0, 1468507638, 1468507638, None, [] ),
-              PhotoRecord( 5, "images/P9440028.JPG", (4112, 3884), "unreviewed", (0,0), 0, 1468507546, 1468507546, None, [] ),
-              PhotoRecord( 6, "images/P9470260.JPG", (4112, 3884), "needs_review", (0,0), 0, 1468507567, 1468507567, None, [] )]
-    art    = [ArtRecord( 1, 1, "throwup", ["Daru"],    [], "large", "good", [], 1234, 1234, None, [], "reviewed", (0.2, 0.13924050632911392, 0.7142857142857143, 0.3291139240506329) ),
-              ArtRecord( 2, 1, "throwup", ["Amoz"],    [], "large", "fair", [], 1234, 1234, None, [], "reviewed", (0.24952380952380954, 0.41012658227848103, 0.3219047619047619, 0.3012658227848101) ),
-              ArtRecord( 3, 1, "throwup", ["EWO"],     [], "large", "fair", [], 1234, 1234, None, [], "reviewed", (0.5619047619047619, 0.3569620253164557, 0.42857142857142855, 0.3367088607594937) ),
-              ArtRecord( 4, 1, "throwup", ["Unknown"], [], "large", "poor", [], 1234, 1234, None, [], "reviewed", (0.015238095238095238, 0.4, 0.26476190476190475, 0.29873417721518986) ),
+        if not grafinstr.is_enabled():
+            self._file.write( data )
+            return
 
-              ArtRecord( 5, 2, "wild_style", ["Fuck"], [], "huge", "excellent", [], 1234, 1234, "2016", [], "reviewed", (0.02857142857142857, 0.31645569620253167, 0.9352380952380952, 0.37721518987341773) ),
+        start_time       = time.perf_counter()
+        self._file.write( data )
+        self.write_time += time.perf_counter() - start_time
 
-              ArtRecord( 6, 3, "throwup", ["Badu"], ["PBR", "Zebra"], "large", "excellent", [], 1234, 1234, "2016", [], "reviewed", (0.0419047619047619, 0.002531645569620253, 0.8819047619047619, 0.9772151898734177) ),
-              ArtRecord( 7, 3, "tag",     ["Badu"], [],               "small", "good", [], 1234, 1234, None, [], "reviewed", (0.878095238095238, 0.6177215189873417, 0.10857142857142857, 0.10886075949367088) ),
-              ArtRecord( 8, 3, "tag",     ["Badu"], [],               "small", "good", [], 1234, 1234, None, [], "reviewed", (0.8838095238095238, 0.1189873417721519, 0.10857142857142857, 0.10126582278481013) ),
+    def hexdigest( self ):
+        """
+        Gets the digest of everything written so far.
 
-              ArtRecord( 9, 4,  "throwup", ["PBR"], ["PBR", "Drip"], "small", "good", [], 1234, 1234, None, [], "reviewed", (0.0019047619047619048, 0.22025316455696203, 0.9447619047619048, 0.5569620253164557) ),
-              ArtRecord( 10, 4, "tag",     ["Drip"],             [], "small", "fair", [], 1234, 1234, None, [], "reviewed", (0.7695238095238095, 0.5341772151898734, 0.12761904761904763, 0.10126582278481013) ),
-              ArtRecord( 11, 4, "tag",     ["MR", "Unknown"],    [], "small", "fair", [], 1234, 1234, None, [], "needs_review", (0.7847619047619048, 0.6481012658227848, 0.09523809523809523, 0.1620253164556962) ),
+        Takes no arguments.
 
-              ArtRecord( 12, 5, "wild_style", ["Unknown"], ["Rulof"], "huge", "good", [], 1234, 1234, None, [], "needs_review", (0.0019047619047619048, 0.2481012658227848, 1.0, 0.47341772151898737) ),
+        Returns 1 value:
 
-              ArtRecord( 13, 6, "mural", ["HBD"], ["Omar"], "large", "fair", [], 1234, 1234, "2014/11/21", [], "reviewed", (0.08, 0.3189873417721519, 0.4247619047619048, 0.4253164556962025) ),
-              ArtRecord( 14, 6, "text",  ["HBD"], [],       "small", "good", [], 1234, 1234, "2014/11/21", [], "reviewed", (0.4, 0.3240506329113924, 0.4266666666666667, 0.379746835443038) )]
+          digest - String containing the hexadecimal SHA-1 digest.
 
-    return ({ "types":     art_types,
-              "sizes":     art_sizes,
-              "qualities": art_qualities,
-              "artists":   artists },
-            processing_states,
-            photos,
-            art)
+        """
+
+        return self._hash.hexdigest()
 
-def _write_xml_database( filename, art_fields, processing_states, photos, arts ):
+def _write_xml_database( filename, art_fields, processing_states, photos, arts, cache=True ):
     """
     Writes an XML representation of the database to the specified file name.
-    The supplied database fields and records are validated and then converted
-    to DOM before serializing it the file.
+    The supplied database fields and records are converted to DOM one record
+    at a time and streamed to the file, so the entire database is never held
+    in serialized form.  File names ending in one of the extensions in
+    _XML_COMPRESSIONS, e.g. "database.xml.gz", are compressed as they're
+    streamed.
 
     If an error occurs during write, a RuntimeError is raised.
 
-    Takes 5 arguments:
+    Takes 6 arguments:
 
       filename          - File name to write the serialized XML to.  If the
                           file already exists, it will be overwritten.
       art_fields        - Dictionary containing various database field values
                           associated with the art records.  Each key's value
-                          is a list of strings.
+                          is a list of strings.  May be specified as None to
+                          omit the Fields section, as is done for shards.
       processing_states - List of values representing the states records may be
-                          in.
+                          in.  Ignored if art_fields is None.
       photos            - A list of PhotoRecord objects, one per record in the
                           database.
       arts              - A list of ArtRecord objects, one per record in the
-                          database.
+                          database.  _UnloadedArtRecords are written as they
+                          were read.
+      cache             - Optional flag specifying whether the snapshot cache
+                          is written alongside the database.  If omitted,
+                          defaults to True.
 
     Returns nothing.
 
@@ -666,560 +1413,5843 @@ def _write_xml_database( filename, art_fields, processing_states, photos, arts )
 
         return fields_node
 
-    def create_photos_node( photos ):
+    def create_photo_node( photo ):
         """
-        Constructs an Element containing all of the specified PhotoRecords
-        converted into children Element nodes.
+        Constructs an Element node from the specified PhotoRecord.
 
         No validation is done for any of the supplied values.
 
         Takes 1 argument:
 
-          photos - List of PhotoRecords to convert into Element nodes.
+          photo - PhotoRecord to convert into an Element node.
 
         Returns 1 value:
 
-          photos_node - The constructed Element node.
+          photo_node - The constructed Element node.
 
         """
 
-        photos_node = etree.Element( "Photos" )
-
-        for photo in photos:
-            photo_node = etree.Element( "Photo" )
+        photo_node = etree.Element( "Photo" )
 
-            photo_node.attrib["created_time"]     = str( photo["created_time"] )
-            photo_node.attrib["filename"]         = photo["filename"]
-            photo_node.attrib["id"]               = str( photo["id"] )
+        photo_node.attrib["created_time"]     = str( photo["created_time"] )
+        photo_node.attrib["filename"]         = photo["filename"]
+        photo_node.attrib["id"]               = str( photo["id"] )
 
-            # don't write out a location attribute if we don't have one.
-            if photo["location"] is not None:
-                photo_node.attrib["location"]     = ", ".join( map( str, photo["location"] ) )
+        # don't write out a location attribute if we don't have one.
+        if photo["location"] is not None:
+            photo_node.attrib["location"]     = ", ".join( map( str, photo["location"] ) )
 
-            photo_node.attrib["modified_time"]    = str( photo["modified_time"] )
-            photo_node.attrib["photo_time"]       = str( photo["photo_time"] )
-            photo_node.attrib["processing_state"] = photo["state"]
-            photo_node.attrib["resolution"]       = "x".join( map( str, photo["resolution"] ) )
-            photo_node.attrib["rotation"]         = str( photo["rotation"] )
-            photo_node.attrib["tags"]             = ", ".join( photo["tags"] )
+        photo_node.attrib["modified_time"]    = str( photo["modified_time"] )
+        photo_node.attrib["photo_time"]       = str( photo["photo_time"] )
+        photo_node.attrib["processing_state"] = photo["state"]
+        photo_node.attrib["resolution"]       = "x".join( map( str, photo["resolution"] ) )
+        photo_node.attrib["rotation"]         = str( photo["rotation"] )
+        photo_node.attrib["tags"]             = ", ".join( photo["tags"] )
 
-            photos_node.append( photo_node )
+        return photo_node
 
-        return photos_node
-
-    def create_arts_node( arts ):
+    def create_art_node( art ):
         """
-        Constructs an Element containing all of the specified ArtRecords
-        converted into children Element nodes.
+        Constructs an Element node from the specified ArtRecord.  Records
+        that were never loaded are returned as the serialized node they were
+        read from.
 
         No validation is done for any of the supplied values.
 
         Takes 1 argument:
 
-          arts - List of ArtRecords to convert into Element nodes.
+          art - ArtRecord or _UnloadedArtRecord to convert into an Element
+                node.
 
         Returns 1 value:
 
-          arts_node - The constructed Element node.
+          art_node - The constructed Element node, or bytes containing the
+                     serialized node.
 
         """
 
-        arts_node = etree.Element( "Arts" )
-
-        for art in arts:
-            art_node = etree.Element( "Art" )
-
-            art_node.attrib["artists"]          = ", ".join( art["artists"] )
-            art_node.attrib["associates"]       = ", ".join( art["associates"] )
-            art_node.attrib["created_time"]     = str( art["created_time"] )
-            art_node.attrib["id"]               = str( art["id"] )
-            art_node.attrib["modified_time"]    = str( art["modified_time"] )
-            art_node.attrib["photo_id"]         = str( art["photo_id"] )
-            art_node.attrib["processing_state"] = art["state"]
-            art_node.attrib["quality"]          = art["quality"]
-
-            # don't write a date attribute if we don't have one.
-            if art["date"] is not None:
-                art_node.attrib["date"]         = art["date"]
+        if isinstance( art, _UnloadedArtRecord ):
+            return art.get_node_bytes()
 
-            # don't write out a region attribute if we don't have one.
-            if art["region"] is not None:
-                art_node.attrib["region"]       = ", ".join( map( str, art["region"] ) )
+        art_node = etree.Element( "Art" )
 
-            art_node.attrib["size"]             = art["size"]
-            art_node.attrib["tags"]             = ", ".join( art["tags"] )
-            art_node.attrib["type"]             = art["type"]
-            art_node.attrib["vandals"]          = ", ".join( art["vandals"] )
+        art_node.attrib["artists"]          = ", ".join( art["artists"] )
+        art_node.attrib["associates"]       = ", ".join( art["associates"] )
+        art_node.attrib["created_time"]     = str( art["created_time"] )
+        art_node.attrib["id"]               = str( art["id"] )
+        art_node.attrib["modified_time"]    = str( art["modified_time"] )
+        art_node.attrib["photo_id"]         = str( art["photo_id"] )
+        art_node.attrib["processing_state"] = art["state"]
+        art_node.attrib["quality"]          = art["quality"]
 
-            arts_node.append( art_node )
+        # don't write a date attribute if we don't have one.
+        if art["date"] is not None:
+            art_node.attrib["date"]         = art["date"]
 
-        return arts_node
+        # don't write out a region attribute if we don't have one.
+        if art["region"] is not None:
+            art_node.attrib["region"]       = ", ".join( map( str, art["region"] ) )
 
-    # create our root element.
-    root_node = etree.Element( "StreetArtDB" )
+        art_node.attrib["size"]             = art["size"]
+        art_node.attrib["tags"]             = ", ".join( art["tags"] )
+        art_node.attrib["type"]             = art["type"]
+        art_node.attrib["vandals"]          = ", ".join( art["vandals"] )
 
-    # XXX: validate everything is internally kosher (have to figure out how to
-    #      factor the reading routines' validation)
+        return art_node
 
-    # add in each of our children nodes describing the field values and
-    # records.
-    root_node.append( create_fields_node( art_fields, processing_states ) )
-    root_node.append( create_photos_node( photos ) )
-    root_node.append( create_arts_node( arts ) )
+    def write_node( xml_file, tag, children, depth ):
+        """
+        Writes an Element node to an incremental XML writer, with children
+        that are generated one at a time.  Only the child currently being
+        written needs to be held in memory, so arbitrarily many children can
+        be written.  Output is indented identically to
+        etree.tostring( ..., pretty_print=True ).
 
-    # serialize our DOM into a string and write it to disk.
-    xml_string = etree.tostring( root_node, pretty_print=True )
+        Takes 4 arguments:
 
-    with open( filename, "wb" ) as f:
-        f.write( xml_string )
+          xml_file - etree.xmlfile writer to write to.
+          tag      - Tag name of the node to write.
+          children - Iterable of Element nodes to write beneath the node.
+                     Children may also be bytes containing a serialized
+                     node, which are written as is.
+          depth    - Nesting depth of the node beneath the document's root.
 
-class Record( object ):
-    """
-    Provides a dictionary-like interface with a fixed set of keys, some
-    mutable, that may be accessed after creation.
-    """
+        Returns nothing.
 
-    def __init__( self, keys, mutable_keys, **kwargs ):
         """
-        Constructs a Record from the supplied list of keys and values.
-
-        Takes 3 arguments:
 
-          keys         - A list of key names whose values are read-only within
-                         the Record.  Each item must be hashable.
-          mutable_keys - A list of key names whose values are read-write within
-                         the Record.  Each item must be hashable.
-          kwargs       - Keyword arguments containing the key/value pairs to
-                         initialize the Record with.  Must contain all of the
-                         entries in keys, though does not have to contain any
-                         of the entries in mutable_keys.
+        children = iter( children )
+        child    = next( children, None )
 
-        Returns 1 value:
+        # childless nodes are written as empty tags, which an element
+        # context wouldn't do.
+        if child is None:
+            xml_file.write( etree.Element( tag ) )
+            return
 
-          self - The newly created Record object.
+        indentation = "\n" + "  " * (depth + 1)
 
-        """
+        with xml_file.element( tag ):
+            while child is not None:
+                xml_file.write( indentation )
 
-        self._info         = {}
-        self._keys         = keys
-        self._mutable_keys = mutable_keys
+                # serialized nodes bypass the writer, so make sure
+                # everything before them has been written first.
+                if isinstance( child, bytes ):
+                    xml_file.flush()
+                    output_file.write( child )
+                elif len( child ) > 0:
+                    write_node( xml_file, child.tag, child, depth + 1 )
+                else:
+                    xml_file.write( child )
 
-        # initialize the record.
-        for key, value in kwargs.items():
-            if not key in self._keys:
-                raise KeyError( "{:s} is not a valid key!".format( key ) )
-            self._info[key] = value
+                child = next( children, None )
 
-        # ensure that all immutable keys have values associated with them.
-        for key in self._keys:
-            if not key in self._info:
-                raise KeyError( "{:s} must be initialized with a value!".format( key ) )
+            xml_file.write( indentation[:-2] )
 
-    def __getitem__( self, key ):
-        """
-        Retrieves the value for an key within the Record.
+    # XXX: validate everything is internally kosher (have to figure out how to
+    #      factor the reading routines' validation)
 
-        Takes 1 argument:
 
-          key - The key whose value is requested.
+    # stream the serialized database to disk, converting one record at a time
+    # so that memory use doesn't grow with the number of records.  the file
+    # is replaced only once it has been completely written.
+    #
+    # NOTE: compressed databases are hashed after compression so that the
+    #       digest matches the file on disk.
+    #
+    compression = _get_xml_compression( filename, sniff=False )
+
+    # when instrumented, the time spent writing to the file, including
+    # making sure it's on disk, is separated from the time spent serializing
+    # the database.
+    start_time = time.perf_counter()
+
+    with _atomic_open( filename ) as f, contextlib.ExitStack() as file_stack:
+        hashing_file = _HashingFile( f )
+        output_file  = hashing_file
+
+        if compression is not None:
+            output_file = file_stack.enter_context( _open_compressed_xml( hashing_file, compression, "wb" ) )
+
+        with etree.xmlfile( output_file ) as xml_file:
+            with xml_file.element( "StreetArtDB" ):
+                if art_fields is not None:
+                    xml_file.write( "\n  " )
+                    write_node( xml_file,
+                                "Fields",
+                                create_fields_node( art_fields, processing_states ),
+                                1 )
+                xml_file.write( "\n  " )
+                write_node( xml_file, "Photos", map( create_photo_node, photos ), 1 )
+                xml_file.write( "\n  " )
+                write_node( xml_file, "Arts", map( create_art_node, arts ), 1 )
+                xml_file.write( "\n" )
+
+        output_file.write( b"\n" )
+
+        # finish the compressed stream before the file is closed.
+        file_stack.close()
+
+        serialize_time = time.perf_counter() - start_time - hashing_file.write_time
+
+    grafinstr.add_time( "xml.serialize", serialize_time )
+    grafinstr.add_time( "xml.write", time.perf_counter() - start_time - serialize_time )
+    grafinstr.increment( "xml.photos_written", len( photos ) )
+    grafinstr.increment( "xml.arts_written", len( arts ) )
+
+    # the database now holds everything, so any journal it had is obsolete.
+    if os.path.isfile( _get_journal_filename( filename ) ):
+        os.remove( _get_journal_filename( filename ) )
+
+    # refresh the snapshot cache so the next load doesn't need to parse what
+    # we just wrote.  records that were never loaded can't be cached.
+    if not cache or any( isinstance( art, _UnloadedArtRecord ) for art in arts ):
+        return
+
+    _write_database_cache( filename,
+                           art_fields,
+                           processing_states,
+                           photos,
+                           arts,
+                           hashing_file.hexdigest() )
+
+# name of the shard holding a sharded database's fields.  every other XML
+# file within a sharded database's directory is a shard holding records.
+_SHARD_HEADER_NAME = "header.xml"
+_SHARD_EXTENSION   = ".xml"
+
+def _get_shard_names( path ):
+    """
+    Gets the names of the shards holding a sharded database's records.
 
-        Returns 1 value:
+    Takes 1 argument:
 
-          value - The value associated with key.
+      path - Path to the sharded database's directory.
 
-        """
+    Returns 1 value:
 
-        return self._info[key]
+      shard_names - Sorted list of the shards' file names, relative to path.
+                    The header shard is not included.
 
-    def __setitem__( self, key, value ):
-        """
-        Sets the value for an key within the Record.  If the supplied key is
-        not mutable, a KeyError is raised.
+    """
 
-        Takes 2 arguments:
+    return sorted( [name for name in os.listdir( path )
+                    if name.endswith( _SHARD_EXTENSION ) and name != _SHARD_HEADER_NAME] )
 
-          key   - The key whose value will be set.
-          value - The value to set.
+def _get_photo_shard_name( photo ):
+    """
+    Gets the name of the shard a photo record is placed in when it isn't
+    already in one.  Photos are sharded by the year they were taken in.
 
-        Returns nothing.
+    Takes 1 argument:
 
-        """
+      photo - PhotoRecord to place.
 
-        if not key in self._mutable_keys:
-            raise KeyError( "{:s} is not a mutable key!".format( key ) )
+    Returns 1 value:
 
-        self._info[key] = value
+      shard_name - File name of the shard.
 
-class ArtRecord( Record ):
     """
-    Database record representing a piece of art associated with a PhotoRecord.
-    The following keys are available (mutable keys are marked with *):
 
-      *artists        Non-empty list of artist names.
-      *associates     List, possibly empty, of artists who are associated with
-                      the work.
-      created_time    Fractional seconds since Epoch when the record was created.
-      *date           String representing the date whe the art was created.
-                      Typically either a four digit year or a variant of
-                      YYYY/MM/DD.
-      id              Unique, positive integer identifier for the art.
-      *modified_time  Fractional seconds since Epoch when the record was last
-                      updated.
-      photo_id        Unique, positive integer identifier for the photo the art
-                      was documented in.
-      *quality        String representing the art's physical quality/state.
-      *region         Geometry tuple containing (x, y, width, height) values
-                      normalized to the parent photo's resolution.
-      *size           String representing the art's physical size.
-      *state          String representing the processing state the record is
-                      in.
-      *tags           List, possibly empty, of tags associated with the art.
-      *type           String specifying the type of the art.
-      *vandals        List, possibly empty, of artists who have vandalized the
-                      art.
+    if not photo["photo_time"]:
+        return "undated" + _SHARD_EXTENSION
+
+    return "{:d}{:s}".format( time.gmtime( photo["photo_time"] ).tm_year, _SHARD_EXTENSION )
 
+def _read_xml_shard_states( filename ):
     """
+    Reads a shard of a sharded database and returns its records as the
+    tuples of values they pickle as.  Used by worker processes, whose results
+    are far cheaper to send back this way.
 
-    def __init__( self, id, photo_id, type, artists=["Unknown"], associates=[], size="medium", quality="fair", vandals=[], created_time=None, modified_time=None, date=None, tags=[], state=None, region=None ):
-        """
-        Constructs an ArtRecord object from the supplied parameters.
+    Takes 1 argument:
 
-        Takes 14 arguments:
+      filename - Path to the shard.
 
-          id            - Identifier for the art record.  Must be a positive
-                          integer, different from other record identifiers.
-          photo_id      - Identifier for the parent PhotoRecord.  Must be a
-                          positive integer.
-          type          - String specifying the type.
-          artists       - Optional, non-empty list of strings specifying the
-                          creators of the art.  If omitted, defaults to
-                          ["Unknown"].
-          associates    - Optional, possibly empty, list of strings specifying
-                          associates of the creators of the art.  If omitted,
-                          defaults to an empty list.
-          size          - Optional string specifying the size of the art.  If
-                          omitted, defaults to "medium".
-          quality       - Optional string specifying the physical quality of
-                          the art.  If omitted, defaults to "fair".
-          vandals       - Optional, possibly empty, list of strings specifying
-                          vandals of the art.  If omitted, defaults to an empty
-                          list.
-          created_time  - Optional fractional seconds since the Epoch
-                          indicating when the art record (not the physical
-                          art) was created.  If omitted, defaults to the current
-                          time.
-          modified_time - Optional fractional seconds since the Epoch
-                          indicating when the art record (not the physical
-                          art) was last modified.  If omitted, defaults to the current
-                          time.
-          date          - Optional year, as a four digit integer, indicating when the
-                          physical art was created.  If omitted, defaults to None.
-          tags          - Optional, possibly empty, list of strings specifying
-                          tags for the art.  If omitted, defaults to an empty
-                          list.
-          state         - Optional string specifying the processing state of the
-                          record.  If omitted, defaults to "unreviewed".
-          region        - Optional tuple of (x, y, width, height) values, normalized
-                          to the parent PhotoRecord's resolution, representing the
-                          art's presence within the photograph.  If omitted, defaults
-                          to None.
+    Returns 2 values:
 
-        Returns 1 value:
+      photo_states - List of state tuples, one per PhotoRecord in the shard.
+      art_states   - List of state tuples, one per ArtRecord in the shard.
 
-          self - The newly created ArtRecord object.
+    """
 
-        """
+    with _paused_garbage_collection():
+        _, _, photos, arts = _read_xml_database( filename, header=False )
 
-        if state is None:
-            state = "unreviewed"
+        return ([photo.__getstate__() for photo in photos],
+                [art.__getstate__() for art in arts])
 
-        if created_time is None:
-            created_time = time.mktime( time.gmtime() )
+@grafinstr.instrumented( "shards.read" )
+def _read_sharded_database( path, lazy=False, processes=None ):
+    """
+    Reads a sharded database from the specified directory.  The fields are
+    read from the header shard, and the records from every other shard.
+    Shards are parsed in parallel by a pool of worker processes.
 
-        if modified_time is None:
-            modified_time = created_time
+    Takes 3 arguments:
 
-        _readable_keys = ["artists", "associates", "created_time", "date",
-                          "id", "modified_time", "photo_id", "quality",
-                          "region", "size", "state", "tags", "type", "vandals"]
-        _mutable_keys = ["artists", "associates", "date", "modified_time",
-                         "quality", "region", "size", "state", "tags", "type",
-                         "vandals"]
+      path      - Path to the sharded database's directory.
+      lazy      - Optional flag specifying whether art records are read
+                  lazily.  Lazily read shards are read by the calling
+                  process, as their art records refer to the shards' contents.
+                  If omitted, defaults to False.
+      processes - Optional number of worker processes used to parse the
+                  shards.  If omitted, defaults to os.cpu_count().  Shards are
+                  parsed by the calling process if this is less than 2.
 
-        # XXX: validation of type, artists (must not be empty), associates,
-        #      size, quality, vandals, and state
-        # XXX: higher level validation of id and photo_id
+    Returns 5 values:
 
-        super().__init__( _readable_keys,
-                          _mutable_keys,
-                          artists=artists,
-                          associates=associates,
-                          created_time=created_time,
-                          date=date,
-                          id=id,
-                          modified_time=modified_time,
-                          photo_id=photo_id,
-                          quality=quality,
-                          region=region,
-                          size=size,
-                          state=state,
-                          tags=tags,
-                          type=type,
-                          vandals=vandals )
+      art_fields        - Dictionary containing various database field values
+                          associated with art records.  Each key's value is
+                          a list of strings.
+      processing_states - List of values representing the states records may
+                          be in.
+      photo_records     - A list of photo objects, one per record in the
+                          database, ordered by identifier.
+      art_records       - A list of art objects, one per record in the
+                          database, ordered by identifier.
+      photo_shards      - Dictionary mapping photo identifiers to the name of
+                          the shard holding them, and their art records.
+
+    """
+
+    art_fields, processing_states, _, _ = _read_xml_database( os.path.join( path, _SHARD_HEADER_NAME ) )
+
+    shard_names = _get_shard_names( path )
+    shard_paths = [os.path.join( path, shard_name ) for shard_name in shard_names]
+
+    if processes is None:
+        processes = os.cpu_count()
+
+    if lazy or processes is None or processes < 2 or len( shard_paths ) < 2:
+        shards = [_read_xml_database( shard_path, lazy=lazy, header=False )[2:] for shard_path in shard_paths]
+    else:
+        with concurrent.futures.ProcessPoolExecutor( max_workers=min( processes, len( shard_paths ) ) ) as executor:
+            shards = [(_restore_records( PhotoRecord, photo_states ),
+                       _restore_records( ArtRecord, art_states ))
+                      for photo_states, art_states in executor.map( _read_xml_shard_states, shard_paths )]
+
+    photos       = []
+    arts         = []
+    photo_shards = dict()
+
+    for shard_name, (shard_photos, shard_arts) in zip( shard_names, shards ):
+        photos.extend( shard_photos )
+        arts.extend( shard_arts )
+
+        for photo in shard_photos:
+            photo_shards[photo["id"]] = shard_name
+
+    # shards group records by year, so put them back in the order every
+    # other backing store holds them.
+    photos.sort( key=lambda photo: photo["id"] )
+    arts.sort( key=lambda art: art["id"] )
+
+    # each shard was validated on its own, which ensures that art records are
+    # in the same shard as their photo.  identifiers must also be unique
+    # across every shard.
+    _validate_identifiers( photos, arts )
+
+    return (art_fields, processing_states, photos, arts, photo_shards)
+
+@grafinstr.instrumented( "shards.write" )
+def _write_sharded_database( path, art_fields, processing_states, shards, replace=False ):
+    """
+    Writes some, or all, of a sharded database to the specified directory.
+    Each shard is written in its entirety, and shards that aren't supplied
+    are left untouched.  The directory is created if it doesn't exist.
+
+    Takes 5 arguments:
+
+      path              - Path to the sharded database's directory.
+      art_fields        - Dictionary containing various database field values
+                          associated with the art records.  May be specified
+                          as None to leave the header shard untouched.
+      processing_states - List of values representing the states records may
+                          be in.  Ignored if art_fields is None.
+      shards            - Dictionary mapping shard names to tuples of (photos,
+                          arts) to write to each.
+      replace           - Optional flag specifying whether the supplied shards
+                          are the entire database.  If so, the directory may
+                          not contain other shards, since they'd become part
+                          of the database.  If omitted, defaults to False.
+
+    Returns nothing.
+
+    """
+
+    os.makedirs( path, exist_ok=True )
+
+    if replace:
+        unknown_shard_names = set( _get_shard_names( path ) ) - set( shards.keys() )
+        if len( unknown_shard_names ) > 0:
+            raise RuntimeError( "{:s} contains shards that aren't part of the database being written ({:s}).".format(
+                path,
+                ", ".join( sorted( unknown_shard_names ) ) ) )
+
+    for shard_name, (photos, arts) in shards.items():
+        _write_xml_database( os.path.join( path, shard_name ),
+                             None,
+                             None,
+                             photos,
+                             arts,
+                             cache=False )
+
+    # the header is written last so that a database is only recognized once
+    # its shards exist.
+    if art_fields is not None:
+        _write_xml_database( os.path.join( path, _SHARD_HEADER_NAME ),
+                             art_fields,
+                             processing_states,
+                             [],
+                             [],
+                             cache=False )
+
+# version of the SQLite schema written by _create_sqlite_schema().  stored in
+# the database's user_version so that we can refuse files we don't
+# understand.
+_SQLITE_SCHEMA_VERSION = 1
+
+# extensions that select the SQLite backing store.  anything else, aside from
+# the special "memory" name, is treated as XML.
+_SQLITE_EXTENSIONS = [".db", ".sqlite", ".sqlite3"]
+
+def _get_database_backend( filename ):
+    """
+    Determines which backing store the supplied database name refers to.
+    SQLite databases are selected either by a "sqlite:" URI prefix (e.g.
+    "sqlite:///path/to/database.db" or "sqlite:database.db") or by one of the
+    extensions in _SQLITE_EXTENSIONS.  Sharded databases are selected by an
+    existing directory, or a name ending with a path separator.  The name
+    "memory" refers to the internal test database and everything else is
+    treated as an XML file.
+
+    Takes 1 argument:
+
+      filename - Name of the database's backing store.
+
+    Returns 2 values:
+
+      backend - String naming the backend: "memory", "sqlite", "shards", or
+                "xml".
+      path    - Path to the backing store on disk.  None when backend is
+                "memory".
+
+    """
+
+    if filename is None or filename == "memory":
+        return ("memory", None)
+
+    # strip the URI scheme so the remainder is a path on disk.  three slashes
+    # indicate an absolute path, just as with file URIs.
+    if filename.startswith( "sqlite:" ):
+        path = filename[len( "sqlite:" ):]
+        if path.startswith( "//" ):
+            path = path[2:]
+
+        return ("sqlite", path)
+
+    if os.path.splitext( filename )[1].lower() in _SQLITE_EXTENSIONS:
+        return ("sqlite", filename)
+
+    if os.path.isdir( filename ) or filename.endswith( os.sep ):
+        return ("shards", filename)
+
+    return ("xml", filename)
+
+def _create_sqlite_schema( connection ):
+    """
+    Creates the tables and indices for a SQLite database if they do not
+    already exist.  Field values are stored as ordered (name, position, value)
+    triples, and list-valued record fields are stored as JSON arrays.
+
+    Photos are indexed by the time they were taken and their state, and art
+    records by their photo and state, so that Database lookups can be
+    answered by the database, see Database._get_sqlite_connection().
+
+    Takes 1 argument:
+
+      connection - sqlite3.Connection to create the schema in.
+
+    Returns nothing.
+
+    """
+
+    connection.executescript( """
+        CREATE TABLE IF NOT EXISTS fields ( name     TEXT    NOT NULL,
+                                            position INTEGER NOT NULL,
+                                            value    TEXT    NOT NULL,
+                                            PRIMARY KEY (name, position) );
+
+        CREATE TABLE IF NOT EXISTS photos ( id            INTEGER PRIMARY KEY,
+                                            filename      TEXT    NOT NULL,
+                                            created_time  REAL    NOT NULL,
+                                            modified_time REAL    NOT NULL,
+                                            photo_time    REAL    NOT NULL,
+                                            latitude      REAL,
+                                            longitude     REAL,
+                                            width         INTEGER,
+                                            height        INTEGER,
+                                            rotation      INTEGER NOT NULL,
+                                            state         TEXT    NOT NULL,
+                                            tags          TEXT    NOT NULL );
+        CREATE INDEX IF NOT EXISTS photos_photo_time ON photos (photo_time);
+        CREATE INDEX IF NOT EXISTS photos_state      ON photos (state);
+
+        CREATE TABLE IF NOT EXISTS arts ( id            INTEGER PRIMARY KEY,
+                                          photo_id      INTEGER NOT NULL,
+                                          type          TEXT    NOT NULL,
+                                          size          TEXT    NOT NULL,
+                                          quality       TEXT    NOT NULL,
+                                          state         TEXT    NOT NULL,
+                                          date          TEXT,
+                                          created_time  REAL    NOT NULL,
+                                          modified_time REAL    NOT NULL,
+                                          region_x      REAL,
+                                          region_y      REAL,
+                                          region_width  REAL,
+                                          region_height REAL,
+                                          artists       TEXT    NOT NULL,
+                                          associates    TEXT    NOT NULL,
+                                          vandals       TEXT    NOT NULL,
+                                          tags          TEXT    NOT NULL );
+        CREATE INDEX IF NOT EXISTS arts_photo_id ON arts (photo_id);
+        CREATE INDEX IF NOT EXISTS arts_state    ON arts (state);
+    """ )
+
+    connection.execute( "PRAGMA user_version = {:d}".format( _SQLITE_SCHEMA_VERSION ) )
+
+def _photo_to_sqlite_row( photo ):
+    """
+    Converts a PhotoRecord into a row suitable for the SQLite photos table.
+
+    Takes 1 argument:
+
+      photo - PhotoRecord to convert.
+
+    Returns 1 value:
+
+      row - Tuple of column values, in table order.
+
+    """
+
+    if photo["location"] is None:
+        latitude, longitude = None, None
+    else:
+        latitude, longitude = photo["location"]
+
+    if photo["resolution"] is None:
+        width, height = None, None
+    else:
+        width, height = photo["resolution"]
+
+    return (photo["id"],
+            photo["filename"],
+            photo["created_time"],
+            photo["modified_time"],
+            photo["photo_time"],
+            latitude,
+            longitude,
+            width,
+            height,
+            photo["rotation"],
+            photo["state"],
+            json.dumps( list( photo["tags"] ) ))
+
+def _art_to_sqlite_row( art ):
+    """
+    Converts an ArtRecord into a row suitable for the SQLite arts table.
+
+    Takes 1 argument:
+
+      art - ArtRecord to convert.
+
+    Returns 1 value:
+
+      row - Tuple of column values, in table order.
+
+    """
+
+    if art["region"] is None:
+        region = (None, None, None, None)
+    else:
+        region = tuple( art["region"] )
+
+    return (art["id"],
+            art["photo_id"],
+            art["type"],
+            art["size"],
+            art["quality"],
+            art["state"],
+            art["date"],
+            art["created_time"],
+            art["modified_time"],
+            *region,
+            json.dumps( list( art["artists"] ) ),
+            json.dumps( list( art["associates"] ) ),
+            json.dumps( list( art["vandals"] ) ),
+            json.dumps( list( art["tags"] ) ))
+
+def _write_sqlite_fields( connection, art_fields, processing_states ):
+    """
+    Replaces the field values stored in a SQLite database.  The fields are
+    small enough that they're always written in their entirety.
+
+    Takes 3 arguments:
+
+      connection        - sqlite3.Connection to write to.
+      art_fields        - Dictionary containing various database field values
+                          associated with the art records.  Each key's value
+                          is a list of strings.
+      processing_states - List of values representing the states records may
+                          be in.
+
+    Returns nothing.
+
+    """
+
+    field_rows = []
+    for name in ["types", "sizes", "qualities", "artists"]:
+        field_rows.extend( [(name, position, value) for position, value in enumerate( art_fields[name] )] )
+    field_rows.extend( [("processing_states", position, value) for position, value in enumerate( processing_states )] )
+
+    connection.execute( "DELETE FROM fields" )
+    connection.executemany( "INSERT INTO fields VALUES (?, ?, ?)", field_rows )
+
+# largest number of values bound to a single SQLite query.  older versions of
+# SQLite refuse statements with more than 999 parameters.
+_SQLITE_QUERY_BATCH_SIZE = 500
+
+def _get_sqlite_file_state( filename ):
+    """
+    Gets the state of a SQLite database file, which changes whenever the
+    database is modified.  This is the file change counter from the database's
+    header, which SQLite increments with each transaction that modifies the
+    database, along with the file's inode so that a replaced file is noticed.
+
+    NOTE: the change counter isn't maintained in write-ahead logging mode,
+          which we never use.
+
+    Takes 1 argument:
+
+      filename - Path to the SQLite database.
+
+    Returns 1 value:
+
+      file_state - Tuple of the file's inode and change counter, or None if
+                   the file cannot be read.
+
+    """
+
+    try:
+        with open( filename, "rb" ) as f:
+            f.seek( 24 )
+
+            return (os.fstat( f.fileno() ).st_ino, int.from_bytes( f.read( 4 ), "big" ))
+    except OSError:
+        return None
+
+def _query_sqlite_values( connection, statement, values ):
+    """
+    Runs a query selecting rows by a list of values, binding the values in
+    batches of at most _SQLITE_QUERY_BATCH_SIZE.
+
+    Takes 3 arguments:
+
+      connection - sqlite3.Connection to query.
+      statement  - SELECT statement with a "{:s}" placeholder for the list of
+                   parameters, e.g. "SELECT id FROM photos WHERE id IN ({:s})".
+      values     - List of values to bind to the parameters.
+
+    Returns 1 value:
+
+      rows - List of rows selected, in order within each batch.
+
+    """
+
+    rows = []
+
+    for index in range( 0, len( values ), _SQLITE_QUERY_BATCH_SIZE ):
+        batch = values[index:index + _SQLITE_QUERY_BATCH_SIZE]
+
+        rows.extend( connection.execute( statement.format( ", ".join( ["?"] * len( batch ) ) ),
+                                         batch ).fetchall() )
+
+    return rows
+
+@grafinstr.instrumented( "sqlite.read" )
+def _read_sqlite_database( filename ):
+    """
+    Reads the database from the specified SQLite file.  The contents are
+    validated in the same manner as the XML database.
+
+    Takes 1 argument:
+
+      filename - Path to the SQLite file containing the database contents.
+
+    Returns 4 values:
+
+      art_fields        - Dictionary containing various database field values
+                          associated with art records.  Each key's value is
+                          a list of strings.
+      processing_states - List of values representing the states records may
+                          be in.
+      photo_records     - A list of photo objects, one per record in the
+                          database.
+      art_records       - A list of art objects, one per record in the
+                          database.
+
+    """
+
+    # don't let sqlite3 silently create an empty database for us.
+    if not os.path.isfile( filename ):
+        raise RuntimeError( "SQLite database '{:s}' does not exist.".format( filename ) )
+
+    connection = sqlite3.connect( filename )
+    try:
+        schema_version = connection.execute( "PRAGMA user_version" ).fetchone()[0]
+        if schema_version != _SQLITE_SCHEMA_VERSION:
+            raise RuntimeError( "Unsupported SQLite schema version {:d} (expected {:d}).".format( schema_version,
+                                                                                                 _SQLITE_SCHEMA_VERSION ) )
+
+        # rebuild the fields in the order they were written.
+        fields = collections.defaultdict( list )
+        for name, value in connection.execute( "SELECT name, value FROM fields ORDER BY name, position" ):
+            fields[name].append( value )
+
+        art_fields = { "types":     fields["types"],
+                       "sizes":     fields["sizes"],
+                       "qualities": fields["qualities"],
+                       "artists":   fields["artists"] }
+        processing_states = fields["processing_states"]
+
+        photos = []
+        for (id, photo_filename, created_time, modified_time, photo_time,
+             latitude, longitude, width, height, rotation, state,
+             tags) in connection.execute( "SELECT * FROM photos ORDER BY id" ):
+
+            # mirror the XML database's representations of missing values.
+            location   = None if latitude is None else [latitude, longitude]
+            resolution = None if width is None else [width, height]
+
+            photos.append( PhotoRecord( id,
+                                        photo_filename,
+                                        created_time=created_time,
+                                        location=location,
+                                        modified_time=modified_time,
+                                        photo_time=photo_time,
+                                        resolution=resolution,
+                                        rotation=rotation,
+                                        state=state,
+                                        tags=json.loads( tags ) ) )
+
+        art = []
+        for (id, photo_id, art_type, size, quality, state, date,
+             created_time, modified_time, region_x, region_y, region_width,
+             region_height, artists, associates, vandals,
+             tags) in connection.execute( "SELECT * FROM arts ORDER BY id" ):
+
+            if region_x is None:
+                region = None
+            else:
+                region = (region_x, region_y, region_width, region_height)
+
+            art.append( ArtRecord( id,
+                                   photo_id,
+                                   art_type,
+                                   artists=json.loads( artists ),
+                                   associates=json.loads( associates ),
+                                   created_time=created_time,
+                                   date=date,
+                                   modified_time=modified_time,
+                                   quality=quality,
+                                   region=region,
+                                   size=size,
+                                   state=state,
+                                   tags=json.loads( tags ),
+                                   vandals=json.loads( vandals ) ) )
+    finally:
+        connection.close()
+
+    # validate what we received so we don't pass garbage back to the user.
+    _validate_art_fields( art_fields, processing_states )
+    _validate_identifiers( photos, art )
+
+    return (art_fields, processing_states, photos, art)
+
+@grafinstr.instrumented( "sqlite.write" )
+def _write_sqlite_database( filename, art_fields, processing_states, photos, arts, deleted_photo_ids=None, deleted_art_ids=None ):
+    """
+    Writes the database to the specified SQLite file within a single
+    transaction.  Writes are either complete, replacing everything in the file
+    with the supplied records, or incremental, where only the supplied records
+    are inserted or updated and the identified records are removed.
+
+    If an error occurs during the write, none of the changes are applied.
+
+    Takes 7 arguments:
+
+      filename          - Path to the SQLite file to write.  Created if it
+                          does not exist.
+      art_fields        - Dictionary containing various database field values
+                          associated with the art records.  Each key's value
+                          is a list of strings.
+      processing_states - List of values representing the states records may
+                          be in.
+      photos            - A list of PhotoRecord objects to write.
+      arts              - A list of ArtRecord objects to write.
+      deleted_photo_ids - Optional list of photo identifiers to remove.  If
+                          omitted, and deleted_art_ids is also omitted, the
+                          write is complete rather than incremental.
+      deleted_art_ids   - Optional list of art identifiers to remove.  If
+                          omitted, and deleted_photo_ids is also omitted, the
+                          write is complete rather than incremental.
+
+    Returns nothing.
+
+    """
+
+    incremental_flag = (deleted_photo_ids is not None) or (deleted_art_ids is not None)
+
+    connection = sqlite3.connect( filename )
+    try:
+        # the context manager commits everything on success and rolls back
+        # on failure.
+        with connection:
+            _create_sqlite_schema( connection )
+
+            if incremental_flag:
+                connection.executemany( "DELETE FROM photos WHERE id = ?",
+                                        [(photo_id,) for photo_id in (deleted_photo_ids or [])] )
+                connection.executemany( "DELETE FROM arts WHERE id = ?",
+                                        [(art_id,) for art_id in (deleted_art_ids or [])] )
+            else:
+                connection.execute( "DELETE FROM photos" )
+                connection.execute( "DELETE FROM arts" )
+
+            _write_sqlite_fields( connection, art_fields, processing_states )
+
+            connection.executemany( "INSERT OR REPLACE INTO photos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                    map( _photo_to_sqlite_row, photos ) )
+            connection.executemany( "INSERT OR REPLACE INTO arts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                    map( _art_to_sqlite_row, arts ) )
+    finally:
+        connection.close()
+
+# suffix appended to an XML database's file name to get its journal's file
+# name.
+_JOURNAL_SUFFIX = ".journal"
+
+# suffix appended to an XML database's file name to get its snapshot cache's
+# file name, and the version of the cache's contents.  bump the version when
+# the records' keys or the cache's format change.
+_CACHE_SUFFIX  = ".cache"
+_CACHE_VERSION = 2
+
+def _get_journal_filename( filename ):
+    """
+    Gets the file name of the change journal associated with an XML
+    database.
+
+    Takes 1 argument:
+
+      filename - Path to the XML database.
+
+    Returns 1 value:
+
+      journal_filename - Path to the XML database's journal.
+
+    """
+
+    return filename + _JOURNAL_SUFFIX
+
+def _hash_file( filename ):
+    """
+    Computes the SHA-1 digest of a file's contents.
+
+    Takes 1 argument:
+
+      filename - Path to the file to hash.
+
+    Returns 1 value:
+
+      digest - Hexadecimal string of the file's SHA-1 digest.
+
+    """
+
+    file_hash = hashlib.sha1()
+
+    with open( filename, "rb" ) as f:
+        for chunk in iter( lambda: f.read( 1024 * 1024 ), b"" ):
+            file_hash.update( chunk )
+
+    return file_hash.hexdigest()
+
+def _get_cache_filename( filename ):
+    """
+    Gets the file name of the snapshot cache associated with an XML database.
+
+    Takes 1 argument:
+
+      filename - Path to the XML database.
+
+    Returns 1 value:
+
+      cache_filename - Path to the XML database's snapshot cache.
+
+    """
+
+    return filename + _CACHE_SUFFIX
+
+@grafinstr.instrumented( "cache.read" )
+def _read_database_cache( filename ):
+    """
+    Reads the contents of an XML database from its snapshot cache.  The cache
+    is only used when it was made from a database with the same size,
+    modification time, and contents as the database currently on disk.  A
+    missing, stale, or corrupt cache is ignored.
+
+    Takes 1 argument:
+
+      filename - Path to the XML database whose cache is read.
+
+    Returns 4 values when the cache is usable, None otherwise:
+
+      art_fields        - Dictionary containing various database field values
+                          associated with art records.  Each key's value is
+                          a list of strings.
+      processing_states - List of values representing the states records may
+                          be in.
+      photo_records     - A list of photo objects, one per record in the
+                          database.
+      art_records       - A list of art objects, one per record in the
+                          database.
+
+    """
+
+    try:
+        database_stat = os.stat( filename )
+
+        with open( _get_cache_filename( filename ), "rb" ) as f:
+            with _paused_garbage_collection():
+                cache = json.loads( f.read() )
+
+        # check the cheap properties before hashing the database.
+        if (cache["version"] != _CACHE_VERSION or
+            cache["size"] != database_stat.st_size or
+            cache["mtime_ns"] != database_stat.st_mtime_ns or
+            cache["sha1"] != _hash_file( filename )):
+            return None
+
+        with _paused_garbage_collection():
+            photos = _restore_cached_records( PhotoRecord, cache["photos"] )
+            arts   = _restore_cached_records( ArtRecord, cache["arts"], tuple_keys=("region",) )
+
+        return (cache["art_fields"], cache["processing_states"], photos, arts)
+
+    except Exception:
+        return None
+
+def _get_parsed_strings( values, parsed_strings, default=() ):
+    """
+    Gets the tuple of strings that parsing a sequence of strings' attribute
+    would produce, see _parse_strings().
+
+    Takes 3 arguments:
+
+      values         - Sequence of strings written to the attribute.
+      parsed_strings - Dictionary of the tuples already parsed, keyed by
+                       their default and the sequence written.  Records
+                       share most of their tuples, so each is only parsed
+                       once.
+      default        - Optional tuple of strings parsed from an empty
+                       attribute.  If omitted, defaults to an empty tuple.
+
+    Returns 1 value:
+
+      strings - Tuple of interned strings.
+
+    """
+
+    key = (default, tuple( values ))
+
+    strings = parsed_strings.get( key )
+    if strings is None:
+        strings             = _parse_strings( ", ".join( values ), default )
+        parsed_strings[key] = strings
+
+    return strings
+
+def _get_parsed_photo_state( photo, parsed_strings ):
+    """
+    Gets the state of the PhotoRecord that parsing a photo's Photo node would
+    produce.  Records created or modified in memory may hold values that
+    parse differently, e.g. integer times, or locations as tuples.
+
+    Takes 2 arguments:
+
+      photo          - PhotoRecord whose state is computed.
+      parsed_strings - Dictionary of parsed tuples of strings, see
+                       _get_parsed_strings().
+
+    Returns 1 value:
+
+      state - List of the parsed record's values, in the order of
+              PhotoRecord's keys.
+
+    """
+
+    # NOTE: this mirrors _parse_photo_node() applied to the node
+    #       _write_xml_database() creates.  keys are in PhotoRecord._keys'
+    #       order.
+    #
+    # empty locations and resolutions are written as empty attributes,
+    # which parse as None.
+    location   = photo["location"]
+    resolution = photo["resolution"]
+
+    if location is not None:
+        location = [float( where ) for where in location] or None
+    if resolution is not None:
+        resolution = [int( size ) for size in resolution] or None
+
+    return [float( photo["created_time"] ),
+            photo["filename"],
+            int( photo["id"] ),
+            location,
+            float( photo["modified_time"] ),
+            float( photo["photo_time"] ),
+            resolution,
+            int( photo["rotation"] ),
+            photo["state"],
+            _get_parsed_strings( photo["tags"], parsed_strings )]
+
+def _get_parsed_art_state( art, parsed_strings ):
+    """
+    Gets the state of the ArtRecord that parsing an art's Art node would
+    produce.  Records created or modified in memory may hold values that
+    parse differently, e.g. dates of None rather than "".
+
+    Takes 2 arguments:
+
+      art            - ArtRecord whose state is computed.
+      parsed_strings - Dictionary of parsed tuples of strings, see
+                       _get_parsed_strings().
+
+    Returns 1 value:
+
+      state - List of the parsed record's values, in the order of
+              ArtRecord's keys.
+
+    """
+
+    # NOTE: this mirrors _parse_art_node() applied to the node
+    #       _write_xml_database() creates.  keys are in ArtRecord._keys'
+    #       order.
+    #
+    region = art["region"]
+    if region is not None:
+        region = tuple( [float( value ) for value in region] )
+
+    return [_get_parsed_strings( art["artists"], parsed_strings, ("Unknown",) ),
+            _get_parsed_strings( art["associates"], parsed_strings ),
+            float( art["created_time"] ),
+            art["date"] if art["date"] is not None else "",
+            int( art["id"] ),
+            float( art["modified_time"] ),
+            int( art["photo_id"] ),
+            art["quality"],
+            region,
+            art["size"],
+            art["state"],
+            _get_parsed_strings( art["tags"], parsed_strings ),
+            art["type"],
+            _get_parsed_strings( art["vandals"], parsed_strings )]
+
+def _restore_cached_records( record_class, states, tuple_keys=() ):
+    """
+    Creates records from the states read from a snapshot cache.  JSON has no
+    tuples, so the sequences held as tuples are converted back, and strings
+    are interned as they are when the database is parsed.
+
+    Takes 3 arguments:
+
+      record_class - Class of the records to create, either PhotoRecord or
+                     ArtRecord.
+      states       - Iterable of record states, see Record.__getstate__(),
+                     with their tuples read as lists.
+      tuple_keys   - Optional sequence of the keys, other than those holding
+                     sequences of strings, whose values are tuples.  If
+                     omitted, defaults to an empty tuple.
+
+    Returns 1 value:
+
+      records - List of record_class objects, one per state.
+
+    """
+
+    keys            = record_class._keys
+    string_indices  = [key_index for key_index, key in enumerate( keys ) if key in record_class._string_keys]
+    strings_indices = [key_index for key_index, key in enumerate( keys ) if key in record_class._strings_keys]
+    tuple_indices   = [key_index for key_index, key in enumerate( keys ) if key in tuple_keys]
+
+    records = []
+
+    for state in states:
+        for key_index in string_indices:
+            state[key_index] = _intern_string( state[key_index] )
+        for key_index in strings_indices:
+            if state[key_index] is not None:
+                state[key_index] = _intern_strings( state[key_index] )
+        for key_index in tuple_indices:
+            if state[key_index] is not None:
+                state[key_index] = tuple( state[key_index] )
+
+        record = record_class.__new__( record_class )
+        record.__setstate__( state )
+        records.append( record )
+
+    return records
+
+@grafinstr.instrumented( "cache.write" )
+def _write_database_cache( filename, art_fields, processing_states, photos, arts, sha1=None ):
+    """
+    Writes the snapshot cache for an XML database.  Failing to write the
+    cache is not an error since the database can always be read instead.
+
+    The cache is JSON, rather than pickled, so that reading a cache left in
+    a shared directory can't execute code.
+
+    Takes 6 arguments:
+
+      filename          - Path to the XML database whose cache is written.
+                          The database must exist and contain the supplied
+                          fields and records.
+      art_fields        - Dictionary containing various database field values
+                          associated with art records.
+      processing_states - List of values representing the states records may
+                          be in.
+      photos            - A list of PhotoRecord objects in the database.
+      arts              - A list of ArtRecord objects in the database.
+      sha1              - Optional hexadecimal string of the database's SHA-1
+                          digest.  If omitted, it is computed from the
+                          database.
+
+    Returns nothing.
+
+    """
+
+    try:
+        database_stat = os.stat( filename )
+
+        if sha1 is None:
+            sha1 = _hash_file( filename )
+
+        # records are stored as lists of their values, which serialize far
+        # faster than dictionaries of them.  the values are those parsing
+        # the database produces, rather than those held in memory, so that
+        # loading from the cache is indistinguishable from parsing.
+        parsed_strings = dict()
+
+        cache = { "version":           _CACHE_VERSION,
+                  "size":              database_stat.st_size,
+                  "mtime_ns":          database_stat.st_mtime_ns,
+                  "sha1":              sha1,
+                  "art_fields":        art_fields,
+                  "processing_states": processing_states,
+                  "photos":            [_get_parsed_photo_state( photo, parsed_strings ) for photo in photos],
+                  "arts":              [_get_parsed_art_state( art, parsed_strings ) for art in arts] }
+
+        with _atomic_open( _get_cache_filename( filename ) ) as f:
+            f.write( json.dumps( cache, separators=(",", ":") ).encode( "utf-8" ) )
+
+    except Exception:
+        pass
+
+@grafinstr.instrumented( "mapped.write" )
+def _write_mapped_database( filename, art_fields, processing_states, photos, arts ):
+    """
+    Writes the database in the fixed layout read by MappedDatabase: one
+    array per record key, with strings replaced by indices into a shared
+    string table and lists of strings stored as the concatenation of every
+    record's list along with offsets into it.  Missing locations, regions,
+    and resolutions are stored as NaNs and -1s, and missing strings as -1.
+
+    Orderings of the records by identifier, photo time, and parent photo
+    are stored as well so that lookups don't need to build indices.
+
+    Takes 5 arguments:
+
+      filename          - File name to write to.  If the file already exists,
+                          it is replaced.
+      art_fields        - Dictionary containing various database field values
+                          associated with the art records.
+      processing_states - List of values representing the states records may
+                          be in.
+      photos            - A list of PhotoRecord objects in the database.
+      arts              - A list of ArtRecord objects in the database.  Must
+                          not contain _UnloadedArtRecords.
+
+    Returns nothing.
+
+    """
+
+    def get_values( records, key ):
+        return [record[key] for record in records]
+
+    def get_sequences( records, key, length, missing ):
+        values = np.full( (len( records ), length), missing )
+
+        for row, record in enumerate( records ):
+            if record[key] is not None:
+                values[row] = record[key]
+
+        return values
+
+    strings = grafmapped.StringTable()
+    arrays  = dict()
+
+    arrays["photo_id"]            = np.array( get_values( photos, "id" ), dtype=np.int64 )
+    arrays["photo_filename"]      = strings.encode( get_values( photos, "filename" ) )
+    arrays["photo_state"]         = strings.encode( get_values( photos, "state" ) )
+    arrays["photo_location"]      = get_sequences( photos, "location", 2, np.nan )
+    arrays["photo_resolution"]    = get_sequences( photos, "resolution", 2, -1 ).astype( np.int64 )
+    arrays["photo_rotation"]      = np.array( get_values( photos, "rotation" ), dtype=np.int64 )
+    arrays["photo_created_time"]  = np.array( get_values( photos, "created_time" ), dtype=np.float64 )
+    arrays["photo_modified_time"] = np.array( get_values( photos, "modified_time" ), dtype=np.float64 )
+    arrays["photo_photo_time"]    = np.array( get_values( photos, "photo_time" ), dtype=np.float64 )
+    arrays["photo_tags_offsets"], arrays["photo_tags"] = strings.encode_lists( get_values( photos, "tags" ) )
+
+    arrays["art_id"]              = np.array( get_values( arts, "id" ), dtype=np.int64 )
+    arrays["art_photo_id"]        = np.array( get_values( arts, "photo_id" ), dtype=np.int64 )
+    arrays["art_type"]            = strings.encode( get_values( arts, "type" ) )
+    arrays["art_size"]            = strings.encode( get_values( arts, "size" ) )
+    arrays["art_quality"]         = strings.encode( get_values( arts, "quality" ) )
+    arrays["art_state"]           = strings.encode( get_values( arts, "state" ) )
+    arrays["art_date"]            = strings.encode( [None if date is None else str( date )
+                                                     for date in get_values( arts, "date" )] )
+    arrays["art_region"]          = get_sequences( arts, "region", 4, np.nan )
+    arrays["art_created_time"]    = np.array( get_values( arts, "created_time" ), dtype=np.float64 )
+    arrays["art_modified_time"]   = np.array( get_values( arts, "modified_time" ), dtype=np.float64 )
+    for key in ["artists", "associates", "tags", "vandals"]:
+        arrays["art_" + key + "_offsets"], arrays["art_" + key] = strings.encode_lists( get_values( arts, key ) )
+
+    # stable orderings so that records with equal keys stay in database
+    # order, and the keys in those orders so that lookups can search the
+    # mapped arrays without sorting them first.
+    arrays["photo_id_order"]      = np.argsort( arrays["photo_id"], kind="stable" )
+    arrays["photo_time_order"]    = np.argsort( arrays["photo_photo_time"], kind="stable" )
+    arrays["art_photo_order"]     = np.argsort( arrays["art_photo_id"], kind="stable" )
+    arrays["photo_id_sorted"]     = arrays["photo_id"][arrays["photo_id_order"]]
+    arrays["photo_time_sorted"]   = arrays["photo_photo_time"][arrays["photo_time_order"]]
+    arrays["art_photo_sorted"]    = arrays["art_photo_id"][arrays["art_photo_order"]]
+
+    arrays["strings_offsets"], arrays["strings_data"] = strings.get_arrays()
+
+    with _atomic_open( filename ) as f:
+        grafmapped.write_arrays( f,
+                                 { "art_fields":        art_fields,
+                                   "processing_states": processing_states },
+                                 arrays )
+
+def _record_to_dict( record ):
+    """
+    Converts a record into a dictionary whose keys match the keyword
+    arguments of the record's constructor.  Tuples are converted into lists
+    so the dictionary may be serialized as JSON.
+
+    Takes 1 argument:
+
+      record - PhotoRecord or ArtRecord to convert.
+
+    Returns 1 value:
+
+      record_dict - Dictionary of the record's keys and values.
+
+    """
+
+    record_dict = {}
+
+    for key in record._keys:
+        value = record[key]
+
+        if isinstance( value, tuple ):
+            value = list( value )
+
+        record_dict[key] = value
+
+    return record_dict
+
+def _get_change_entries( art_fields, processing_states, photos, arts, deleted_photo_ids, deleted_art_ids ):
+    """
+    Describes a set of changes as a list of entries, each a dictionary that
+    may be serialized as JSON.  These make up journals and exported changes.
+
+    Takes 6 arguments:
+
+      art_fields        - Dictionary containing various database field values
+                          associated with the art records.  May be specified
+                          as None if the fields haven't changed.
+      processing_states - List of values representing the states records may
+                          be in.  Ignored if art_fields is None.
+      photos            - A list of PhotoRecord objects that were inserted or
+                          updated.
+      arts              - A list of ArtRecord objects that were inserted or
+                          updated.
+      deleted_photo_ids - A list of photo identifiers that were deleted.
+      deleted_art_ids   - A list of art identifiers that were deleted.
+
+    Returns 1 value:
+
+      entries - List of dictionaries, one per change.
+
+    """
+
+    entries = []
+
+    if art_fields is not None:
+        entries.append( { "op":                "fields",
+                          "art_fields":        art_fields,
+                          "processing_states": processing_states } )
+
+    entries.extend( [{ "op": "photo", "record": _record_to_dict( photo ) } for photo in photos] )
+    entries.extend( [{ "op": "art", "record": _record_to_dict( art ) } for art in arts] )
+    entries.extend( [{ "op": "delete_photo", "id": photo_id } for photo_id in deleted_photo_ids] )
+    entries.extend( [{ "op": "delete_art", "id": art_id } for art_id in deleted_art_ids] )
+
+    return entries
+
+@grafinstr.instrumented( "journal.append" )
+def _append_xml_journal( filename, art_fields, processing_states, photos, arts, deleted_photo_ids, deleted_art_ids ):
+    """
+    Appends a set of changes to an XML database's journal, creating the
+    journal if it does not exist.  Each line of the journal is a JSON object
+    describing one change, and each set of changes is terminated by a commit
+    entry so that a partially written set is ignored when the journal is
+    replayed.
+
+    Takes 7 arguments:
+
+      filename          - Path to the XML database whose journal is appended
+                          to.  The database must exist.
+      art_fields        - Dictionary containing various database field values
+                          associated with the art records.  May be specified
+                          as None if the fields haven't changed.
+      processing_states - List of values representing the states records may
+                          be in.  Ignored if art_fields is None.
+      photos            - A list of PhotoRecord objects that were inserted or
+                          updated.
+      arts              - A list of ArtRecord objects that were inserted or
+                          updated.
+      deleted_photo_ids - A list of photo identifiers that were deleted.
+      deleted_art_ids   - A list of art identifiers that were deleted.
+
+    Returns nothing.
+
+    """
+
+    journal_filename = _get_journal_filename( filename )
+
+    entries = []
+
+    # a new journal starts by identifying the database it applies to so that
+    # we can detect when the database was rewritten without it.
+    if not os.path.isfile( journal_filename ):
+        entries.append( { "op":   "base",
+                          "sha1": _hash_file( filename ) } )
+
+    entries.extend( _get_change_entries( art_fields,
+                                         processing_states,
+                                         photos,
+                                         arts,
+                                         deleted_photo_ids,
+                                         deleted_art_ids ) )
+    entries.append( { "op": "commit", "time": time.time() } )
+
+    journal_string = "".join( [json.dumps( entry ) + "\n" for entry in entries] )
+
+    # make sure the changes are on disk before we consider them saved.
+    with open( journal_filename, "at" ) as f:
+        f.write( journal_string )
+        f.flush()
+        os.fsync( f.fileno() )
+
+@grafinstr.instrumented( "journal.replay" )
+def _replay_xml_journal( filename, art_fields, processing_states, photos, arts ):
+    """
+    Replays an XML database's journal over the contents read from the
+    database.  Records that were updated keep their position, while inserted
+    records are placed after the existing records.  Sets of changes that were
+    not committed are ignored, as is a journal for a different version of the
+    database (e.g. one that was written in its entirety after the journal was
+    started, which already contains the journal's changes).
+
+    Takes 5 arguments:
+
+      filename          - Path to the XML database whose journal is replayed.
+      art_fields        - Dictionary containing various database field values
+                          associated with art records, as read from the XML
+                          database.
+      processing_states - List of processing states, as read from the XML
+                          database.
+      photos            - A list of PhotoRecord objects read from the XML
+                          database.
+      arts              - A list of ArtRecord objects read from the XML
+                          database.
+
+    Returns 4 values:
+
+      art_fields        - Dictionary of art fields after replaying the journal.
+      processing_states - List of processing states after replaying the
+                          journal.
+      photo_records     - A list of PhotoRecord objects after replaying the
+                          journal.
+      art_records       - A list of ArtRecord objects after replaying the
+                          journal.
+
+    """
+
+    journal_filename = _get_journal_filename( filename )
+
+    if not os.path.isfile( journal_filename ):
+        return (art_fields, processing_states, photos, arts)
+
+    with open( journal_filename, "rt" ) as f:
+        journal_lines = f.readlines()
+
+    # ignore journals that weren't started against this database.
+    try:
+        base_entry = json.loads( journal_lines[0] )
+    except (IndexError, ValueError):
+        return (art_fields, processing_states, photos, arts)
+
+    if base_entry.get( "op" ) != "base" or base_entry.get( "sha1" ) != _hash_file( filename ):
+        return (art_fields, processing_states, photos, arts)
+
+    # index the records by identifier.  dictionaries preserve insertion order
+    # so updates stay in place and insertions are appended.
+    photos_by_id = {photo["id"]: photo for photo in photos}
+    arts_by_id   = {art["id"]: art for art in arts}
+
+    pending_entries = []
+    for journal_line in journal_lines[1:]:
+        # a torn write can only happen at the end of the journal, and it
+        # belongs to an uncommitted set of changes.
+        try:
+            entry = json.loads( journal_line )
+        except ValueError:
+            break
+
+        if entry["op"] != "commit":
+            pending_entries.append( entry )
+            continue
+
+        for entry in pending_entries:
+            if entry["op"] == "fields":
+                art_fields        = entry["art_fields"]
+                processing_states = entry["processing_states"]
+            elif entry["op"] == "photo":
+                photos_by_id[entry["record"]["id"]] = PhotoRecord( **entry["record"] )
+            elif entry["op"] == "art":
+                if entry["record"]["region"] is not None:
+                    entry["record"]["region"] = tuple( entry["record"]["region"] )
+
+                arts_by_id[entry["record"]["id"]] = ArtRecord( **entry["record"] )
+            elif entry["op"] == "delete_photo":
+                photos_by_id.pop( entry["id"], None )
+            elif entry["op"] == "delete_art":
+                arts_by_id.pop( entry["id"], None )
+            else:
+                raise RuntimeError( "Unknown journal entry '{:s}' in {:s}.".format( entry["op"],
+                                                                                    journal_filename ) )
+
+        pending_entries = []
+
+    photos = list( photos_by_id.values() )
+    arts   = list( arts_by_id.values() )
+
+    # validate what the journal did to the database.
+    _validate_art_fields( art_fields, processing_states )
+    _validate_identifiers( photos, arts )
+
+    return (art_fields, processing_states, photos, arts)
+
+def _get_lock_filename( filename ):
+    """
+    Gets the file name of the lock file that coordinates processes sharing a
+    database.
+
+    Takes 1 argument:
+
+      filename - Path to the database.
+
+    Returns 1 value:
+
+      lock_filename - Path to the database's lock file.
+
+    """
+
+    return os.path.normpath( filename ) + ".lock"
+
+# number of versions kept in a shared database's version log when it's
+# rebased, which happens once it holds twice as many.  processes more than
+# this many versions behind load the database again rather than merging, so
+# that reading the log doesn't cost more as the database's history grows.
+_LOGGED_VERSIONS = 128
+
+def _get_versions_filename( filename ):
+    """
+    Gets the file name of the version log of a database shared between
+    processes.
+
+    Takes 1 argument:
+
+      filename - Path to the database.
+
+    Returns 1 value:
+
+      versions_filename - Path to the database's version log.
+
+    """
+
+    return os.path.normpath( filename ) + ".versions"
+
+@contextlib.contextmanager
+def _locked_database( filename, exclusive ):
+    """
+    Holds an advisory lock on a database shared between processes.  Any
+    number of processes may hold shared locks, which are taken to read the
+    database, while an exclusive lock, taken to write it, excludes every
+    other lock.  Blocks until the lock is acquired.
+
+    Takes 2 arguments:
+
+      filename  - Path to the database to lock.
+      exclusive - Flag specifying whether an exclusive lock is acquired.
+
+    Returns nothing.
+
+    """
+
+    with open( _get_lock_filename( filename ), "ab" ) as lock_file:
+        fcntl.flock( lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH )
+        try:
+            yield
+        finally:
+            fcntl.flock( lock_file.fileno(), fcntl.LOCK_UN )
+
+def _read_database_versions( filename, version=0 ):
+    """
+    Reads the changes made to a shared database after a version of it.  Each
+    save to a shared database appends its changes to the database's version
+    log, in the form written by _get_change_entries(), preceded by a version
+    entry and followed by a commit entry.  Versions that were not committed
+    are ignored.
+
+    Logs that have been rebased, see _rebase_database_versions(), start with
+    a base entry holding the version the log starts at.  The changes made up
+    to and including that version are no longer available.
+
+    Should be called with the database locked.
+
+    Takes 2 arguments:
+
+      filename - Path to the database.
+      version  - Optional version whose subsequent changes are read.  If
+                 omitted, defaults to 0, reading every version.
+
+    Returns 4 values:
+
+      latest_version - The database's current version.  Versions start at 0
+                       for a database without a version log.
+      complete_flag  - Flag specifying whether the log holds every version
+                       after version.  False if the log was removed, or
+                       rebased past version, since version was read.
+      entries        - List of change entries made after version, in the
+                       order they were made.
+      base_version   - Version the log starts at.  0 unless the log has been
+                       rebased.
+
+    """
+
+    try:
+        with open( _get_versions_filename( filename ), "rt" ) as f:
+            version_lines = f.readlines()
+    except FileNotFoundError:
+        return (0, version == 0, [], 0)
+
+    base_version    = 0
+    latest_version  = 0
+    next_version    = version + 1
+    complete_flag   = True
+    entries         = []
+    pending_entries = []
+
+    for version_line in version_lines:
+        # a torn write can only happen at the end of the log, and it belongs
+        # to an uncommitted version.
+        try:
+            entry = json.loads( version_line )
+        except ValueError:
+            break
+
+        if entry["op"] == "base":
+            base_version   = entry["version"]
+            latest_version = entry["version"]
+
+            if entry["version"] > version:
+                complete_flag = False
+        elif entry["op"] == "version":
+            pending_version = entry["version"]
+            pending_entries = []
+        elif entry["op"] == "commit":
+            latest_version = pending_version
+
+            if pending_version == next_version:
+                entries.extend( pending_entries )
+                next_version += 1
+            elif pending_version > next_version:
+                complete_flag = False
+        else:
+            pending_entries.append( entry )
+
+    if latest_version < version:
+        complete_flag = False
+
+    return (latest_version, complete_flag, entries, base_version)
+
+def _append_database_version( filename, version, entries ):
+    """
+    Appends a version of a shared database to its version log, creating the
+    log if it does not exist.
+
+    Should be called with the database exclusively locked, after the
+    database itself has been written.
+
+    Takes 3 arguments:
+
+      filename - Path to the database.
+      version  - The database's new version.
+      entries  - List of change entries describing the changes made in
+                 version.  See _get_change_entries().
+
+    Returns nothing.
+
+    """
+
+    entries = ([{ "op": "version", "version": version, "time": time.time() }] +
+               entries +
+               [{ "op": "commit", "time": time.time() }])
+
+    # make sure the version is on disk before we consider it saved.
+    with open( _get_versions_filename( filename ), "at" ) as f:
+        f.write( "".join( [json.dumps( entry ) + "\n" for entry in entries] ) )
+        f.flush()
+        os.fsync( f.fileno() )
+
+def _rebase_database_versions( filename, base_version ):
+    """
+    Starts a database's version log afresh at a version, dropping the
+    versions up to and including it.  Processes whose version of the
+    database predates the base version can no longer merge the changes made
+    since, and must load the database again.  Later versions are kept.
+
+    Should be called with the database exclusively locked, after the
+    database itself has been written.
+
+    Takes 2 arguments:
+
+      filename     - Path to the database.
+      base_version - Version the log starts at.
+
+    Returns nothing.
+
+    """
+
+    versions_filename = _get_versions_filename( filename )
+
+    try:
+        with open( versions_filename, "rt" ) as f:
+            version_lines = f.readlines()
+    except FileNotFoundError:
+        version_lines = []
+
+    # keep the committed versions after the base, as they were written.
+    kept_lines    = []
+    pending_lines = []
+
+    for version_line in version_lines:
+        try:
+            entry = json.loads( version_line )
+        except ValueError:
+            break
+
+        if entry["op"] == "base":
+            continue
+        elif entry["op"] == "version":
+            pending_version = entry["version"]
+            pending_lines   = [version_line]
+        elif entry["op"] == "commit":
+            if pending_version > base_version:
+                kept_lines.extend( pending_lines + [version_line] )
+        else:
+            pending_lines.append( version_line )
+
+    base_line = json.dumps( { "op": "base", "version": base_version, "time": time.time() } ) + "\n"
+
+    with _atomic_open( versions_filename ) as f:
+        f.write( "".join( [base_line] + kept_lines ).encode( "utf-8" ) )
+
+def _write_unversioned_database( filename, write_database ):
+    """
+    Writes a database without knowing which version of it our changes are
+    based on, e.g. when it wasn't loaded as a shared database.  Whatever
+    other processes saved may be overwritten, so the version log is rebased
+    past every version in it, forcing processes sharing the database to load
+    it again rather than overwrite what we wrote.
+
+    Takes 2 arguments:
+
+      filename       - Path to the database.
+      write_database - Callable that writes the database.
+
+    Returns nothing.
+
+    """
+
+    with _locked_database( filename, exclusive=True ):
+        write_database()
+        _rebase_database_versions( filename, _read_database_versions( filename )[0] + 1 )
+
+def _get_changed_ids( entries ):
+    """
+    Gets the identifiers of the records changed by a set of change entries.
+
+    Takes 1 argument:
+
+      entries - List of change entries.  See _get_change_entries().
+
+    Returns 2 values:
+
+      photo_ids - Set of identifiers of photo records inserted, updated, or
+                  deleted.
+      art_ids   - Set of identifiers of art records inserted, updated, or
+                  deleted.
+
+    """
+
+    photo_ids = set()
+    art_ids   = set()
+
+    for entry in entries:
+        if entry["op"] == "photo":
+            photo_ids.add( entry["record"]["id"] )
+        elif entry["op"] == "art":
+            art_ids.add( entry["record"]["id"] )
+        elif entry["op"] == "delete_photo":
+            photo_ids.add( entry["id"] )
+        elif entry["op"] == "delete_art":
+            art_ids.add( entry["id"] )
+
+    return (photo_ids, art_ids)
+
+def _write_versioned_database( filename, version, entries, write_database ):
+    """
+    Writes a shared database, provided nobody else has written it since
+    the version our changes are based on, and records the new version.  A
+    DatabaseConflictError is raised otherwise, identifying the records
+    changed both by us and the other writers, if any.  The version log is
+    rebased once it holds 2 * _LOGGED_VERSIONS versions, keeping the newest
+    _LOGGED_VERSIONS of them.
+
+    Takes 4 arguments:
+
+      filename       - Path to the shared database.
+      version        - Version of the database our changes are based on.
+      entries        - List of change entries describing our changes.  See
+                       _get_change_entries().
+      write_database - Callable that writes the database.
+
+    Returns nothing.
+
+    """
+
+    with _locked_database( filename, exclusive=True ):
+        latest_version, _, their_entries, base_version = _read_database_versions( filename, version )
+
+        if latest_version != version:
+            our_photo_ids, our_art_ids     = _get_changed_ids( entries )
+            their_photo_ids, their_art_ids = _get_changed_ids( their_entries )
+
+            raise DatabaseConflictError( filename,
+                                         sorted( our_photo_ids & their_photo_ids ),
+                                         sorted( our_art_ids & their_art_ids ) )
+
+        #
+        # NOTE: the database is written before its version is recorded, so a
+        #       crash in between leaves changes that other processes won't
+        #       merge until they load the database again.
+        #
+        write_database()
+        _append_database_version( filename, version + 1, entries )
+
+        # keep the log from growing with the database's history.
+        if version + 1 - base_version > 2 * _LOGGED_VERSIONS:
+            _rebase_database_versions( filename, version + 1 - _LOGGED_VERSIONS )
+
+class DatabaseConflictError( RuntimeError ):
+    """
+    Raised when changes to a shared database conflict with changes another
+    process saved since the database was loaded, or last merged.  The
+    conflicting records' identifiers are available so they can be reviewed
+    after Database.reload_database() merges the other changes.
+    """
+
+    def __init__( self, filename, photo_ids, art_ids ):
+        """
+        Constructs a DatabaseConflictError for the supplied records.
+
+        Takes 3 arguments:
+
+          filename  - Path to the shared database.
+          photo_ids - Sorted list of identifiers of conflicting photo
+                      records.
+          art_ids   - Sorted list of identifiers of conflicting art records.
+
+        Returns 1 value:
+
+          self - The newly created DatabaseConflictError object.
+
+        """
+
+        super().__init__( "{:s} was changed by another process: {:d} photo record(s) and {:d} art record(s) conflict.".format(
+            filename,
+            len( photo_ids ),
+            len( art_ids ) ) )
+
+        self.filename  = filename
+        self.photo_ids = photo_ids
+        self.art_ids   = art_ids
+
+def _intern_string( value ):
+    """
+    Interns a string so that every record holding the same value, and the
+    database's field tables, share one copy of it.  Values that aren't
+    strings are returned as is.
+
+    Takes 1 argument:
+
+      value - Value to intern.
+
+    Returns 1 value:
+
+      value - The interned string, or the value supplied.
+
+    """
+
+    if type( value ) is str:
+        return sys.intern( value )
+
+    return value
+
+def _intern_strings( values ):
+    """
+    Converts a sequence of strings into a tuple of interned strings.  Tuples
+    holding the same strings are shared by the records of a database once
+    they're managed by it, see Database._manage_records().
+
+    Takes 1 argument:
+
+      values - Sequence of strings to convert.
+
+    Returns 1 value:
+
+      values - Tuple of interned strings.
+
+    """
+
+    return tuple( [_intern_string( value ) for value in values] )
+
+class Record( object ):
+    """
+    Provides a dictionary-like interface with a fixed set of keys, some
+    mutable, that may be accessed after creation.
+
+    Records are compact: each key's value is stored in a slot of the same
+    name and the tables describing the keys are shared by every record of a
+    class.  Subclasses declare the following class attributes:
+
+      _keys         - Tuple of the key names whose values are readable.  Also
+                      used as the subclass' __slots__.
+      _key_set      - Frozen set of _keys for quick membership tests.
+      _mutable_keys - Frozen set of the key names whose values are writable.
+                      Must be a subset of _keys.
+      _string_keys  - Frozen set of the key names whose string values are
+                      interned, as they're drawn from a small vocabulary.
+      _strings_keys - Frozen set of the key names whose values are sequences
+                      of strings.  These are stored as tuples of interned
+                      strings.
+
+    """
+
+    # Database that is notified when the record changes.  set when the record
+    # is managed by a Database.
+    __slots__     = ("_database",)
+
+    _keys         = ()
+    _key_set      = frozenset()
+    _mutable_keys = frozenset()
+    _string_keys  = frozenset()
+    _strings_keys = frozenset()
+
+    def __init__( self, **kwargs ):
+        """
+        Constructs a Record from the supplied keys and values.
+
+        Takes 1 argument:
+
+          kwargs - Keyword arguments containing the key/value pairs to
+                   initialize the Record with.  Must contain all of the
+                   Record's keys.
+
+        Returns 1 value:
+
+          self - The newly created Record object.
+
+        """
+
+        self._database = None
+
+        # initialize the record.
+        for key, value in kwargs.items():
+            if not key in self._key_set:
+                raise KeyError( "{:s} is not a valid key!".format( key ) )
+            setattr( self, key, value )
+
+        # ensure that all keys have values associated with them.
+        for key in self._keys:
+            if not hasattr( self, key ):
+                raise KeyError( "{:s} must be initialized with a value!".format( key ) )
+
+    def __getitem__( self, key ):
+        """
+        Retrieves the value for an key within the Record.
+
+        Takes 1 argument:
+
+          key - The key whose value is requested.
+
+        Returns 1 value:
+
+          value - The value associated with key.
+
+        """
+
+        if not key in self._key_set:
+            raise KeyError( key )
+
+        return getattr( self, key )
+
+    def copy( self ):
+        """
+        Creates a copy of the Record that is not associated with a Database.
+        Values are shared with the original rather than copied, which is
+        safe since setting a key replaces its value rather than modifying
+        it.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          record - The copied Record object.
+
+        """
+
+        record = self.__class__.__new__( self.__class__ )
+
+        for key in self._keys:
+            setattr( record, key, getattr( self, key ) )
+        record._database = None
+
+        return record
+
+    def __getstate__( self ):
+        """
+        Gets the Record's values for pickling.  The Database the record is
+        associated with, if any, is not part of its state.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          state - Tuple of the Record's values, in the order of its keys.
+
+        """
+
+        return tuple( [getattr( self, key ) for key in self._keys] )
+
+    def __setstate__( self, state ):
+        """
+        Restores the Record's values after unpickling.  The record is not
+        associated with a Database.
+
+        Takes 1 argument:
+
+          state - Tuple of values from __getstate__().
+
+        Returns nothing.
+
+        """
+
+        for key, value in zip( self._keys, state ):
+            setattr( self, key, value )
+
+        self._database = None
+
+    def __setitem__( self, key, value ):
+        """
+        Sets the value for an key within the Record.  If the supplied key is
+        not mutable, a KeyError is raised.  Strings and sequences of strings
+        are interned as they are when the Record is constructed.
+
+        Takes 2 arguments:
+
+          key   - The key whose value will be set.
+          value - The value to set.
+
+        Returns nothing.
+
+        """
+
+        if not key in self._mutable_keys:
+            raise KeyError( "{:s} is not a mutable key!".format( key ) )
+
+        if key in self._string_keys:
+            value = _intern_string( value )
+        elif key in self._strings_keys and value is not None:
+            value = _intern_strings( value )
+
+            if self._database is not None:
+                value = self._database._string_tuples.setdefault( value, value )
+
+        old_value = getattr( self, key )
+
+        # let snapshots of our database keep our current values before we
+        # change them.
+        database = self._database
+        if database is not None and len( database._snapshots ) > 0:
+            with database._snapshot_lock:
+                database._preserve_record( self )
+                setattr( self, key, value )
+        else:
+            setattr( self, key, value )
+
+        # let our database know so it can track what needs to be saved.
+        if self._database is not None:
+            self._database._record_changed( self, key, old_value )
+
+class ArtRecord( Record ):
+    """
+    Database record representing a piece of art associated with a PhotoRecord.
+    The following keys are available (mutable keys are marked with *):
+
+      *artists        Non-empty tuple of artist names.
+      *associates     Tuple, possibly empty, of artists who are associated with
+                      the work.
+      created_time    Fractional seconds since Epoch when the record was created.
+      *date           String representing the date whe the art was created.
+                      Typically either a four digit year or a variant of
+                      YYYY/MM/DD.
+      id              Unique, positive integer identifier for the art.
+      *modified_time  Fractional seconds since Epoch when the record was last
+                      updated.
+      photo_id        Unique, positive integer identifier for the photo the art
+                      was documented in.
+      *quality        String representing the art's physical quality/state.
+      *region         Geometry tuple containing (x, y, width, height) values
+                      normalized to the parent photo's resolution.
+      *size           String representing the art's physical size.
+      *state          String representing the processing state the record is
+                      in.
+      *tags           Tuple, possibly empty, of tags associated with the art.
+      *type           String specifying the type of the art.
+      *vandals        Tuple, possibly empty, of artists who have vandalized the
+                      art.
+
+    Lists of strings supplied for artists, associates, tags, and vandals are
+    converted to tuples.
+
+    """
+
+    _keys         = ("artists", "associates", "created_time", "date", "id",
+                     "modified_time", "photo_id", "quality", "region", "size",
+                     "state", "tags", "type", "vandals")
+    _key_set      = frozenset( _keys )
+    _mutable_keys = frozenset( ["artists", "associates", "date",
+                                "modified_time", "quality", "region", "size",
+                                "state", "tags", "type", "vandals"] )
+    _string_keys  = frozenset( ["date", "quality", "size", "state", "type"] )
+    _strings_keys = frozenset( ["artists", "associates", "tags", "vandals"] )
+
+    __slots__     = _keys
+
+    def __init__( self, id, photo_id, type, artists=["Unknown"], associates=[], size="medium", quality="fair", vandals=[], created_time=None, modified_time=None, date=None, tags=[], state=None, region=None ):
+        """
+        Constructs an ArtRecord object from the supplied parameters.
+
+        Takes 14 arguments:
+
+          id            - Identifier for the art record.  Must be a positive
+                          integer, different from other record identifiers.
+          photo_id      - Identifier for the parent PhotoRecord.  Must be a
+                          positive integer.
+          type          - String specifying the type.
+          artists       - Optional, non-empty list of strings specifying the
+                          creators of the art.  If omitted, defaults to
+                          ["Unknown"].
+          associates    - Optional, possibly empty, list of strings specifying
+                          associates of the creators of the art.  If omitted,
+                          defaults to an empty list.
+          size          - Optional string specifying the size of the art.  If
+                          omitted, defaults to "medium".
+          quality       - Optional string specifying the physical quality of
+                          the art.  If omitted, defaults to "fair".
+          vandals       - Optional, possibly empty, list of strings specifying
+                          vandals of the art.  If omitted, defaults to an empty
+                          list.
+          created_time  - Optional fractional seconds since the Epoch
+                          indicating when the art record (not the physical
+                          art) was created.  If omitted, defaults to the current
+                          time.
+          modified_time - Optional fractional seconds since the Epoch
+                          indicating when the art record (not the physical
+                          art) was last modified.  If omitted, defaults to the current
+                          time.
+          date          - Optional year, as a four digit integer, indicating when the
+                          physical art was created.  If omitted, defaults to None.
+          tags          - Optional, possibly empty, list of strings specifying
+                          tags for the art.  If omitted, defaults to an empty
+                          list.
+          state         - Optional string specifying the processing state of the
+                          record.  If omitted, defaults to "unreviewed".
+          region        - Optional tuple of (x, y, width, height) values, normalized
+                          to the parent PhotoRecord's resolution, representing the
+                          art's presence within the photograph.  If omitted, defaults
+                          to None.
+
+        Returns 1 value:
+
+          self - The newly created ArtRecord object.
+
+        """
+
+        if state is None:
+            state = "unreviewed"
+
+        if created_time is None:
+            created_time = time.mktime( time.gmtime() )
+
+        if modified_time is None:
+            modified_time = created_time
+
+        # XXX: validation of type, artists (must not be empty), associates,
+        #      size, quality, vandals, and state
+        # XXX: higher level validation of id and photo_id
+
+        # share the values drawn from the database's vocabularies.
+        artists    = _intern_strings( artists )
+        associates = _intern_strings( associates )
+        tags       = _intern_strings( tags )
+        vandals    = _intern_strings( vandals )
+
+        #
+        # NOTE: we initialize our slots directly rather than going through
+        #       Record.__init__() since every key is supplied and record
+        #       construction dominates the time needed to load a database.
+        #
+        self._database     = None
+        self.artists       = artists
+        self.associates    = associates
+        self.created_time  = created_time
+        self.date          = _intern_string( date )
+        self.id            = id
+        self.modified_time = modified_time
+        self.photo_id      = photo_id
+        self.quality       = _intern_string( quality )
+        self.region        = region
+        self.size          = _intern_string( size )
+        self.state         = _intern_string( state )
+        self.tags          = tags
+        self.type          = _intern_string( type )
+        self.vandals       = vandals
+
+
+    def __str__( self ):
+        """
+        Returns a string representation of the art record.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          string - String representation of the ArtRecord object.
+
+        """
+
+        return "ArtRecord({:d}, '{:d}')".format( self["photo_id"],
+                                                 self["id"] )
+
+class PhotoRecord( Record ):
+    """
+    Database record documenting one or more pieces of street art.  The
+    following keys are available (mutable keys are marked with *):
+
+      created_time   Fractional seconds since Epoch when the record was
+                     created.
+      *filename      Path to the photograph file on disk.
+      id             Unique, positive integer identifier for the phtograph.
+      location       Tuple of fractional (latitude, longitude) with positive
+                     being north and east, and negative being south and west.
+      modified_time  Fractional seconds since Epoch when the record was
+                     last updated.
+      resolution     Tuple of positive integers specifying the (width, height)
+                     of the photograph.
+      rotation       XXX
+      *state         String representing the processing state the record is
+                     in.
+      *tags          Tuple, possibly empty, of strings describing the
+                     photograph.  Lists supplied are converted to tuples.
+
+    XXX: constants here need to be consistent but different than the database
+    """
+
+    _keys         = ("created_time", "filename", "id", "location",
+                     "modified_time", "photo_time", "resolution", "rotation",
+                     "state", "tags")
+    _key_set      = frozenset( _keys )
+    _mutable_keys = frozenset( ["location", "modified_time", "photo_time",
+                                "resolution", "rotation", "state", "tags"] )
+    _string_keys  = frozenset( ["state"] )
+    _strings_keys = frozenset( ["tags"] )
+
+    __slots__     = _keys
+
+    def __init__( self, id, filename, resolution=None, state=None, location=None, rotation=0, created_time=None, modified_time=None, photo_time=None, tags=[] ):
+        """
+        Constructs an PhotoRecord object from the supplied parameters.
+
+        Takes 10 arguments:
+
+          id            - Identifier for the photo record.  Must be a positive
+                          integer, different from other record identifiers.
+          filename      - Path to the photograph file on disk.
+          resolution    - Optional tuple of positive integers specifying the
+                          (width, height) of the photograph.  If omitted, defaults
+                          to (0, 0).
+          state         - Optional string specifying the processing state of the
+                          record.  If omitted, defaults to "unreviewed".
+          location      - Tuple of fractional (latitude, longitude) with positive
+                          being north and east, and negative being south and west.
+          rotation      - Optional degrees of rotation needed to apply to the
+                          photograph for display purposes.  If omitted, defaults
+                          to zero.
+          created_time  - Optional fractional seconds since the Epoch
+                          indicating when the photo record (not the
+                          photograph) was created.  If omitted, defaults to
+                          the current time.
+          modified_time - Optional fractional seconds since the Epoch
+                          indicating when the photo record (not the photograph)
+                          was last modified.  If omitted, defaults to the
+                          current time.
+          photo_time    - Optional fractional seconds since the Epoch
+                          indicating when the photograph was taken.  If
+                          omitted, defaults to the Epoch.
+          tags          - Optional, possibly empty, list of strings specifying
+                          tas associated with the photograph.  If omitted,
+                          defaults to an empty list.
+
+        Returns 1 value:
+
+          self - The newly created PhotoRecord object.
+
+        """
+
+        if state is None:
+            state = "unreviewed"
+
+        if resolution is None:
+            resolution = (0, 0)
+
+        if created_time is None:
+            created_time = time.mktime( time.gmtime() )
+
+        if modified_time is None:
+            modified_time = created_time
+
+        if photo_time is None:
+            photo_time = 0
+
+        tags = _intern_strings( tags )
+
+        #
+        # NOTE: we initialize our slots directly rather than going through
+        #       Record.__init__() since every key is supplied and record
+        #       construction dominates the time needed to load a database.
+        #
+        self._database     = None
+        self.created_time  = created_time
+        self.filename      = filename
+        self.id            = id
+        self.location      = location
+        self.modified_time = modified_time
+        self.photo_time    = photo_time
+        self.resolution    = resolution
+        self.rotation      = rotation
+        self.state         = _intern_string( state )
+        self.tags          = tags
+
+    def __str__( self ):
+        """
+        Returns a string representation of the photo record.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          string - String representation of the PhotoRecord object.
+
+        """
+
+        return "PhotoRecord({:d}, '{:s}')".format( self["id"],
+                                                   self["filename"] )
+
+class Database( object ):
+    """
+    Represents a database of photo and art records for analyzing street art.
+    """
+
+    def __init__( self, filename=None, journal=False, columnar=False, lazy=False, processes=None, shard_key=None, shared=False ):
+        """
+        Initializes a Database object from the contents of the supplied file.
+        Commiting changes to the object will update the file supplied.  If no
+        file is supplied, a test database is constructed.
+
+        XML databases may optionally be journaled, where saving the database
+        appends the changes made since the last save to a journal file next to
+        the database rather than rewriting it.  The journal is replayed when
+        the database is loaded and is folded back into the database by
+        compact_database().
+
+        The database may also maintain a columnar copy of its records, see
+        get_photo_columns() and get_art_columns(), for analysis.  This is
+        built when the database is loaded if requested, otherwise the first
+        time it's needed.
+
+        XML databases may also be loaded lazily, where art records are only
+        located when the database is loaded and are parsed the first time
+        they're requested through get_art_records().  Art records that are
+        never requested are written back as they were read.  This reduces
+        the time and memory needed to load large databases when only a few
+        photos' art records are needed.
+
+        Large XML databases may be parsed in parallel by a pool of worker
+        processes, which reduces the time needed to load them when a
+        snapshot cache isn't available.
+
+        XML databases may be compressed with gzip or xz, selected by a
+        ".gz" or ".xz" extension when written and by their contents when
+        read.  Compressed databases stream through the parser and writer,
+        though they can't be read lazily or by worker processes.
+
+        Databases may also be split into shards, stored as a directory of XML
+        files: a header shard, header.xml, holding the fields, and any number
+        of shards holding photo records and their art records (e.g. one per
+        year, or per photo walk).  Shards are parsed in parallel, and saving
+        rewrites only the shards whose records have changed.  Photo records
+        stay in the shard they were loaded from, while inserted photos are
+        placed by the shard_key callable.  Identifiers are unique across
+        every shard.
+
+        Databases may be shared by several processes, e.g. two people
+        running the record editor, without a coordinating server.  Shared
+        databases are read and written under advisory locks, and each save
+        appends its changes to a version log next to the database.  Saving
+        first merges the changes other processes saved since the database
+        was loaded, raising a DatabaseConflictError, without saving, should
+        the same records have been changed by both.  reload_database()
+        merges them without saving, keeping our changes to conflicting
+        records.  Records we inserted are renumbered if other processes
+        inserted records with the same identifiers.  Databases that aren't
+        shared are still written under the lock, and mark the version log as
+        rewritten, so that processes sharing the database load it again
+        rather than overwrite what was written.
+
+        Loading, saving, and querying databases may be timed and counted,
+        e.g. to find out why a save is slow, by enabling the
+        GraffitiAnalysis.instrumentation module.
+
+        Takes 7 arguments:
+
+          filename  - File name backing the database.  If omitted, a test
+                      database is constructed and changes will not be
+                      commited anywhere when save_database() is called.
+          journal   - Optional flag specifying whether saves to an XML
+                      database are journaled.  If omitted, defaults to False.
+          columnar  - Optional flag specifying whether the columnar copy of
+                      the records is built when the database is loaded.  If
+                      omitted, defaults to False.
+          lazy      - Optional flag specifying whether an XML database's
+                      art records are loaded lazily.  If omitted, defaults
+                      to False.
+          processes - Optional number of worker processes used to parse an
+                      XML database, such as os.cpu_count().  If omitted, the
+                      database is parsed without workers, unless it is
+                      sharded, in which case os.cpu_count() workers are used.
+          shard_key - Optional callable taking a PhotoRecord and returning
+                      the file name of the shard it is placed in when a
+                      sharded database is saved.  If omitted, photos are
+                      placed by the year they were taken, e.g. "2016.xml".
+          shared    - Optional flag specifying whether the database is shared
+                      with other processes.  If omitted, defaults to False.
+
+        Returns 1 value:
+
+          database - The Database object.
+
+        """
+
+        self.filename  = filename
+        self.journal   = journal
+        self.columnar  = columnar
+        self.lazy      = lazy
+        self.processes = processes
+        self.shard_key = shard_key if shard_key is not None else _get_photo_shard_name
+        self.shared    = shared
+
+        # flag indicating whether we have data that needs to be written to the
+        # backing store.
+        self.modified_data = False
+
+        # identifiers of records that have been inserted, updated, or deleted
+        # since the backing store was last loaded or saved.  these allow
+        # backing stores to commit only what has changed.
+        self._dirty_photo_ids = set()
+        self._dirty_art_ids   = set()
+
+        # flag indicating whether the art fields or processing states have
+        # changed since the backing store was last loaded or saved.
+        self._dirty_fields    = False
+
+        # identifiers of records that have been inserted, updated, or deleted,
+        # and whether the art fields or processing states have changed, since
+        # the last checkpoint.  saving to the backing store is a checkpoint.
+        # these describe the changes exported by export_changes().
+        self._changed_photo_ids = set()
+        self._changed_art_ids   = set()
+        self._changed_fields    = False
+
+        # indices from identifiers to records, and from photo identifiers to
+        # the art records associated with them, so that lookups don't need to
+        # scan the records.  these are maintained alongside self.photos and
+        # self.arts.
+        self._photos_by_id       = dict()
+        self._arts_by_id         = dict()
+        self._arts_by_photo_id   = dict()
+
+        # number of art records that have yet to be loaded when the database
+        # is loaded lazily.  until they're loaded they're represented by
+        # _UnloadedArtRecords in self.arts and the indices above.
+        self._unloaded_art_count = 0
+
+        # tuples of strings, e.g. artists or tags, shared by every record
+        # holding the same strings.  kept per database, and rebuilt when its
+        # records are reindexed, so that it only holds values in use.
+        self._string_tuples      = dict()
+
+        # next identifiers to assign to inserted records.  these are never
+        # reused within a session, even when the records holding them are
+        # deleted.
+        self._next_photo_id      = 1
+        self._next_art_id        = 1
+
+        # photos sorted by the time they were taken, along with a parallel
+        # list of their times, so that time windows can be found by
+        # bisection.
+        self._photo_times        = []
+        self._photos_by_time     = []
+
+        # columnar copies of the photo and art records.  these are None until
+        # they're needed, after which they're maintained with the records.
+        self._photo_columns      = None
+        self._art_columns        = None
+
+        # index from art record values to the records having them, built the
+        # first time art records are queried and maintained with the records
+        # afterwards.
+        self._art_index          = None
+
+        # index from normalized tags to the photo and art records having
+        # them, built the first time tags are looked up and maintained with
+        # the records afterwards.
+        self._tag_index          = None
+
+        # index of the photo records' locations, built the first time photos
+        # are found by location and maintained with the records afterwards.
+        self._spatial_index      = None
+
+        # map from photo identifier to the name of the shard holding the photo
+        # and its art records.  photos are placed in a shard when they're
+        # first saved to a sharded database, and stay there.
+        self._photo_shards         = dict()
+
+        # map from identifiers of deleted art records to their photo's
+        # identifier, so that the shards they were deleted from can be
+        # found.  kept until the database is reloaded so that deletions
+        # restored by a failed background save can still be placed.
+        self._deleted_art_photo_ids = dict()
+
+        # state of a SQLite backing store when it last held exactly the
+        # records we do, and a connection to it, opened on first use.  while
+        # it's in that state lookups are answered by its indices, see
+        # _get_sqlite_connection().
+        self._sqlite_file_state     = None
+        self._sqlite_connection     = None
+
+        # version of a shared database that we're in sync with, and the next
+        # identifiers at that version.  records with identifiers at or above
+        # these were inserted by us and haven't been saved yet.
+        self._version              = 0
+        self._synced_next_photo_id = 1
+        self._synced_next_art_id   = 1
+
+        # snapshots of the database that are still in use, see snapshot().
+        # records are preserved for them, under the lock, before they're
+        # modified so that snapshots read by other threads stay consistent.
+        self._snapshots       = weakref.WeakSet()
+        self._snapshot_lock   = threading.Lock()
+
+        # worker thread used for background saves, created on first use, and
+        # the most recently requested background save.
+        self._save_executor   = None
+        self._pending_save    = None
+
+        # background saves that haven't been checked for failure, in the
+        # order requested, and the committed states to restore should they
+        # fail.  they're checked by the thread using the database, see
+        # _restore_failed_saves(), since the dirty and changed states aren't
+        # guarded by a lock.
+        self._unchecked_saves = collections.deque()
+
+        self.load_database()
+
+    def __str__( self ):
+        """
+        Returns a string representation of the database.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          string - String representation of the Database object.
+
+        """
+
+        return "Database('{:s}'{:s})".format( self.filename if self.filename is not None else "<testing>",
+                                              "*" if self.modified_data else "" )
+
+    def mark_data_dirty( self ):
+        """
+        Sets an internal flag indicating that the database has changed and
+        needs to be saved, lest said changes be lost.
+
+        Takes no arguments.
+
+        Returns nothing.
+        """
+
+        self.modified_data = True
+
+    def are_data_dirty( self ):
+        """
+        Predicate indicating whether the database has dirty data and needs to
+        be saved to avoid losing changes.
+        """
+
+        self._restore_failed_saves()
+
+        return self.modified_data
+
+    def checkpoint( self ):
+        """
+        Forgets which records have changed, so that changed_records() and
+        export_changes() only describe changes made afterwards.  This does
+        not affect what needs to be saved.  Saving to the backing store is
+        also a checkpoint.
+
+        Takes no arguments.
+
+        Returns nothing.
+
+        """
+
+        self._restore_failed_saves()
+
+        self._changed_photo_ids.clear()
+        self._changed_art_ids.clear()
+        self._changed_fields = False
+
+    def changed_records( self ):
+        """
+        Gets the records that have changed since the last checkpoint.  Records
+        are tracked as they're inserted, deleted, and modified through their
+        keys.  Lists modified in place, rather than being assigned, are not
+        seen.
+
+        Takes no arguments.
+
+        Returns 4 values:
+
+          photos            - A list of PhotoRecords that were inserted or
+                              updated, ordered by identifier.
+          arts              - A list of ArtRecords that were inserted or
+                              updated, ordered by identifier.
+          deleted_photo_ids - A sorted list of photo identifiers that were
+                              deleted.
+          deleted_art_ids   - A sorted list of art identifiers that were
+                              deleted.
+
+        """
+
+        self._restore_failed_saves()
+
+        photos_by_id = self._photos_by_id
+        arts_by_id   = self._arts_by_id
+
+        photo_ids = sorted( self._changed_photo_ids )
+        art_ids   = sorted( self._changed_art_ids )
+
+        # changed records that are no longer present have been deleted.
+        return ([photos_by_id[photo_id] for photo_id in photo_ids if photo_id in photos_by_id],
+                [arts_by_id[art_id] for art_id in art_ids if art_id in arts_by_id],
+                [photo_id for photo_id in photo_ids if photo_id not in photos_by_id],
+                [art_id for art_id in art_ids if art_id not in arts_by_id])
+
+    def _record_changed( self, record, key, old_value ):
+        """
+        Records that one of the database's records has been modified.  This
+        is invoked by Record.__setitem__() and should not need to be called
+        directly.
+
+        Takes 3 arguments:
+
+          record    - The PhotoRecord or ArtRecord that was modified.
+          key       - The key whose value was set.
+          old_value - The key's value prior to being set.
+
+        Returns nothing.
+
+        """
+
+        if isinstance( record, PhotoRecord ):
+            self._dirty_photo_ids.add( record["id"] )
+            self._changed_photo_ids.add( record["id"] )
+
+            # keep the photo's position in time current.
+            if key == "photo_time":
+                self._remove_from_time_index( record, old_value )
+                self._add_to_time_index( [record] )
+
+            if self._photo_columns is not None:
+                self._photo_columns.update( record, key )
+            if self._tag_index is not None and key == "tags":
+                self._tag_index.update( "photo", record, old_value )
+            if self._spatial_index is not None and key == "location":
+                self._spatial_index.update( record )
+        else:
+            self._dirty_art_ids.add( record["id"] )
+            self._changed_art_ids.add( record["id"] )
+
+            if self._art_columns is not None:
+                self._art_columns.update( record, key )
+            if self._art_index is not None:
+                self._art_index.update( record, key, old_value )
+            if self._tag_index is not None and key == "tags":
+                self._tag_index.update( "art", record, old_value )
+
+        self.mark_data_dirty()
+
+    def _manage_records( self, records ):
+        """
+        Associates records with the database so that it is notified of their
+        changes, and adds them to the database's indices.
+
+        Takes 1 argument:
+
+          records - Iterable of PhotoRecord, ArtRecord, and/or
+                    _UnloadedArtRecord objects.
+
+        Returns nothing.
+
+        """
+
+        photos = []
+        arts   = []
+
+        for record in records:
+            if not isinstance( record, _UnloadedArtRecord ):
+                self._share_string_tuples( record )
+
+            if isinstance( record, PhotoRecord ):
+                record._database = self
+
+                self._photos_by_id[record["id"]] = record
+                photos.append( record )
+                continue
+
+            # unloaded records are indexed so they can be found, but are
+            # otherwise managed once they're loaded.
+            if isinstance( record, _UnloadedArtRecord ):
+                self._unloaded_art_count += 1
+            else:
+                record._database = self
+                arts.append( record )
+
+            self._arts_by_id[record["id"]] = record
+            self._arts_by_photo_id.setdefault( record["photo_id"], [] ).append( record )
+
+        self._add_to_time_index( photos )
+
+        if self._photo_columns is not None:
+            self._photo_columns.extend( photos )
+        if self._art_columns is not None:
+            self._art_columns.extend( arts )
+        if self._art_index is not None:
+            self._art_index.add( arts )
+        if self._tag_index is not None:
+            self._tag_index.add( "photo", photos )
+            self._tag_index.add( "art", arts )
+        if self._spatial_index is not None:
+            self._spatial_index.add( photos )
+
+    def _add_to_time_index( self, photos ):
+        """
+        Adds photos to the index of photos sorted by time.  Photos with the
+        same time are kept in the order they were added.
+
+        Takes 1 argument:
+
+          photos - List of PhotoRecords to add.
+
+        Returns nothing.
+
+        """
+
+        # insert a handful of photos individually, otherwise it's cheaper to
+        # sort everything at once.
+        if len( photos ) < 16:
+            for photo in photos:
+                index = bisect.bisect_right( self._photo_times, photo["photo_time"] )
+
+                self._photo_times.insert( index, photo["photo_time"] )
+                self._photos_by_time.insert( index, photo )
+
+            return
+
+        # NOTE: sorting is stable so photos with identical times retain their
+        #       relative order.
+        self._photos_by_time = sorted( self._photos_by_time + photos,
+                                       key=lambda photo: photo["photo_time"] )
+        self._photo_times    = [photo["photo_time"] for photo in self._photos_by_time]
+
+    def _remove_from_time_index( self, photo, photo_time ):
+        """
+        Removes a photo from the index of photos sorted by time.
+
+        Takes 2 arguments:
+
+          photo      - PhotoRecord to remove.
+          photo_time - Time the photo is indexed by.  This may differ from the
+                       photo's current time when its time has changed.
+
+        Returns nothing.
+
+        """
+
+        # find the photo amongst those taken at the same time.
+        index = bisect.bisect_left( self._photo_times, photo_time )
+        while self._photos_by_time[index] is not photo:
+            index += 1
+
+        del self._photo_times[index]
+        del self._photos_by_time[index]
+
+    def _get_dirty_records( self ):
+        """
+        Gets the records that have changed since the backing store was last
+        loaded or saved.
+
+        Takes no arguments.
+
+        Returns 4 values:
+
+          photos            - A list of PhotoRecords that were inserted or
+                              updated.
+          arts              - A list of ArtRecords that were inserted or
+                              updated.
+          deleted_photo_ids - A list of photo identifiers that were deleted.
+          deleted_art_ids   - A list of art identifiers that were deleted.
+
+        """
+
+        photos_by_id = self._photos_by_id
+        arts_by_id   = self._arts_by_id
+
+        # dirty records that are no longer present have been deleted.
+        return ([photos_by_id[photo_id] for photo_id in self._dirty_photo_ids if photo_id in photos_by_id],
+                [arts_by_id[art_id] for art_id in self._dirty_art_ids if art_id in arts_by_id],
+                [photo_id for photo_id in self._dirty_photo_ids if photo_id not in photos_by_id],
+                [art_id for art_id in self._dirty_art_ids if art_id not in arts_by_id])
+
+    def _get_photo_shard( self, photo_id ):
+        """
+        Gets the name of the shard holding a photo and its art records,
+        placing the photo in a shard if it isn't in one yet.
+
+        Takes 1 argument:
+
+          photo_id - Identifier of the photo.
+
+        Returns 1 value:
+
+          shard_name - File name of the photo's shard.
+
+        """
+
+        shard_name = self._photo_shards.get( photo_id )
+
+        if shard_name is None:
+            shard_name                   = self.shard_key( self._photos_by_id[photo_id] )
+            self._photo_shards[photo_id] = shard_name
+
+        return shard_name
+
+    def _get_dirty_shard_names( self ):
+        """
+        Gets the names of the shards holding records that have changed since
+        the backing store was last loaded or saved.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          shard_names - Set of shard file names.
+
+        """
+
+        shard_names = set()
+
+        for photo_id in self._dirty_photo_ids:
+            if photo_id in self._photos_by_id:
+                shard_names.add( self._get_photo_shard( photo_id ) )
+
+        for art_id in self._dirty_art_ids:
+            art = self._arts_by_id.get( art_id )
+
+            if art is not None:
+                shard_names.add( self._get_photo_shard( art["photo_id"] ) )
+            elif art_id in self._deleted_art_photo_ids:
+                shard_names.add( self._get_photo_shard( self._deleted_art_photo_ids[art_id] ) )
+
+        return shard_names
+
+    def _get_shards( self, shard_names=None ):
+        """
+        Groups the records by the shard holding them.  Records keep their
+        relative order within each shard.
+
+        Takes 1 argument:
+
+          shard_names - Optional set of names of the shards to group records
+                        for.  If omitted, every record is grouped.
+
+        Returns 1 value:
+
+          shards - Dictionary mapping shard names to tuples of (photos, arts)
+                   held by each shard.
+
+        """
+
+        shards = dict()
+
+        if shard_names is not None:
+            for shard_name in shard_names:
+                shards[shard_name] = ([], [])
+
+        for photo in self.photos:
+            shard_name = self._get_photo_shard( photo["id"] )
+
+            if shard_names is None and shard_name not in shards:
+                shards[shard_name] = ([], [])
+            if shard_name in shards:
+                shards[shard_name][0].append( photo )
+
+        for art in self.arts:
+            shard_name = self._photo_shards[art["photo_id"]]
+
+            if shard_name in shards:
+                shards[shard_name][1].append( art )
+
+        return shards
+
+    def _share_string_tuples( self, record ):
+        """
+        Replaces a record's tuples of strings with the equal tuples already
+        held by the database's other records, so that records holding the
+        same artists, tags, etc share one tuple of them.
+
+        Takes 1 argument:
+
+          record - Record whose tuples are shared.
+
+        Returns nothing.
+
+        """
+
+        string_tuples = self._string_tuples
+
+        for key in record._strings_keys:
+            value = getattr( record, key )
+            if value is not None:
+                setattr( record, key, string_tuples.setdefault( value, value ) )
+
+    def _load_art_records( self, photo_ids=None ):
+        """
+        Loads art records that were located, but not parsed, when the
+        database was loaded lazily.  Loaded records replace their
+        _UnloadedArtRecords in self.arts and the database's indices.
+
+        Takes 1 argument:
+
+          photo_ids - Optional list of photo identifiers whose art records are
+                      loaded.  If omitted, all of the art records are loaded.
+
+        Returns nothing.
+
+        """
+
+        if self._unloaded_art_count == 0:
+            return
+
+        if photo_ids is None:
+            photo_ids = list( self._arts_by_photo_id.keys() )
+
+        loaded_arts = []
+
+        with _paused_garbage_collection():
+            for photo_id in photo_ids:
+                photo_arts = self._arts_by_photo_id.get( photo_id, [] )
+
+                for art_index, art in enumerate( photo_arts ):
+                    if not isinstance( art, _UnloadedArtRecord ):
+                        continue
+
+                    record = art.load()
+
+                    # the node was located without parsing it, so make sure
+                    # we found what we thought we had.
+                    if record["id"] != art.id or record["photo_id"] != art.photo_id:
+                        raise RuntimeError( "Art record #{:d} was located as {:d} for photo {:d} but parsed as {:d} for photo {:d}.".format(
+                            art.index,
+                            art.id,
+                            art.photo_id,
+                            record["id"],
+                            record["photo_id"] ) )
+
+                    record._database = self
+                    self._share_string_tuples( record )
+
+                    photo_arts[art_index]    = record
+                    self._arts_by_id[art.id] = record
+                    self.arts[art.index]     = record
+
+                    self._unloaded_art_count -= 1
+
+                    loaded_arts.append( record )
+
+        # the tag index only holds the records that have been loaded.
+        if self._tag_index is not None:
+            self._tag_index.add( "art", loaded_arts )
+
+    def _index_unloaded_art_records( self ):
+        """
+        Updates the positions of the _UnloadedArtRecords within self.arts
+        after it has been rebuilt.
+
+        Takes no arguments.
+
+        Returns nothing.
+
+        """
+
+        if self._unloaded_art_count == 0:
+            return
+
+        for index, art in enumerate( self.arts ):
+            if isinstance( art, _UnloadedArtRecord ):
+                art.index = index
+
+    @grafinstr.instrumented( "Database.index_records" )
+    def _index_records( self ):
+        """
+        Rebuilds the database's indices from self.photos and self.arts.
+        Indices that are built on demand are discarded, except for the
+        columnar copy when it was requested at initialization.
+
+        Takes no arguments.
+
+        Returns nothing.
+
+        """
+
+        with _paused_garbage_collection():
+            self._photos_by_id.clear()
+            self._arts_by_id.clear()
+            self._arts_by_photo_id.clear()
+            self._unloaded_art_count = 0
+            self._string_tuples  = dict()
+            self._photo_times    = []
+            self._photos_by_time = []
+            self._photo_columns  = None
+            self._art_columns    = None
+            self._art_index      = None
+            self._tag_index      = None
+            self._spatial_index  = None
+
+            self._manage_records( self.photos )
+            self._manage_records( self.arts )
+            self._index_unloaded_art_records()
+
+            if self.columnar:
+                self.get_photo_columns()
+                self.get_art_columns()
+
+    @grafinstr.instrumented()
+    def load_database( self ):
+        """
+        Populates the database object from the backing store.  Uncommited
+        changes to the database are lost.
+
+        Takes no arguments.
+
+        Returns nothing.
+        """
+
+        # don't read the backing store while it's being written.
+        self.wait_for_saves()
+
+        # figure out where our backing store is.
+        def read_database( filename ):
+            backend, path = _get_database_backend( filename )
+
+            if backend == "memory":
+                return _read_memory_database()
+            elif backend == "sqlite":
+                return _read_sqlite_database( path )
+            elif backend == "shards":
+                contents            = _read_sharded_database( path, lazy=self.lazy, processes=self.processes )
+                self._photo_shards = contents[4]
+
+                return contents[:4]
+
+            # parse the XML only if we don't have a snapshot of it, and then
+            # make one for next time.  snapshots hold every record, so lazy
+            # loads skip them.
+            if self.lazy:
+                contents = _read_xml_database( path, lazy=True, processes=self.processes )
+            else:
+                contents = _read_database_cache( path )
+                if contents is None:
+                    contents = _read_xml_database( path, processes=self.processes )
+                    _write_database_cache( path, *contents )
+
+            return _replay_xml_journal( path, *contents )
+
+        # shared databases can't be read while they're being written, and we
+        # need to know which version we read.
+        backend, path = _get_database_backend( self.filename )
+
+        if self.shared and backend != "memory":
+            lock_context = _locked_database( path, exclusive=False )
+        else:
+            lock_context = contextlib.nullcontext()
+
+        # load the database and index its records.  loading creates so many
+        # objects that the garbage collector would otherwise spend more time
+        # rescanning them than we spend creating them.
+        with lock_context, _paused_garbage_collection():
+            self._photo_shards = dict()
+            self._deleted_art_photo_ids.clear()
+            self._close_sqlite_connection()
+
+            # note the SQLite database's state before reading it, so that a
+            # write racing with us is seen as a change to what we read.
+            if backend == "sqlite":
+                sqlite_file_state = _get_sqlite_file_state( path )
+
+            self.art_fields, self.processing_states, self.photos, self.arts = read_database( self.filename )
+
+            if self.shared and backend != "memory":
+                self._version = _read_database_versions( path )[0]
+
+            if backend == "sqlite":
+                self._sqlite_file_state = sqlite_file_state
+
+            self._index_records()
+
+            self._next_photo_id = max( self._photos_by_id.keys(), default=0 ) + 1
+            self._next_art_id   = max( self._arts_by_id.keys(), default=0 ) + 1
+
+        self._synced_next_photo_id = self._next_photo_id
+        self._synced_next_art_id   = self._next_art_id
+
+        # we're now in sync with the backing store.
+        self._dirty_photo_ids.clear()
+        self._dirty_art_ids.clear()
+        self._dirty_fields = False
+        self.checkpoint()
+        self.modified_data = False
+
+    def _renumber_inserted_records( self, first_photo_id, first_art_id ):
+        """
+        Assigns new identifiers to the records we've inserted since we were
+        last in sync with a shared database, so that they don't collide with
+        records other processes inserted in the meantime.  Art records follow
+        their photo records to their new identifiers.  Inserted records that
+        have since been deleted are forgotten, as there's nothing to save.
+
+        Takes 2 arguments:
+
+          first_photo_id - First identifier to assign to inserted photos.
+          first_art_id   - First identifier to assign to inserted arts.
+
+        Returns nothing.
+
+        """
+
+        inserted_photo_ids = sorted( [photo_id for photo_id in self._dirty_photo_ids
+                                      if photo_id >= self._synced_next_photo_id and photo_id in self._photos_by_id] )
+        inserted_art_ids   = sorted( [art_id for art_id in self._dirty_art_ids
+                                      if art_id >= self._synced_next_art_id and art_id in self._arts_by_id] )
+
+        photo_ids = {photo_id: new_photo_id for new_photo_id, photo_id in enumerate( inserted_photo_ids, first_photo_id )}
+        art_ids   = {art_id: new_art_id for new_art_id, art_id in enumerate( inserted_art_ids, first_art_id )}
+
+        # identifiers are immutable keys, so they're set directly once any
+        # snapshots have kept the records as they were.
+        with self._snapshot_lock:
+            for photo in self.photos:
+                if photo.id in photo_ids:
+                    self._preserve_record( photo )
+                    photo.id = photo_ids[photo.id]
+
+            for art in self.arts:
+                if isinstance( art, _UnloadedArtRecord ):
+                    continue
+
+                if art.id in art_ids or art.photo_id in photo_ids:
+                    self._preserve_record( art )
+                    art.id       = art_ids.get( art.id, art.id )
+                    art.photo_id = photo_ids.get( art.photo_id, art.photo_id )
+
+        def renumber( record_ids, new_record_ids, first_inserted_id ):
+            return set( [new_record_ids.get( record_id, record_id ) for record_id in record_ids
+                         if record_id < first_inserted_id or record_id in new_record_ids] )
+
+        self._dirty_photo_ids   = renumber( self._dirty_photo_ids, photo_ids, self._synced_next_photo_id )
+        self._changed_photo_ids = renumber( self._changed_photo_ids, photo_ids, self._synced_next_photo_id )
+        self._dirty_art_ids     = renumber( self._dirty_art_ids, art_ids, self._synced_next_art_id )
+        self._changed_art_ids   = renumber( self._changed_art_ids, art_ids, self._synced_next_art_id )
+
+        self._photo_shards = {photo_ids.get( photo_id, photo_id ): shard_name
+                              for photo_id, shard_name in self._photo_shards.items()}
+
+        self._index_records()
+
+        self._next_photo_id = first_photo_id + len( photo_ids )
+        self._next_art_id   = first_art_id + len( art_ids )
+
+    def _merge_database_versions( self, path, keep_conflicts ):
+        """
+        Merges the changes other processes saved to a shared database since
+        we were last in sync with it.  Changes to records we haven't changed
+        are applied, and records we've inserted are renumbered past those
+        others inserted.  The merged changes are not considered ours, so
+        they're neither saved nor exported.
+
+        Should be called with the database locked.
+
+        Takes 2 arguments:
+
+          path           - Path to the shared database.
+          keep_conflicts - Flag specifying how records changed both by us and
+                           another process are handled.  If True, our changes
+                           are kept and theirs are discarded.  Otherwise a
+                           DatabaseConflictError is raised and nothing is
+                           merged.
+
+        Returns 2 values:
+
+          conflicting_photo_ids - Sorted list of identifiers of photo records
+                                  changed both by us and another process.
+          conflicting_art_ids   - Sorted list of identifiers of art records
+                                  changed both by us and another process.
+
+        """
+
+        latest_version, complete_flag, entries, _ = _read_database_versions( path, self._version )
+
+        if not complete_flag:
+            raise RuntimeError( "{:s} was rewritten by another process and must be loaded again.".format( path ) )
+
+        if latest_version == self._version:
+            return ([], [])
+
+        # figure out what was changed by others.
+        their_photo_ids, their_art_ids = _get_changed_ids( entries )
+        their_fields                   = None
+
+        for entry in entries:
+            if entry["op"] == "fields":
+                their_fields = entry
+
+        # records we inserted are renumbered rather than conflicting.
+        conflicting_photo_ids = sorted( [photo_id for photo_id in their_photo_ids & self._dirty_photo_ids
+                                         if photo_id < self._synced_next_photo_id] )
+        conflicting_art_ids   = sorted( [art_id for art_id in their_art_ids & self._dirty_art_ids
+                                         if art_id < self._synced_next_art_id] )
+
+        if (len( conflicting_photo_ids ) > 0 or len( conflicting_art_ids ) > 0) and not keep_conflicts:
+            raise DatabaseConflictError( path, conflicting_photo_ids, conflicting_art_ids )
+
+        first_photo_id = max( [self._synced_next_photo_id] + [photo_id + 1 for photo_id in their_photo_ids] )
+        first_art_id   = max( [self._synced_next_art_id] + [art_id + 1 for art_id in their_art_ids] )
+
+        if first_photo_id != self._synced_next_photo_id or first_art_id != self._synced_next_art_id:
+            self._renumber_inserted_records( first_photo_id, first_art_id )
+
+        # fields are only ever added to, so concurrent changes to them are
+        # combined rather than conflicting.
+        if their_fields is not None and self._dirty_fields:
+            their_fields["art_fields"]        = {key: values + [value for value in self.art_fields.get( key, [] ) if value not in values]
+                                                 for key, values in their_fields["art_fields"].items()}
+            their_fields["processing_states"] = (their_fields["processing_states"] +
+                                                 [state for state in self.processing_states
+                                                  if state not in their_fields["processing_states"]])
+
+        # their changes to conflicting records are discarded.
+        def is_conflicting( entry ):
+            if entry["op"] in ("photo", "art"):
+                record_id = entry["record"]["id"]
+            elif entry["op"] in ("delete_photo", "delete_art"):
+                record_id = entry["id"]
+            else:
+                return False
+
+            if entry["op"] in ("photo", "delete_photo"):
+                return record_id in conflicting_photo_ids
+
+            return record_id in conflicting_art_ids
+
+        entries = [entry for entry in entries if not is_conflicting( entry )]
+
+        # apply their changes without taking them as ours.
+        modified_data = self.modified_data
+        dirty_fields  = self._dirty_fields
+
+        self._apply_change_entries( entries, _get_versions_filename( path ) )
+
+        merged_photo_ids = their_photo_ids.difference( conflicting_photo_ids )
+        merged_art_ids   = their_art_ids.difference( conflicting_art_ids )
+
+        self._dirty_photo_ids.difference_update( merged_photo_ids )
+        self._changed_photo_ids.difference_update( merged_photo_ids )
+        self._dirty_art_ids.difference_update( merged_art_ids )
+        self._changed_art_ids.difference_update( merged_art_ids )
+        self._dirty_fields   = dirty_fields
+        self._changed_fields = self._changed_fields and dirty_fields
+        self.modified_data   = modified_data
+
+        self._version              = latest_version
+        self._synced_next_photo_id = first_photo_id
+        self._synced_next_art_id   = first_art_id
+
+        return (conflicting_photo_ids, conflicting_art_ids)
+
+    @grafinstr.instrumented()
+    def reload_database( self ):
+        """
+        Brings a shared database up to date with the changes other processes
+        have saved, without loading it again.  Our unsaved changes are kept,
+        including those to records that were also changed by others, whose
+        changes are discarded.  Saving afterwards overwrites them.  Records
+        we've inserted are renumbered if others inserted records with the
+        same identifiers.
+
+        Databases that were rewritten in their entirety since they were last
+        loaded are loaded again, provided that we haven't changed anything.
+        Otherwise a RuntimeError is raised, as is the case for databases that
+        aren't shared.
+
+        Takes no arguments.
+
+        Returns 2 values:
+
+          conflicting_photo_ids - Sorted list of identifiers of photo records
+                                  changed both by us and another process.
+          conflicting_art_ids   - Sorted list of identifiers of art records
+                                  changed both by us and another process.
+
+        """
+
+        backend, path = _get_database_backend( self.filename )
+
+        if not self.shared or backend == "memory":
+            raise RuntimeError( "Only shared databases can be reloaded." )
+
+        self.wait_for_saves()
+
+        with _locked_database( path, exclusive=False ):
+            complete_flag = _read_database_versions( path, self._version )[1]
+
+            if complete_flag:
+                return self._merge_database_versions( path, keep_conflicts=True )
+
+        if self.modified_data:
+            raise RuntimeError( "{:s} was rewritten by another process and must be loaded again.".format( path ) )
+
+        self.load_database()
+
+        return ([], [])
+
+    @grafinstr.instrumented()
+    def save_database( self, filename=None, background=False, callback=None ):
+        """
+        Commits changes to the database to the supplied backing store.
+
+        Saves may be performed in the background by a worker thread so the
+        caller does not block on serializing the database or writing it to
+        disk.  A snapshot of the database, see snapshot(), is taken before
+        returning so that subsequent changes are not part of the save, and
+        background saves are written in the order requested.  Should a
+        background save fail, the database is marked dirty again the next
+        time it is saved, waited on, or asked whether it is dirty.
+
+        Takes 3 arguments:
+
+          filename   - Optional path to the on-disk file to commit changes to.
+                       If omitted, defaults to the file name supplied during
+                       the Database object's initialization.
+          background - Optional flag specifying whether the save is performed
+                       in the background.  If omitted, defaults to False.
+          callback   - Optional callable invoked with the background save's
+                       Future once the save completes.  Note that it is
+                       invoked by the worker thread.  Ignored unless
+                       background is True.
+
+        Returns 1 value:
+
+          future - concurrent.futures.Future representing the background save
+                   if background is True, None otherwise.  Its result() raises
+                   whatever exception the save raised.
+
+        """
+
+        if filename is None:
+            if self.filename is None:
+                filename = "memory"
+            else:
+                filename = self.filename
+
+        backend, path = _get_database_backend( filename )
+
+        # changes from failed background saves need saving again.
+        self._restore_failed_saves()
+
+        # shared databases take in what other processes have saved before
+        # we write over it.
+        versioned_flag = self.shared and backend != "memory" and filename == self.filename
+
+        if versioned_flag:
+            # our own background saves need to be recorded before we can
+            # tell what others have saved.
+            self.wait_for_saves()
+
+            with _locked_database( path, exclusive=True ):
+                self._merge_database_versions( path, keep_conflicts=False )
+
+        # background saves write a snapshot of the database so that we can
+        # continue to modify it while they're running.  the records to write
+        # are collected now, and are copied by the worker thread.
+        if background:
+            database_snapshot = self.snapshot()
+            snapshot_records  = []
+
+            def snapshot( records ):
+                records = list( records )
+                snapshot_records.append( records )
+
+                return records
+
+            art_fields        = database_snapshot.art_fields
+            processing_states = database_snapshot.processing_states
+        else:
+            def snapshot( records ):
+                return records
+
+            art_fields        = self.art_fields
+            processing_states = self.processing_states
+
+            # don't let this save get overwritten by an earlier one.
+            self.wait_for_saves()
+
+        if backend == "memory":
+            write_database = functools.partial( print,
+                                                "XXX: Writing out database to {:s}.".format( filename ) )
+
+        # only our own backing store is known to hold everything except the
+        # records that have changed, so only it can be updated incrementally.
+        elif backend == "sqlite" and filename == self.filename and os.path.isfile( path ):
+            photos, arts, deleted_photo_ids, deleted_art_ids = self._get_dirty_records()
+
+            write_database = functools.partial( _write_sqlite_database,
+                                                path,
+                                                art_fields,
+                                                processing_states,
+                                                snapshot( photos ),
+                                                snapshot( arts ),
+                                                deleted_photo_ids,
+                                                deleted_art_ids )
+
+        elif backend == "sqlite":
+            # only XML databases can be written without loading every
+            # record.
+            self._load_art_records()
+
+            write_database = functools.partial( _write_sqlite_database,
+                                                path,
+                                                art_fields,
+                                                processing_states,
+                                                snapshot( self.photos ),
+                                                snapshot( self.arts ) )
+
+        # only the shards holding changed records need to be written to our
+        # own backing store.
+        elif backend == "shards" and filename == self.filename and os.path.isdir( path ):
+            shards = self._get_shards( self._get_dirty_shard_names() )
+
+            write_database = functools.partial( _write_sharded_database,
+                                                path,
+                                                art_fields if self._dirty_fields else None,
+                                                processing_states,
+                                                {shard_name: (snapshot( photos ), snapshot( arts ))
+                                                 for shard_name, (photos, arts) in shards.items()} )
+
+        elif backend == "shards":
+            shards = self._get_shards()
+
+            write_database = functools.partial( _write_sharded_database,
+                                                path,
+                                                art_fields,
+                                                processing_states,
+                                                {shard_name: (snapshot( photos ), snapshot( arts ))
+                                                 for shard_name, (photos, arts) in shards.items()},
+                                                replace=True )
+
+        elif backend == "xml" and self.journal and filename == self.filename and os.path.isfile( path ):
+            photos, arts, deleted_photo_ids, deleted_art_ids = self._get_dirty_records()
+
+            write_database = functools.partial( _append_xml_journal,
+                                                path,
+                                                art_fields if self._dirty_fields else None,
+                                                processing_states,
+                                                snapshot( photos ),
+                                                snapshot( arts ),
+                                                deleted_photo_ids,
+                                                deleted_art_ids )
+
+        else:
+            write_database = functools.partial( _write_xml_database,
+                                                path,
+                                                art_fields,
+                                                processing_states,
+                                                snapshot( self.photos ),
+                                                snapshot( self.arts ) )
+
+        # our own SQLite backing store holds exactly our records once it's
+        # written, so it can answer lookups until either changes.
+        if backend == "sqlite" and filename == self.filename:
+            write_database = functools.partial( self._write_synced_sqlite_database,
+                                                path,
+                                                write_database )
+
+        # record our changes as the shared database's next version.
+        if versioned_flag:
+            photos, arts, deleted_photo_ids, deleted_art_ids = self._get_dirty_records()
+
+            write_database = functools.partial( _write_versioned_database,
+                                                path,
+                                                self._version,
+                                                _get_change_entries( art_fields if self._dirty_fields else None,
+                                                                     processing_states,
+                                                                     photos,
+                                                                     arts,
+                                                                     deleted_photo_ids,
+                                                                     deleted_art_ids ),
+                                                write_database )
+
+            version_state = ((self._version, self._synced_next_photo_id, self._synced_next_art_id),
+                             (self._version + 1, self._next_photo_id, self._next_art_id))
+        else:
+            version_state = None
+
+            # databases that already exist may be shared by others, who need
+            # to know that we wrote over what they've seen.
+            if backend != "memory" and os.path.exists( path ):
+                write_database = functools.partial( _write_unversioned_database,
+                                                    path,
+                                                    write_database )
+
+        # forget the changes we're committing to our backing store.  saving
+        # elsewhere doesn't change what our backing store is missing.
+        #
+        # NOTE: we keep what we forgot so it can be restored should a
+        #       background save fail.
+        #
+        committed_state = (set( self._dirty_photo_ids ),
+                           set( self._dirty_art_ids ),
+                           self._dirty_fields,
+                           (set( self._changed_photo_ids ),
+                            set( self._changed_art_ids ),
+                            self._changed_fields),
+                           filename == self.filename,
+                           version_state)
+
+        if not background:
+            write_database()
+            self._clear_committed_state( committed_state )
+
+            return None
+
+        self._clear_committed_state( committed_state )
+
+        if self._save_executor is None:
+            self._save_executor = concurrent.futures.ThreadPoolExecutor( max_workers=1 )
+
+        future = self._save_executor.submit( database_snapshot._write_records,
+                                             snapshot_records,
+                                             write_database )
+        if callback is not None:
+            future.add_done_callback( callback )
+
+        self._pending_save = future
+        self._unchecked_saves.append( (future, committed_state) )
+
+        return future
+
+    @grafinstr.instrumented()
+    def snapshot( self ):
+        """
+        Takes a read-only, point-in-time view of the database.  Taking a
+        snapshot is cheap: records are shared with the database rather than
+        copied, and the database only copies a record, for the snapshot, when
+        it modifies it.  Records inserted or deleted afterwards don't affect
+        the snapshot.  Records are retrieved from the snapshot as read-only
+        SnapshotRecords.
+
+        Snapshots let other threads read the database, e.g. to build
+        DataFrames or export it, without blocking its edits.  Snapshots
+        should be closed once they're no longer needed, otherwise modified
+        records are copied for them until they're garbage collected.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          snapshot - DatabaseSnapshot object.
+
+        """
+
+        with self._snapshot_lock:
+            snapshot = DatabaseSnapshot( self )
+            self._snapshots.add( snapshot )
+
+        return snapshot
+
+    def _preserve_record( self, record ):
+        """
+        Lets each of the database's snapshots keep a copy of a record before
+        it is modified.  Must be called with the snapshot lock held.
+
+        Takes 1 argument:
+
+          record - The PhotoRecord or ArtRecord that is about to be modified.
+
+        Returns nothing.
+
+        """
+
+        for snapshot in self._snapshots:
+            snapshot._preserve_record( record )
+
+    def _clear_committed_state( self, committed_state ):
+        """
+        Marks the database clean after (or while) it has been committed to a
+        backing store.
+
+        Takes 1 argument:
+
+          committed_state - Tuple of (dirty photo identifiers, dirty art
+                            identifiers, dirty fields flag, changed state,
+                            backing store flag, version state) captured when
+                            the save was requested.  The changed state is a
+                            tuple of (changed photo identifiers, changed art
+                            identifiers, changed fields flag).  The dirty and
+                            changed states are only forgotten when the
+                            backing store flag is True.  The version state is
+                            None unless a shared database is saved, in which
+                            case it is a tuple of the (version, next photo
+                            identifier, next art identifier) before and after
+                            the save.
+
+        Returns nothing.
+
+        """
+
+        dirty_photo_ids, dirty_art_ids, _, changed_state, backing_store_flag, version_state = committed_state
+
+        if version_state is not None:
+            self._version, self._synced_next_photo_id, self._synced_next_art_id = version_state[1]
+
+        if backing_store_flag:
+            self._dirty_photo_ids.difference_update( dirty_photo_ids )
+            self._dirty_art_ids.difference_update( dirty_art_ids )
+            self._dirty_fields = False
+
+            # saving is a checkpoint.
+            self._changed_photo_ids.difference_update( changed_state[0] )
+            self._changed_art_ids.difference_update( changed_state[1] )
+            self._changed_fields = False
+
+        # mark our data as clean again.
+        self.modified_data = False
+
+    def _restore_committed_state( self, committed_state ):
+        """
+        Marks the database dirty after committing it to a backing store
+        failed.
+
+        Takes 1 argument:
+
+          committed_state - Tuple of (dirty photo identifiers, dirty art
+                            identifiers, dirty fields flag, changed state,
+                            backing store flag, version state) captured when
+                            the save was requested.  See
+                            _clear_committed_state() for details.
+
+        Returns nothing.
+
+        """
+
+        dirty_photo_ids, dirty_art_ids, dirty_fields, changed_state, backing_store_flag, version_state = committed_state
+
+        # a later save queued behind this one fails along with it, so take
+        # whichever version is older rather than the one restored last.
+        if version_state is not None:
+            self._version              = min( self._version, version_state[0][0] )
+            self._synced_next_photo_id = min( self._synced_next_photo_id, version_state[0][1] )
+            self._synced_next_art_id   = min( self._synced_next_art_id, version_state[0][2] )
+
+        if backing_store_flag:
+            self._dirty_photo_ids.update( dirty_photo_ids )
+            self._dirty_art_ids.update( dirty_art_ids )
+            self._dirty_fields = self._dirty_fields or dirty_fields
+
+            self._changed_photo_ids.update( changed_state[0] )
+            self._changed_art_ids.update( changed_state[1] )
+            self._changed_fields = self._changed_fields or changed_state[2]
+
+        self.modified_data = True
+
+    def _restore_failed_saves( self ):
+        """
+        Marks the database dirty again for each background save that has
+        failed since this was last called.  Failed saves aren't restored by
+        the worker thread, so this must be called by the thread using the
+        database.
+
+        Takes no arguments.
+
+        Returns nothing.
+
+        """
+
+        # saves complete in order, so stop at the first that's still running.
+        while len( self._unchecked_saves ) > 0 and self._unchecked_saves[0][0].done():
+            future, committed_state = self._unchecked_saves.popleft()
+
+            if future.cancelled() or future.exception() is not None:
+                self._restore_committed_state( committed_state )
+
+    def wait_for_saves( self, timeout=None ):
+        """
+        Waits for any background saves to complete.  The database is marked
+        dirty again for those that failed.
+
+        Takes 1 argument:
+
+          timeout - Optional number of seconds to wait.  If omitted, waits
+                    indefinitely.
+
+        Returns 1 value:
+
+          done - Flag indicating whether all of the background saves have
+                 completed.
+
+        """
+
+        if self._pending_save is None:
+            return True
+
+        # saves are performed in order, so the last one finishes last.
+        done, _ = concurrent.futures.wait( [self._pending_save], timeout=timeout )
+
+        self._restore_failed_saves()
+
+        return len( done ) > 0
+
+    def _write_synced_sqlite_database( self, filename, write_database ):
+        """
+        Writes our SQLite backing store and notes its state afterwards, as it
+        then holds exactly the records we do.  This may be called by the
+        worker thread performing a background save.
+
+        Takes 2 arguments:
+
+          filename       - Path to the SQLite database.
+          write_database - Callable taking no arguments that writes the
+                           database.
+
+        Returns nothing.
+
+        """
+
+        self._sqlite_file_state = None
+
+        write_database()
+
+        self._sqlite_file_state = _get_sqlite_file_state( filename )
+
+    def _close_sqlite_connection( self ):
+        """
+        Closes the connection used to query our SQLite backing store, if it
+        was opened.
+
+        Takes no arguments.
+
+        Returns nothing.
+
+        """
+
+        self._sqlite_file_state = None
+
+        if self._sqlite_connection is not None:
+            self._sqlite_connection.close()
+            self._sqlite_connection = None
+
+    def _get_sqlite_connection( self, photos=False, arts=False ):
+        """
+        Gets a connection to our SQLite backing store for answering lookups
+        with its indices.  This is only possible while it holds exactly the
+        records we do: it hasn't been written since we last loaded or saved
+        it, no background saves are outstanding, and the records looked up
+        haven't been changed since.  Lookups are answered from memory
+        otherwise.
+
+        Takes 2 arguments:
+
+          photos - Optional flag specifying whether photo records are looked
+                   up.  If omitted, defaults to False.
+          arts   - Optional flag specifying whether art records are looked
+                   up.  If omitted, defaults to False.
+
+        Returns 1 value:
+
+          connection - sqlite3.Connection to the backing store, or None if it
+                       can't answer the lookup.
+
+        """
+
+        if self._sqlite_file_state is None:
+            return None
+
+        # saves that are still running haven't written what we hold.
+        self._restore_failed_saves()
+
+        if len( self._unchecked_saves ) > 0:
+            return None
+
+        if (photos and len( self._dirty_photo_ids ) > 0) or (arts and len( self._dirty_art_ids ) > 0):
+            return None
+
+        path = _get_database_backend( self.filename )[1]
+
+        if _get_sqlite_file_state( path ) != self._sqlite_file_state:
+            return None
+
+        # NOTE: the connection only ever reads, and lookups may come from
+        #       whichever thread is using the database.
+        #
+        if self._sqlite_connection is None:
+            self._sqlite_connection = sqlite3.connect( path, check_same_thread=False )
+
+        return self._sqlite_connection
+
+    @grafinstr.instrumented()
+    def compact_database( self ):
+        """
+        Folds a journaled XML database's journal back into the database by
+        writing it in its entirety.  The journal is removed afterwards.  Does
+        nothing for other backing stores.
+
+        The version log is emptied too, as the compacted database holds
+        every version.  Processes sharing the database that haven't merged
+        the latest version load it again rather than merging.
+
+        Takes no arguments.
+
+        Returns nothing.
+
+        """
+
+        backend, path = _get_database_backend( self.filename )
+
+        if backend != "xml":
+            return
+
+        self.wait_for_saves()
+
+        # shared databases may have been journaled to by others since we
+        # loaded them.  our changes are saved, and theirs merged, so that the
+        # compacted database holds everything and keeps its version.
+        #
+        # NOTE: the version log is rebased at our version, dropping the
+        #       changes it holds, or past every version in it if we aren't
+        #       shared as we may have overwritten what others saved.
+        #
+        if self.shared:
+            self.save_database()
+
+        with _locked_database( path, exclusive=True ):
+            if self.shared:
+                self._merge_database_versions( path, keep_conflicts=False )
+
+            _write_xml_database( path,
+                                 self.art_fields,
+                                 self.processing_states,
+                                 self.photos,
+                                 self.arts )
+
+            # the compacted database holds every version, so the log only
+            # needs to say which one.
+            if self.shared:
+                _rebase_database_versions( path, self._version )
+            else:
+                _rebase_database_versions( path, _read_database_versions( path )[0] + 1 )
+
+        self._dirty_photo_ids.clear()
+        self._dirty_art_ids.clear()
+        self._dirty_fields = False
+        self.checkpoint()
+        self.modified_data = False
+
+    @grafinstr.instrumented()
+    def export_changes( self, filename, checkpoint=False ):
+        """
+        Writes the changes made since the last checkpoint to a file so that
+        they can be applied to another copy of the database with
+        import_changes().  Only the records that changed are written, along
+        with the art fields and processing states if they changed.  See
+        changed_records() for how changes are tracked.
+
+        Changes are written as JSON, one change per line, in the same form
+        as a journaled XML database's journal.
+
+        Takes 2 arguments:
+
+          filename   - Path to the file to write.  Any existing file is
+                       replaced.
+          checkpoint - Optional flag specifying whether a checkpoint is made
+                       after the changes are written, so the next export only
+                       contains changes made afterwards.  If omitted,
+                       defaults to False.
+
+        Returns nothing.
+
+        """
+
+        photos, arts, deleted_photo_ids, deleted_art_ids = self.changed_records()
+
+        entries = [{ "op": "changes", "time": time.time() }]
+        entries.extend( _get_change_entries( self.art_fields if self._changed_fields else None,
+                                             self.processing_states,
+                                             photos,
+                                             arts,
+                                             deleted_photo_ids,
+                                             deleted_art_ids ) )
+        entries.append( { "op": "commit", "time": time.time() } )
+
+        with _atomic_open( filename ) as f:
+            f.write( "".join( [json.dumps( entry ) + "\n" for entry in entries] ).encode( "utf-8" ) )
+
+        if checkpoint:
+            self.checkpoint()
+
+    @grafinstr.instrumented()
+    def import_changes( self, filename ):
+        """
+        Applies changes written by export_changes() to the database.  Updated
+        records are modified through their keys, inserted records are
+        inserted with the identifiers they were exported with, and deleted
+        records are deleted.  Every change is checked before any of them are
+        made, so that either all or none of the changes are applied.
+
+        Changes to an existing record's immutable keys cause a KeyError to
+        be raised.  Other changes that cannot be applied, such as art records
+        whose photo record doesn't exist, or deleted photo records, since the
+        database does not support deleting them, cause a RuntimeError to be
+        raised.
+
+        Takes 1 argument:
+
+          filename - Path to the file of changes to apply.
+
+        Returns nothing.
+
+        """
+
+        with open( filename, "rt" ) as f:
+            change_lines = f.readlines()
+
+        try:
+            entries = [json.loads( change_line ) for change_line in change_lines]
+        except ValueError:
+            raise RuntimeError( "{:s} does not contain valid changes.".format( filename ) )
+
+        # exports are written atomically, so anything incomplete isn't one of
+        # ours.
+        if (len( entries ) < 2 or
+            entries[0].get( "op" ) != "changes" or
+            entries[-1].get( "op" ) != "commit"):
+            raise RuntimeError( "{:s} does not contain a complete set of changes.".format( filename ) )
+
+        self._apply_change_entries( entries[1:-1], filename )
+
+    def _apply_change_entries( self, entries, source ):
+        """
+        Applies a set of changes, in the form written by
+        _get_change_entries(), to the database.  See import_changes() for
+        how they're applied and the exceptions raised when they can't be.
+
+        Takes 2 arguments:
+
+          entries - List of change entries to apply.
+          source  - String naming where the changes came from.  Used when
+                    reporting errors.
+
+        Returns nothing.
+
+        """
+
+        art_fields        = None
+        processing_states = None
+        photos_fields     = []
+        arts_fields       = []
+        deleted_art_ids   = []
+
+        for entry in entries:
+            if entry["op"] == "fields":
+                art_fields        = entry["art_fields"]
+                processing_states = entry["processing_states"]
+            elif entry["op"] == "photo":
+                photos_fields.append( entry["record"] )
+            elif entry["op"] == "art":
+                if entry["record"]["region"] is not None:
+                    entry["record"]["region"] = tuple( entry["record"]["region"] )
+
+                arts_fields.append( entry["record"] )
+            elif entry["op"] == "delete_photo":
+                if entry["id"] in self._photos_by_id:
+                    raise RuntimeError( "Photo record #{:d} cannot be deleted.".format( entry["id"] ) )
+            elif entry["op"] == "delete_art":
+                deleted_art_ids.append( entry["id"] )
+            else:
+                raise RuntimeError( "Unknown change '{:s}' in {:s}.".format( entry["op"],
+                                                                             source ) )
+
+        if art_fields is not None:
+            _validate_art_fields( art_fields, processing_states )
+
+        # existing art records need to be loaded before they can be updated.
+        self._load_art_records( [self._arts_by_id[record_fields["id"]]["photo_id"]
+                                 for record_fields in arts_fields if record_fields["id"] in self._arts_by_id] )
+
+        # refuse the entire import if any record can't take its changes.
+        new_photo_ids = set( [record_fields["id"] for record_fields in photos_fields
+                              if record_fields["id"] not in self._photos_by_id] )
+
+        for record_fields in arts_fields:
+            if (record_fields["id"] not in self._arts_by_id and
+                record_fields["photo_id"] not in self._photos_by_id and
+                record_fields["photo_id"] not in new_photo_ids):
+                raise RuntimeError( "Art record #{:d} refers to photo record #{:d} which does not exist.".format(
+                    record_fields["id"],
+                    record_fields["photo_id"] ) )
+
+        for records_by_id, records_fields in ((self._photos_by_id, photos_fields),
+                                              (self._arts_by_id, arts_fields)):
+            for record_fields in records_fields:
+                record = records_by_id.get( record_fields["id"] )
+                if record is None:
+                    continue
+
+                record_dict = _record_to_dict( record )
+                for key in record._keys:
+                    if key not in record._mutable_keys and record_dict[key] != record_fields[key]:
+                        raise KeyError( "{:s} is not a mutable key of {:s}!".format( key, str( record ) ) )
+
+        if art_fields is not None:
+            self.art_fields        = art_fields
+            self.processing_states = processing_states
+            self._dirty_fields     = True
+            self._changed_fields   = True
+
+        # apply the updates and collect the insertions.
+        new_photos = []
+        new_arts   = []
+
+        with _paused_garbage_collection():
+            for record_class, records_by_id, records_fields, new_records in ((PhotoRecord, self._photos_by_id, photos_fields, new_photos),
+                                                                             (ArtRecord, self._arts_by_id, arts_fields, new_arts)):
+                for record_fields in records_fields:
+                    record = records_by_id.get( record_fields["id"] )
+
+                    if record is None:
+                        new_records.append( record_class( **record_fields ) )
+                        continue
+
+                    record_dict = _record_to_dict( record )
+                    for key in record._mutable_keys:
+                        if record_dict[key] != record_fields[key]:
+                            record[key] = record_fields[key]
+
+        self.photos.extend( new_photos )
+        self.arts.extend( new_arts )
+        self._manage_records( itertools.chain( new_photos, new_arts ) )
+
+        self._dirty_photo_ids.update( [photo["id"] for photo in new_photos] )
+        self._changed_photo_ids.update( [photo["id"] for photo in new_photos] )
+        self._dirty_art_ids.update( [art["id"] for art in new_arts] )
+        self._changed_art_ids.update( [art["id"] for art in new_arts] )
+
+        # identifiers are never reused, including the ones we were given.
+        self._next_photo_id = max( [self._next_photo_id] + [photo["id"] + 1 for photo in new_photos] )
+        self._next_art_id   = max( [self._next_art_id] + [art["id"] + 1 for art in new_arts] )
+
+        self.delete_art_records( deleted_art_ids )
+
+        self.mark_data_dirty()
+
+    @grafinstr.instrumented()
+    def export_mapped_database( self, filename ):
+        """
+        Writes a read-only copy of the database in a fixed binary layout that
+        can be mapped into memory by MappedDatabase.  Analysis jobs that open
+        the copy share its pages between processes instead of each parsing
+        and holding its own copy of the records.  The copy does not track
+        subsequent changes to the database.
+
+        Takes 1 argument:
+
+          filename - Path to the file to write.  Any existing file is
+                     replaced.
+
+        Returns nothing.
+
+        """
+
+        snapshot = self.snapshot()
+
+        try:
+            snapshot.export_mapped_database( filename )
+        finally:
+            snapshot.close()
+
+    @grafinstr.instrumented()
+    def get_photo_records( self, photo_ids=None ):
+        """
+        Retrieves all of the PhotoRecord's in the database matching the
+        supplied identifiers.  Records returned are in the same order of the
+        supplied photo identifiers.  SQLite databases look the identifiers up
+        in the database when it holds exactly our records.
+
+        Takes 1 argument:
+
+          photo_ids - List of photo identifiers whose PhotoRecords are needed.
+                      If specified as None, all PhotoRecords in the database
+                      are requested.
+
+        Returns 1 value:
+
+          requested_photos - A list of PhotoRecord's matching the requested
+                             identifiers.  If only a single identifier was requested
+                             then requested_photos will be scalar instead of a list
+                             as a convenience.
+
+        """
+
+        if photo_ids is None:
+            return self.photos
+
+        if type( photo_ids ) != list:
+            photo_ids  = [photo_ids]
+            scalar_out = True
+        else:
+            scalar_out = False
+
+        # find which of the identifiers the backing store has, if it can
+        # tell us, rather than assuming we know.
+        connection = self._get_sqlite_connection( photos=True )
+
+        if connection is not None:
+            photo_ids_found = set( [photo_id for (photo_id,) in _query_sqlite_values( connection,
+                                                                                      "SELECT id FROM photos WHERE id IN ({:s})",
+                                                                                      photo_ids )] )
+        else:
+            photo_ids_found = self._photos_by_id
+
+        # build a list of the PhotoRecords in the same order requested.
+        requested_photos = [self._photos_by_id[photo_id] for photo_id in photo_ids if photo_id in photo_ids_found]
+
+        # help the user and return a scalar if they requested a single record.
+        #
+        # NOTE: this assumes that the identifiers are unique and can't return
+        #       multiple records...
+        #
+        if scalar_out:
+            requested_photos = requested_photos[0]
+
+        return requested_photos
+
+    @grafinstr.instrumented()
+    def get_photo_records_by_time( self, start_time=None, end_time=None, end_inclusive=True, reverse=False ):
+        """
+        Retrieves PhotoRecords in the database whose photo was taken within
+        the supplied time window.  Records are returned sorted by the time
+        their photo was taken.  SQLite databases find the window with the
+        database's index of photo times when it holds exactly our records.
+
+        Takes 4 arguments:
+
+          start_time    - Optional start time for the window.  If omitted,
+                          defaults to the timestamp for the oldest photo in
+                          the database.
+          end_time      - Optional end time for the window.  If omitted,
+                          defaults to the timestamp for the youngest photo in
+                          the database.
+          end_inclusive - Optional flag specifying whether photos taken at
+                          end_time are within the window.  If False, the
+                          window is half-open, so that adjacent windows do not
+                          overlap.  If omitted, defaults to True.
+          reverse       - Optional flag specifying whether the records are
+                          returned youngest first.  If omitted, defaults to
+                          False.
+
+        Returns 1 value:
+
+          photos - A list of PhotoRecord's matching the requested time window.
+                   If neither start_time nor end_time are supplied, and
+                   reverse is False, all of the PhotoRecords are returned in
+                   database order instead.
+
+        """
+
+        # if the user hasn't requested a specific time period, return
+        # everything we have.
+        if start_time is None and end_time is None and not reverse:
+            return self.photos
+
+        connection = self._get_sqlite_connection( photos=True )
+
+        if connection is not None:
+            conditions = []
+            parameters = []
+
+            if start_time is not None:
+                conditions.append( "photo_time >= ?" )
+                parameters.append( start_time )
+
+            if end_time is not None:
+                conditions.append( "photo_time <= ?" if end_inclusive else "photo_time < ?" )
+                parameters.append( end_time )
+
+            # photos taken at the same time are ordered by identifier.
+            statement = "SELECT id FROM photos"
+            if len( conditions ) > 0:
+                statement += " WHERE " + " AND ".join( conditions )
+            statement += " ORDER BY photo_time {0:s}, id {0:s}".format( "DESC" if reverse else "ASC" )
+
+            return [self._photos_by_id[photo_id] for (photo_id,) in connection.execute( statement, parameters ).fetchall()]
+
+        # find the boundaries of the window.  missing boundaries extend to the
+        # oldest and youngest photos.
+        if start_time is None:
+            start_index = 0
+        else:
+            start_index = bisect.bisect_left( self._photo_times, start_time )
+
+        if end_time is None:
+            end_index = len( self._photo_times )
+        elif end_inclusive:
+            end_index = bisect.bisect_right( self._photo_times, end_time )
+        else:
+            end_index = bisect.bisect_left( self._photo_times, end_time )
+
+        photos = self._photos_by_time[start_index:end_index]
+
+        if reverse:
+            photos.reverse()
+
+        return photos
+
+    def new_photo_record( self, file_name, **kwargs ):
+        """
+        Inserts a new photo record for the supplied file into the database.
+        Aside from the resolution, default values are used for the record's
+        fields.
+
+        Takes 2 arguments:
+
+          file_name - Path to the photo on disk.
+          kwargs    - Optional keyword arguments containing the key/value
+                      pairs to initialize the PhotoRecord with.
+
+        Returns 1 value:
+
+          photo_record - The created PhotoRecord object.
+
+        """
+
+        return self.new_photo_records( [dict( kwargs, filename=file_name )] )[0]
+
+    @grafinstr.instrumented()
+    def new_photo_records( self, photos_fields ):
+        """
+        Inserts new photo records into the database, one per set of fields
+        supplied.  Identifiers are allocated in the order the fields are
+        supplied and the database's indices are updated once for the entire
+        batch.
+
+        Takes 1 argument:
+
+          photos_fields - Iterable of dictionaries, one per record, containing
+                          the key/value pairs to initialize each PhotoRecord
+                          with.  Each must contain the "filename" key.
+
+        Returns 1 value:
+
+          photo_records - List of the created PhotoRecord objects.
+
+        """
+
+        photos = []
+
+        with _paused_garbage_collection():
+            for photo_fields in photos_fields:
+                photo_fields = dict( photo_fields )
+                file_name    = photo_fields.pop( "filename" )
+
+                photos.append( PhotoRecord( self._next_photo_id,
+                                            file_name,
+                                            **photo_fields ) )
+                self._next_photo_id += 1
+
+        if len( photos ) == 0:
+            return photos
+
+        self.photos.extend( photos )
+
+        self._manage_records( photos )
+        self._dirty_photo_ids.update( [photo["id"] for photo in photos] )
+        self._changed_photo_ids.update( [photo["id"] for photo in photos] )
+        self.mark_data_dirty()
+
+        return photos
+
+    @grafinstr.instrumented()
+    def get_art_records( self, photo_ids=None ):
+        """
+        Retrieves all of the ArtRecord's in the database associated with the
+        supplied PhotoRecords identifiers.  Returned records are grouped in
+        the same order of the supplied photo identifiers.  If the database was
+        loaded lazily, the requested ArtRecords are loaded first.  SQLite
+        databases find the records with the database's index of photo
+        identifiers when it holds exactly our records.
+
+        Takes 1 argument:
+
+          photo_ids - List of photo identifiers whose associated ArtRecords
+                      are needed.  If specified as None, all ArtRecords in
+                      the database are requested.
+
+        Returns 1 value:
+
+          requested_art - A list of ArtRecord's matching the requested
+                          identifiers.
+
+        """
+
+        #
+        # NOTE: this interface isn't the most flexible though was designed to
+        #       directly support the following use cases:
+        #
+        #         * art records associated with a particular photo
+        #         * arbitrary art records (no use case through the OMI)
+        #         * all art records
+        #
+
+        if photo_ids is None:
+            self._load_art_records()
+
+            return self.arts
+        elif type( photo_ids ) != list:
+            photo_ids = [photo_ids]
+
+        connection = self._get_sqlite_connection( arts=True )
+
+        if connection is not None:
+            art_ids_by_photo_id = dict()
+
+            # photos requested more than once are only selected once.
+            for art_id, photo_id in _query_sqlite_values( connection,
+                                                          "SELECT id, photo_id FROM arts WHERE photo_id IN ({:s}) ORDER BY id",
+                                                          list( dict.fromkeys( photo_ids ) ) ):
+                art_ids_by_photo_id.setdefault( photo_id, [] ).append( art_id )
+
+            # build a list of the ArtRecords in the same order requested.
+            requested_art = []
+            for photo_id in photo_ids:
+                requested_art.extend( [self._arts_by_id[art_id] for art_id in art_ids_by_photo_id.get( photo_id, [] )] )
+
+            return requested_art
+
+        self._load_art_records( photo_ids )
+
+        # build a list of the ArtRecords in the same order requested.
+        requested_art = []
+        for photo_id in photo_ids:
+            requested_art.extend( self._arts_by_photo_id.get( photo_id, [] ) )
+
+        return requested_art
+
+    def new_art_record( self, photo_id ):
+        """
+        Creates a new art record initialized with default values. XXX
+
+        Takes 1 argument:
+
+          photo_id - XXX
+
+        Returns 1 value:
+
+          art_record - XXX
+
+        """
+
+        return self.new_art_records( [{ "photo_id": photo_id }] )[0]
+
+    @grafinstr.instrumented()
+    def new_art_records( self, arts_fields ):
+        """
+        Inserts new art records into the database, one per set of fields
+        supplied.  Identifiers are allocated in the order the fields are
+        supplied and the database's indices are updated once for the entire
+        batch.
+
+        Takes 1 argument:
+
+          arts_fields - Iterable of dictionaries, one per record, containing
+                        the key/value pairs to initialize each ArtRecord with.
+                        Each must contain the "photo_id" key.  Records without
+                        a "type" are throwups.
+
+        Returns 1 value:
+
+          art_records - List of the created ArtRecord objects.
+
+        """
+
+        arts = []
+
+        with _paused_garbage_collection():
+            for art_fields in arts_fields:
+                art_fields = dict( art_fields )
+                photo_id   = art_fields.pop( "photo_id" )
+
+                # XXX: hardcoded constant
+                art_type   = art_fields.pop( "type", "throwup" )
+
+                arts.append( ArtRecord( self._next_art_id,
+                                        photo_id,
+                                        art_type,
+                                        **art_fields ) )
+                self._next_art_id += 1
+
+        if len( arts ) == 0:
+            return arts
+
+        self.arts.extend( arts )
+
+        self._manage_records( arts )
+        self._dirty_art_ids.update( [art["id"] for art in arts] )
+        self._changed_art_ids.update( [art["id"] for art in arts] )
+        self.mark_data_dirty()
+
+        return arts
+
+    def delete_art_record( self, art_id ):
+        """
+        Deletes an art record from the database.  Nothing is deleted if the
+        record doesn't exist.
+
+        Takes 1 argument:
+
+          art_id - Identifier of the ArtRecord to delete.
+
+        Returns nothing.
+
+        """
+
+        self.delete_art_records( [art_id] )
+
+    @grafinstr.instrumented()
+    def delete_art_records( self, art_ids ):
+        """
+        Deletes art records from the database.  Identifiers of records that
+        don't exist are ignored.  The database's records are filtered once
+        for the entire batch.
+
+        Takes 1 argument:
+
+          art_ids - Iterable of identifiers of the ArtRecords to delete.
+
+        Returns nothing.
+
+        """
+
+        art_ids = set( art_ids )
+        if len( art_ids ) == 0:
+            return
+
+        deleted_count = 0
+
+        for art_id in art_ids:
+            # nothing to do if we don't know about this record.
+            art = self._arts_by_id.pop( art_id, None )
+            if art is None:
+                continue
+
+            deleted_count += 1
+
+            self._dirty_art_ids.add( art_id )
+            self._changed_art_ids.add( art_id )
+            self._deleted_art_photo_ids[art_id] = art["photo_id"]
+
+            if self._art_columns is not None:
+                self._art_columns.remove( art_id )
+            if self._art_index is not None:
+                self._art_index.remove( art )
+            if self._tag_index is not None and not isinstance( art, _UnloadedArtRecord ):
+                self._tag_index.remove( "art", art )
+
+            # remove the record from our indices...
+            photo_arts = self._arts_by_photo_id[art["photo_id"]]
+            photo_arts.remove( art )
+            if len( photo_arts ) == 0:
+                del self._arts_by_photo_id[art["photo_id"]]
+
+            if isinstance( art, _UnloadedArtRecord ):
+                self._unloaded_art_count -= 1
+
+        if deleted_count == 0:
+            return
+
+        self.mark_data_dirty()
+
+        # ... and filter out the records that match the supplied identifiers.
+        self.arts = [art for art in self.arts if art["id"] not in art_ids]
+        self._index_unloaded_art_records()
+
+    @grafinstr.instrumented()
+    def update_records( self, predicate, changes ):
+        """
+        Updates every photo and art record in the database accepted by the
+        supplied predicate with the same changes.  Every change is checked
+        against every accepted record before any of them are made, so that
+        either all or none of the records are updated.
+
+        Takes 2 arguments:
+
+          predicate - Callable taking a PhotoRecord or ArtRecord and returning
+                      True if the record should be updated.
+          changes   - Dictionary mapping keys to their new values.  List
+                      values are copied for each record so that records don't
+                      share them.
+
+        Returns 1 value:
+
+          records - List of the records updated.
+
+        """
+
+        self._load_art_records()
+
+        records = [record for record in itertools.chain( self.photos, self.arts ) if predicate( record )]
+
+        # refuse the entire update if any record can't take it.
+        for record in records:
+            for key in changes:
+                if key not in record._mutable_keys:
+                    raise KeyError( "{:s} is not a mutable key of {:s}!".format( key, str( record ) ) )
+
+        for record in records:
+            for key, value in changes.items():
+                if isinstance( value, list ):
+                    value = list( value )
+
+                record[key] = value
+
+        return records
+
+    @grafinstr.instrumented()
+    def get_photo_columns( self ):
+        """
+        Gets a columnar copy of the PhotoRecords, one row per record in
+        database order.  The copy is kept current as records are inserted
+        and modified.  See GraffitiAnalysis.columns.PHOTO_COLUMNS for the
+        columns available.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          photo_columns - ColumnStore containing the PhotoRecords.
+
+        """
+
+        if self._photo_columns is None:
+            self._photo_columns = grafcolumns.ColumnStore( grafcolumns.PHOTO_COLUMNS,
+                                                           { "state": self.processing_states },
+                                                           self.photos )
+
+        return self._photo_columns
+
+    @grafinstr.instrumented()
+    def get_art_columns( self ):
+        """
+        Gets a columnar copy of the ArtRecords, one row per record in
+        database order.  The copy is kept current as records are inserted,
+        modified, and deleted.  See GraffitiAnalysis.columns.ART_COLUMNS for
+        the columns available.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          art_columns - ColumnStore containing the ArtRecords.
+
+        """
+
+        if self._art_columns is None:
+            self._load_art_records()
+
+            self._art_columns = grafcolumns.ColumnStore( grafcolumns.ART_COLUMNS,
+                                                         { "type":    self.art_fields["types"],
+                                                           "size":    self.art_fields["sizes"],
+                                                           "quality": self.art_fields["qualities"],
+                                                           "state":   self.processing_states },
+                                                         self.arts )
+
+        return self._art_columns
+
+    @grafinstr.instrumented()
+    def query_art_records( self, **criteria ):
+        """
+        Retrieves the ArtRecords in the database matching all of the
+        supplied criteria.  Queries are answered from an index of the art
+        records' values, built the first time this is called, rather than by
+        examining every record.  For example:
+
+          database.query_art_records( artist="Badu",
+                                      associate="PBR",
+                                      type="throwup",
+                                      state="reviewed" )
+
+        Each criterion's value is either a single value, or a list of values.
+        For criteria naming keys that hold a list of values (artist,
+        associate, vandal, and tag), records match when they have every
+        value listed.  For the others, records match when they have any of
+        the values listed.
+
+        The index is kept current as records are inserted, deleted, and
+        modified through their keys.  Lists modified in place, rather than
+        being assigned, are not seen by the index.  Queries solely by state
+        are answered by a SQLite database's index of states, without building
+        ours, when the database holds exactly our records.
+
+        Takes 1 argument:
+
+          criteria - Keyword arguments naming the values required.  Any of
+                     artist, associate, vandal, type, size, quality, state,
+                     tag, and date may be supplied, though at least one is
+                     required.
+
+        Returns 1 value:
+
+          requested_art - A list of ArtRecords matching the criteria, ordered
+                          by identifier.
+
+        """
+
+        # only build our index when the backing store's won't do.
+        connection = None
+        if self._art_index is None and list( criteria.keys() ) == ["state"]:
+            connection = self._get_sqlite_connection( arts=True )
+
+        if connection is not None:
+            states = criteria["state"]
+            if not isinstance( states, (list, tuple, set, frozenset) ):
+                states = [states]
+
+            return [self._arts_by_id[art_id] for (art_id,) in sorted( _query_sqlite_values( connection,
+                                                                                            "SELECT id FROM arts WHERE state IN ({:s})",
+                                                                                            list( states ) ) )]
+
+        if self._art_index is None:
+            self._load_art_records()
+
+            self._art_index = grafindexes.InvertedIndex( grafindexes.ART_INDEX_KEYS,
+                                                         self.arts )
+
+        art_ids = self._art_index.query( criteria )
+
+        return [self._arts_by_id[art_id] for art_id in sorted( art_ids )]
+
+    def _get_tag_index( self ):
+        """
+        Gets the index of the records' tags, building it if it doesn't exist
+        yet.  Art records that haven't been loaded aren't indexed until they
+        are, so that looking up tags, e.g. to complete them as they're typed,
+        doesn't parse every art record of a lazily loaded database.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          tag_index - TagIndex containing the PhotoRecords and the loaded
+                      ArtRecords.
+
+        """
+
+        if self._tag_index is None:
+            self._tag_index = grafindexes.TagIndex( self.photos,
+                                                    [art for art in self.arts
+                                                     if not isinstance( art, _UnloadedArtRecord )] )
+
+        return self._tag_index
+
+    @grafinstr.instrumented()
+    def get_photo_records_by_tag( self, tag ):
+        """
+        Retrieves the PhotoRecords in the database with a tag.  Tags are
+        compared after normalization, so case and surrounding whitespace are
+        ignored.
+
+        Takes 1 argument:
+
+          tag - Tag to look up.
+
+        Returns 1 value:
+
+          requested_photos - A list of PhotoRecords with tag, ordered by
+                             identifier.
+
+        """
+
+        photo_ids = self._get_tag_index().get_record_ids( "photo", tag )
+
+        return [self._photos_by_id[photo_id] for photo_id in sorted( photo_ids )]
+
+    @grafinstr.instrumented()
+    def get_art_records_by_tag( self, tag ):
+        """
+        Retrieves the ArtRecords in the database with a tag.  See
+        get_photo_records_by_tag() for how tags are compared.
+
+        Takes 1 argument:
+
+          tag - Tag to look up.
+
+        Returns 1 value:
+
+          requested_art - A list of ArtRecords with tag, ordered by
+                          identifier.
+
+        """
+
+        # every art record needs to be indexed to find all of them.
+        self._load_art_records()
+
+        art_ids = self._get_tag_index().get_record_ids( "art", tag )
+
+        return [self._arts_by_id[art_id] for art_id in sorted( art_ids )]
+
+    @grafinstr.instrumented()
+    def get_tag_counts( self, prefix="" ):
+        """
+        Counts the photo and art records using each tag.  Counts are taken
+        from an index of the records' normalized tags, built the first time
+        tags are looked up, and kept current as records are inserted,
+        deleted, and have their tags assigned.  Lists modified in place,
+        rather than being assigned, are not seen by the index.
+
+        Art records of a lazily loaded database are only counted once
+        they've been loaded, so that counting doesn't parse every one of them.
+
+        Takes 1 argument:
+
+          prefix - Optional prefix of the tags to count.  If omitted, every
+                   tag is counted.
+
+        Returns 1 value:
+
+          tag_counts - Dictionary mapping normalized tags to tuples of (photo
+                       count, art count).  Only tags used by at least one
+                       record are present.
+
+        """
+
+        tag_index = self._get_tag_index()
+
+        return {tag: tag_index.get_counts( tag ) for tag in tag_index.get_tags( prefix )}
+
+    @grafinstr.instrumented()
+    def complete_tag( self, prefix, limit=None ):
+        """
+        Suggests tags beginning with a prefix, such as when a user is typing
+        one.  The most frequently used tags are suggested first.  See
+        get_tag_counts() for which records are counted.
+
+        Takes 2 arguments:
+
+          prefix - Prefix of the tags to suggest.  Case is ignored.
+          limit  - Optional maximum number of tags to suggest.  If omitted,
+                   every matching tag is suggested.
+
+        Returns 1 value:
+
+          tags - List of normalized tags beginning with prefix, ordered by
+                 decreasing number of records using them, and then by tag.
+
+        """
+
+        tag_counts = self.get_tag_counts( prefix )
+        tags       = sorted( tag_counts, key=lambda tag: (-sum( tag_counts[tag] ), tag) )
+
+        return tags if limit is None else tags[:limit]
+
+    def _get_spatial_index( self ):
+        """
+        Gets the index of the photo records' locations, building it if it
+        doesn't exist yet.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          spatial_index - SpatialIndex containing the PhotoRecords.
+
+        """
+
+        if self._spatial_index is None:
+            self._spatial_index = grafindexes.SpatialIndex( self.photos )
+
+        return self._spatial_index
+
+    @grafinstr.instrumented()
+    def get_photo_records_in_bbox( self, south, west, north, east ):
+        """
+        Retrieves the PhotoRecords located within a bounding box, including
+        its edges.  Locations are found with an index built the first time
+        photos are found by location, and kept current as records are
+        inserted and have their locations assigned.  Photos without a
+        location are never found.
+
+        Takes 4 arguments:
+
+          south - Southern latitude of the box, in degrees.
+          west  - Western longitude of the box, in degrees.
+          north - Northern latitude of the box, in degrees.
+          east  - Eastern longitude of the box, in degrees.  If smaller than
+                  west, the box crosses the antimeridian.
+
+        Returns 1 value:
+
+          requested_photos - A list of PhotoRecords within the box, ordered
+                             by identifier.
+
+        """
+
+        photo_ids = self._get_spatial_index().get_ids_in_bbox( south, west, north, east )
+
+        return [self._photos_by_id[photo_id] for photo_id in sorted( photo_ids )]
+
+    @grafinstr.instrumented()
+    def get_photo_records_within( self, location, distance, return_distances=False ):
+        """
+        Retrieves the PhotoRecords located within a distance of a point.
+        Distances are great-circle distances computed by
+        GraffitiAnalysis.indexes.haversine_distance().  See
+        get_photo_records_in_bbox() for how locations are found.
+
+        Takes 3 arguments:
+
+          location         - Sequence of (latitude, longitude) of the point,
+                             in degrees.
+          distance         - Maximum distance from the point, in meters.
+          return_distances - Optional flag indicating whether each photo's
+                             distance should be returned with it.  If
+                             omitted, defaults to False.
+
+        Returns 1 value:
+
+          requested_photos - A list of PhotoRecords within distance of
+                             location, ordered by distance and then by
+                             identifier.  If return_distances is True, each
+                             entry is a (distance, PhotoRecord) tuple
+                             instead.
+
+        """
+
+        photo_distances = self._get_spatial_index().get_ids_within( location, distance )
+
+        if return_distances:
+            return [(photo_distance, self._photos_by_id[photo_id]) for photo_distance, photo_id in photo_distances]
+
+        return [self._photos_by_id[photo_id] for _, photo_id in photo_distances]
+
+    @grafinstr.instrumented()
+    def get_nearest_photo_records( self, location, count, max_distance=None, return_distances=False ):
+        """
+        Retrieves the PhotoRecords nearest to a point.  See
+        get_photo_records_within() for how distances are computed.
+
+        Takes 4 arguments:
+
+          location         - Sequence of (latitude, longitude) of the point,
+                             in degrees.
+          count            - Maximum number of PhotoRecords to retrieve.
+          max_distance     - Optional maximum distance from the point, in
+                             meters.  If omitted, photos are retrieved
+                             regardless of their distance.
+          return_distances - Optional flag indicating whether each photo's
+                             distance should be returned with it.  If
+                             omitted, defaults to False.
+
+        Returns 1 value:
+
+          requested_photos - A list of up to count PhotoRecords nearest to
+                             location, ordered by distance and then by
+                             identifier.  If return_distances is True, each
+                             entry is a (distance, PhotoRecord) tuple
+                             instead.
+
+        """
+
+        photo_distances = self._get_spatial_index().get_nearest_ids( location, count, max_distance )
+
+        if return_distances:
+            return [(photo_distance, self._photos_by_id[photo_id]) for photo_distance, photo_id in photo_distances]
+
+        return [self._photos_by_id[photo_id] for _, photo_id in photo_distances]
+
+    def get_artists( self ):
+        """
+        Gets a list of artists known by the database.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          artists - List of artist names.
+
+        """
+
+        return self.art_fields["artists"]
+
+    def new_artist( self, artist_name ):
+        """
+        Adds a new artist into the database.  If the artist name supplied is
+        already in the database, a ValueError exception is raised.  Insertion
+        is performed before the first artist name that would sort
+        lexiographically, ignoring case insensitivity, thus preserving the
+        existing artist name ordering.
+
+        Takes 1 argument:
+
+          artist_name - Artist name string to insert into the database.
+
+        Returns nothing.
+
+        """
+
+        if artist_name in self.art_fields["artists"]:
+            raise ValueError( "'{:s}' is already an artist in the database.".format( artist_name ) )
+
+        # find the first position where the new artist sorts (insensitively)
+        # after everything before it.
+        #
+        # NOTE: we don't use something like the bisect module so as to
+        #       preserve the existing order of the artists, which may or may
+        #       not be sorted.
+        #
+        for index, existing_artist_name in enumerate( self.art_fields["artists"] ):
+            if artist_name.lower() < existing_artist_name.lower():
+                break
+
+        self.art_fields["artists"].insert( index, _intern_string( artist_name ) )
+
+        self._dirty_fields   = True
+        self._changed_fields = True
+        self.mark_data_dirty()
+
+    def get_art_types( self ):
+        """
+        Gets a list of the art types known by the database.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          art_types - List of art types.
+
+        """
+
+        return self.art_fields["types"]
+
+    def get_art_sizes( self ):
+        """
+        Gets a list of art sizes known by the database.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          art_sizes - List of art sizes.
+
+        """
+
+        return self.art_fields["sizes"]
+
+    def get_art_qualities( self ):
+        """
+        Gets a list of art qualities known by the database.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          art_qualities - List of art qualities.
+
+        """
+
+        return self.art_fields["qualities"]
+
+    def get_processing_states( self ):
+        """
+        Gets a list of processing states known by the database.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          processing_states - List of processing states.
+
+        """
+
+        return self.processing_states
+
+# number of records copied by a snapshot each time it takes its database's
+# lock, so that the database's edits aren't blocked for long.
+_SNAPSHOT_CHUNK_SIZE = 1024
+
+class SnapshotRecord( object ):
+    """
+    Provides a read-only view of a PhotoRecord or ArtRecord as it was when a
+    DatabaseSnapshot was taken.  Views are returned by snapshots in place of
+    the records they share with their database.
+
+    Values are read with the snapshot's lock held, which the database also
+    holds while it copies a record for the snapshot and modifies it, so a
+    view always reads the record's values as of the snapshot even while
+    another thread modifies the database.  Once the record has been copied
+    the view reads the copy directly.
+    """
+
+    __slots__ = ("_record", "_snapshot")
+
+    def __init__( self, record, snapshot ):
+        """
+        Constructs a view of a record held by a snapshot.
+
+        Takes 2 arguments:
+
+          record   - The PhotoRecord or ArtRecord to view.
+          snapshot - DatabaseSnapshot holding record, or None if record is
+                     never modified by the database, e.g. it's a copy.
+
+        Returns 1 value:
+
+          self - The newly created SnapshotRecord object.
+
+        """
+
+        self._record   = record
+        self._snapshot = snapshot
+
+    def __getitem__( self, key ):
+        """
+        Retrieves the value for a key within the record as it was when the
+        snapshot was taken.
+
+        Takes 1 argument:
+
+          key - The key whose value is requested.
+
+        Returns 1 value:
+
+          value - The value associated with key.
+
+        """
+
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self._record[key]
+
+        with snapshot._lock:
+            preserved_record = snapshot._preserved_records.get( id( self._record ) )
+            if preserved_record is None:
+                return self._record[key]
+
+        # the database has modified the record since, so read the copy it
+        # made for the snapshot from now on.
+        self._record   = preserved_record
+        self._snapshot = None
+
+        return preserved_record[key]
+
+    def __setitem__( self, key, value ):
+        """
+        Raises a KeyError since records retrieved from a snapshot are
+        read-only.
+
+        Takes 2 arguments:
+
+          key   - The key whose value would be set.
+          value - The value that would be set.
+
+        Returns nothing.
+
+        """
+
+        raise KeyError( "{:s} is not a mutable key!  Snapshot records are read-only.".format( key ) )
+
+    def copy( self ):
+        """
+        Creates a copy of the record, as it was when the snapshot was taken,
+        that is not associated with a Database.  Unlike the view, the copy
+        may be modified.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          record - The copied PhotoRecord or ArtRecord object.
+
+        """
+
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self._record.copy()
+
+        with snapshot._lock:
+            return snapshot._preserved_records.get( id( self._record ), self._record ).copy()
+
+    def __str__( self ):
+        """
+        Returns a string representation of the viewed record.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          string - String representation of the record.
+
+        """
+
+        return str( self._record )
+
+class DatabaseSnapshot( object ):
+    """
+    Provides a read-only, point-in-time view of a Database, see
+    Database.snapshot().  Records are shared with the database until it
+    modifies them, at which point the snapshot keeps a copy of each record as
+    it was.  Records are retrieved from a snapshot as read-only
+    SnapshotRecords.
+
+    Snapshots may be read while the database is being modified, including by
+    other threads.  Each value read from a SnapshotRecord is the value the
+    record held when the snapshot was taken.  Exports copy each record, as
+    it was, before writing it.
+    """
+
+    def __init__( self, database ):
+        """
+        Takes a snapshot of the supplied database.  This should be called
+        through Database.snapshot(), with the database's snapshot lock held.
+
+        Takes 1 argument:
+
+          database - Database object to take a snapshot of.
+
+        Returns 1 value:
+
+          self - The newly created DatabaseSnapshot object.
+
+        """
+
+        self.filename          = database.filename
+        self.art_fields        = {key: list( values ) for key, values in database.art_fields.items()}
+        self.processing_states = list( database.processing_states )
+
+        # the database's records, and its photos sorted by time, as of the
+        # snapshot.  art records may be unloaded, in which case they're
+        # loaded the first time they're requested.
+        self._photos         = list( database.photos )
+        self._arts           = list( database.arts )
+        self._photo_times    = list( database._photo_times )
+        self._photos_by_time = list( database._photos_by_time )
+
+        # copies of the records the database has modified since the snapshot
+        # was taken, keyed by the identity of the modified record, and the
+        # art records we've loaded, keyed by the identity of the unloaded
+        # record.
+        self._preserved_records = dict()
+        self._loaded_arts       = dict()
+
+        # indices from identifiers to records, built the first time records
+        # are requested by identifier.
+        self._photos_by_id     = None
+        self._arts_by_photo_id = None
+
+        # the database's set of snapshots and the lock guarding them, so that
+        # we can stop having records preserved for us.
+        self._snapshots = database._snapshots
+        self._lock      = database._snapshot_lock
+
+    def __str__( self ):
+        """
+        Returns a string representation of the snapshot.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          string - String representation of the DatabaseSnapshot object.
+
+        """
+
+        return "DatabaseSnapshot( {:s}, {:d} photos, {:d} arts )".format( self.filename if self.filename is not None else "<testing>",
+                                                                          len( self._photos ),
+                                                                          len( self._arts ) )
+
+    def close( self ):
+        """
+        Releases the snapshot so that the database no longer copies records
+        for it.  Neither the snapshot nor the records retrieved from it should
+        be used afterwards, as those records may reflect the database's later
+        modifications.
+
+        Takes no arguments.
+
+        Returns nothing.
+
+        """
+
+        with self._lock:
+            self._snapshots.discard( self )
+
+    def _preserve_record( self, record ):
+        """
+        Keeps a copy of a record as it was when the snapshot was taken.  This
+        is invoked by the database, with the snapshot lock held, before it
+        modifies the record and should not need to be called directly.
+
+        Takes 1 argument:
+
+          record - The PhotoRecord or ArtRecord that is about to be modified.
+
+        Returns nothing.
+
+        """
+
+        # only the first modification needs to be preserved.
+        #
+        # NOTE: records inserted after the snapshot was taken are preserved
+        #       too, though they're never requested.  the records we do hold
+        #       are kept alive by us, so their identities can't be reused.
+        #
+        if id( record ) not in self._preserved_records:
+            self._preserved_records[id( record )] = record.copy()
+
+    def _get_records( self, records ):
+        """
+        Gets read-only views of records as they were when the snapshot was
+        taken.  Unloaded art records are loaded.
+
+        Takes 1 argument:
+
+          records - Iterable of records held by the snapshot.
+
+        Returns 1 value:
+
+          records - List of SnapshotRecords.
+
+        """
+
+        views = []
+
+        for record in records:
+            if isinstance( record, _UnloadedArtRecord ):
+                # records we loaded ourselves aren't the database's, so
+                # they're never modified by it.
+                views.append( SnapshotRecord( self._load_art_record( record ), None ) )
+            else:
+                views.append( SnapshotRecord( record, self ) )
+
+        return views
+
+    def _load_art_record( self, record ):
+        """
+        Loads an art record that was unloaded when the snapshot was taken.
+        Each record is only loaded once.
+
+        Takes 1 argument:
+
+          record - _UnloadedArtRecord held by the snapshot.
+
+        Returns 1 value:
+
+          record - The loaded ArtRecord.
+
+        """
 
+        loaded_record = self._loaded_arts.get( id( record ) )
+        if loaded_record is None:
+            loaded_record = record.load()
+            self._loaded_arts[id( record )] = loaded_record
 
-    def __str__( self ):
+        return loaded_record
+
+    def _resolve_records( self, records ):
         """
-        Returns a string representation of the art record.
+        Gets records as they were when the snapshot was taken.  Records that
+        haven't been modified since are shared with the database, so the
+        returned records must only be read once they've been frozen, see
+        _freeze_records().  Unloaded art records are loaded.
+
+        Takes 1 argument:
+
+          records - Iterable of records held by the snapshot.
+
+        Returns 1 value:
+
+          records - List of PhotoRecords and/or ArtRecords.
+
+        """
+
+        with self._lock:
+            preserved_records = self._preserved_records
+            if len( preserved_records ) > 0:
+                records = [preserved_records.get( id( record ), record ) for record in records]
+            else:
+                records = list( records )
+
+        for index, record in enumerate( records ):
+            if isinstance( record, _UnloadedArtRecord ):
+                records[index] = self._load_art_record( record )
+
+        return records
+
+    def _freeze_records( self, records ):
+        """
+        Replaces records with copies of them as they were when the snapshot
+        was taken, so that they can be read without being modified by the
+        database in the meantime.  Unloaded art records are left as is.
+
+        Takes 1 argument:
+
+          records - List of records held by the snapshot.  Modified in place.
+
+        Returns nothing.
+
+        """
+
+        preserved_records = self._preserved_records
+
+        with _paused_garbage_collection():
+            for start_index in range( 0, len( records ), _SNAPSHOT_CHUNK_SIZE ):
+                end_index = start_index + _SNAPSHOT_CHUNK_SIZE
+
+                with self._lock:
+                    records[start_index:end_index] = [preserved_records.get( id( record ) ) or record.copy()
+                                                      for record in records[start_index:end_index]]
+
+    def _write_records( self, records_lists, write_database ):
+        """
+        Writes records collected from the snapshot once they've been copied
+        as they were when the snapshot was taken.  The snapshot is closed
+        once it's no longer needed.  This is invoked by background saves.
+
+        Takes 2 arguments:
+
+          records_lists  - List of lists of records held by the snapshot.
+                           Each list is modified in place.
+          write_database - Callable that writes the lists' records.
+
+        Returns nothing.
+
+        """
+
+        try:
+            for records in records_lists:
+                self._freeze_records( records )
+        finally:
+            self.close()
+
+        write_database()
+
+    def export_mapped_database( self, filename ):
+        """
+        Writes a read-only copy of the snapshot in a fixed binary layout that
+        can be mapped into memory by MappedDatabase.  See
+        Database.export_mapped_database() for details.
+
+        Takes 1 argument:
+
+          filename - Path to the file to write.  Any existing file is
+                     replaced.
+
+        Returns nothing.
+
+        """
+
+        photos = list( self._photos )
+        arts   = self._resolve_records( self._arts )
+
+        self._freeze_records( photos )
+        self._freeze_records( arts )
+
+        _write_mapped_database( filename,
+                                self.art_fields,
+                                self.processing_states,
+                                photos,
+                                arts )
+
+    def get_photo_records( self, photo_ids=None ):
+        """
+        Retrieves the PhotoRecords in the snapshot matching the supplied
+        identifiers.  Records returned are in the same order of the supplied
+        photo identifiers.
+
+        Takes 1 argument:
+
+          photo_ids - List of photo identifiers whose PhotoRecords are needed.
+                      If specified as None, all PhotoRecords in the snapshot
+                      are requested.
+
+        Returns 1 value:
+
+          requested_photos - A list of PhotoRecords matching the requested
+                             identifiers.  If only a single identifier was
+                             requested then requested_photos will be scalar
+                             instead of a list as a convenience.
+
+        """
+
+        if photo_ids is None:
+            return self._get_records( self._photos )
+
+        if type( photo_ids ) != list:
+            photo_ids  = [photo_ids]
+            scalar_out = True
+        else:
+            scalar_out = False
+
+        # index the records by their identifiers as of the snapshot.
+        if self._photos_by_id is None:
+            self._photos_by_id = {photo["id"]: record
+                                  for record, photo in zip( self._photos, self._get_records( self._photos ) )}
+
+        requested_photos = self._get_records( [self._photos_by_id[photo_id] for photo_id in photo_ids
+                                               if photo_id in self._photos_by_id] )
+
+        if scalar_out:
+            requested_photos = requested_photos[0]
+
+        return requested_photos
+
+    def get_photo_records_by_time( self, start_time=None, end_time=None, end_inclusive=True, reverse=False ):
+        """
+        Retrieves PhotoRecords in the snapshot whose photo was taken within
+        the supplied time window.  See Database.get_photo_records_by_time()
+        for details.
+
+        Takes 4 arguments:
+
+          start_time    - Optional start time for the window.  If omitted,
+                          defaults to the timestamp for the oldest photo.
+          end_time      - Optional end time for the window.  If omitted,
+                          defaults to the timestamp for the youngest photo.
+          end_inclusive - Optional flag specifying whether photos taken at
+                          end_time are within the window.  If omitted,
+                          defaults to True.
+          reverse       - Optional flag specifying whether the records are
+                          returned youngest first.  If omitted, defaults to
+                          False.
+
+        Returns 1 value:
+
+          photos - A list of PhotoRecords matching the requested time window.
+                   If neither start_time nor end_time are supplied, and
+                   reverse is False, all of the PhotoRecords are returned in
+                   database order instead.
+
+        """
+
+        if start_time is None and end_time is None and not reverse:
+            return self._get_records( self._photos )
+
+        if start_time is None:
+            start_index = 0
+        else:
+            start_index = bisect.bisect_left( self._photo_times, start_time )
+
+        if end_time is None:
+            end_index = len( self._photo_times )
+        elif end_inclusive:
+            end_index = bisect.bisect_right( self._photo_times, end_time )
+        else:
+            end_index = bisect.bisect_left( self._photo_times, end_time )
+
+        photos = self._get_records( self._photos_by_time[start_index:end_index] )
+
+        if reverse:
+            photos.reverse()
+
+        return photos
+
+    def get_art_records( self, photo_ids=None ):
+        """
+        Retrieves the ArtRecords in the snapshot associated with the supplied
+        PhotoRecords identifiers.  Returned records are grouped in the same
+        order of the supplied photo identifiers.
+
+        Takes 1 argument:
+
+          photo_ids - List of photo identifiers whose associated ArtRecords
+                      are needed.  If specified as None, all ArtRecords in
+                      the snapshot are requested.
+
+        Returns 1 value:
+
+          requested_art - A list of ArtRecords matching the requested
+                          identifiers.
+
+        """
+
+        if photo_ids is None:
+            return self._get_records( self._arts )
+        elif type( photo_ids ) != list:
+            photo_ids = [photo_ids]
+
+        # index the records by their photos' identifiers as of the snapshot.
+        # unloaded records know their photo without being loaded.
+        if self._arts_by_photo_id is None:
+            with self._lock:
+                preserved_records = self._preserved_records
+
+                self._arts_by_photo_id = dict()
+                for record in self._arts:
+                    photo_id = preserved_records.get( id( record ), record )["photo_id"]
+                    self._arts_by_photo_id.setdefault( photo_id, [] ).append( record )
+
+        requested_art = []
+        for photo_id in photo_ids:
+            requested_art.extend( self._arts_by_photo_id.get( photo_id, [] ) )
+
+        return self._get_records( requested_art )
+
+    def get_artists( self ):
+        """
+        Gets a list of artists known by the snapshot.
 
         Takes no arguments.
 
         Returns 1 value:
 
-          string - String representation of the ArtRecord object.
+          artists - List of artist names.
 
         """
 
-        return "ArtRecord({:d}, '{:d}')".format( self["photo_id"],
-                                                 self["id"] )
+        return self.art_fields["artists"]
 
-class PhotoRecord( Record ):
-    """
-    Database record documenting one or more pieces of street art.  The
-    following keys are available (mutable keys are marked with *):
+    def get_art_types( self ):
+        """
+        Gets a list of the art types known by the snapshot.
 
-      created_time   Fractional seconds since Epoch when the record was
-                     created.
-      *filename      Path to the photograph file on disk.
-      id             Unique, positive integer identifier for the phtograph.
-      location       Tuple of fractional (latitude, longitude) with positive
-                     being north and east, and negative being south and west.
-      modified_time  Fractional seconds since Epoch when the record was
-                     last updated.
-      resolution     Tuple of positive integers specifying the (width, height)
-                     of the photograph.
-      rotation       XXX
-      *state         String representing the processing state the record is
-                     in.
-      *tags          List, possibly empty, of strings describing the
-                     photograph.
+        Takes no arguments.
 
-    XXX: constants here need to be consistent but different than the database
+        Returns 1 value:
+
+          art_types - List of art types.
+
+        """
+
+        return self.art_fields["types"]
+
+    def get_art_sizes( self ):
+        """
+        Gets a list of art sizes known by the snapshot.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          art_sizes - List of art sizes.
+
+        """
+
+        return self.art_fields["sizes"]
+
+    def get_art_qualities( self ):
+        """
+        Gets a list of art qualities known by the snapshot.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          art_qualities - List of art qualities.
+
+        """
+
+        return self.art_fields["qualities"]
+
+    def get_processing_states( self ):
+        """
+        Gets a list of processing states known by the snapshot.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          processing_states - List of processing states.
+
+        """
+
+        return self.processing_states
+
+class MappedDatabase( object ):
+    """
+    Provides read-only access to a database exported with
+    Database.export_mapped_database().  The export is mapped into memory
+    rather than read, so opening it takes next to no time and every process
+    mapping it shares the same pages of the operating system's page cache.
+
+    Records are retrieved through the same methods as a Database and are
+    constructed when requested.  They are not associated with the
+    MappedDatabase, so changing them has no effect on it.  The underlying
+    arrays are available for analysis that doesn't need record objects.
     """
 
-    def __init__( self, id, filename, resolution=None, state=None, location=None, rotation=0, created_time=None, modified_time=None, photo_time=None, tags=[] ):
+    def __init__( self, filename ):
         """
-        Constructs an PhotoRecord object from the supplied parameters.
+        Maps the supplied export into memory.  A RuntimeError is raised if
+        the file isn't an export.
 
-        Takes 10 arguments:
+        Takes 1 argument:
 
-          id            - Identifier for the photo record.  Must be a positive
-                          integer, different from other record identifiers.
-          filename      - Path to the photograph file on disk.
-          resolution    - Optional tuple of positive integers specifying the
-                          (width, height) of the photograph.  If omitted, defaults
-                          to (0, 0).
-          state         - Optional string specifying the processing state of the
-                          record.  If omitted, defaults to "unreviewed".
-          location      - Tuple of fractional (latitude, longitude) with positive
-                          being north and east, and negative being south and west.
-          rotation      - Optional degrees of rotation needed to apply to the
-                          photograph for display purposes.  If omitted, defaults
-                          to zero.
-          created_time  - Optional fractional seconds since the Epoch
-                          indicating when the photo record (not the
-                          photograph) was created.  If omitted, defaults to
-                          the current time.
-          modified_time - Optional fractional seconds since the Epoch
-                          indicating when the photo record (not the photograph)
-                          was last modified.  If omitted, defaults to the
-                          current time.
-          photo_time    - Optional fractional seconds since the Epoch
-                          indicating when the photograph was taken.  If
-                          omitted, defaults to the Epoch.
-          tags          - Optional, possibly empty, list of strings specifying
-                          tas associated with the photograph.  If omitted,
-                          defaults to an empty list.
+          filename - Path to the file written by
+                     Database.export_mapped_database().
+
+        Returns 1 value:
+
+          self - The newly created MappedDatabase object.
+
+        """
+
+        self.filename = filename
+
+        self._mapping = grafmapped.MappedArrays( filename )
+        self._arrays  = self._mapping.arrays
+
+        self.art_fields        = self._mapping.metadata["art_fields"]
+        self.processing_states = self._mapping.metadata["processing_states"]
+
+        # exports written before the sorted keys were part of them need them
+        # sorted once here.
+        for sorted_name, values_name, order_name in [("photo_id_sorted",   "photo_id",         "photo_id_order"),
+                                                     ("photo_time_sorted", "photo_photo_time", "photo_time_order"),
+                                                     ("art_photo_sorted",  "art_photo_id",     "art_photo_order")]:
+            if sorted_name not in self._arrays:
+                self._arrays[sorted_name] = self._arrays[values_name][self._arrays[order_name]]
+
+        # exports are never modified.
+        self.modified_data = False
+
+    def __str__( self ):
+        """
+        Returns a string representation of the database.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          string - String representation of the MappedDatabase object.
+
+        """
+
+        return "MappedDatabase( {:s}, {:d} photos, {:d} arts )".format( self.filename,
+                                                                         len( self._arrays["photo_id"] ),
+                                                                         len( self._arrays["art_id"] ) )
+
+    def close( self ):
+        """
+        Releases the export's mapping.  Records already retrieved remain
+        usable, though arrays retrieved must not be used afterwards.
 
-        Returns 1 value:
+        Takes no arguments.
 
-          self - The newly created PhotoRecord object.
+        Returns nothing.
 
         """
 
-        if state is None:
-            state = "unreviewed"
+        self._mapping.close()
+        self._arrays = dict()
 
-        if resolution is None:
-            resolution = (0, 0)
+    def are_data_dirty( self ):
+        """
+        Returns False, as exports cannot be modified.
+        """
 
-        if created_time is None:
-            created_time = time.mktime( time.gmtime() )
+        return False
 
-        if modified_time is None:
-            modified_time = created_time
+    def save_database( self, filename=None, background=False, callback=None ):
+        """
+        Raises a RuntimeError, as exports cannot be modified.
+        """
 
-        if photo_time is None:
-            photo_time = 0
+        raise RuntimeError( "{:s} is a read-only database export.".format( self.filename ) )
+
+    def _get_string( self, index ):
+        """
+        Gets a string from the export's string table.
+        """
 
-        # XXX: should these lists be somewhere else?
-        _readable_keys = ["created_time", "filename", "id", "location",
-                          "modified_time", "photo_time", "resolution",
-                          "rotation", "state", "tags"]
-        _mutable_keys  = ["location", "modified_time", "photo_time",
-                          "resolution", "rotation", "state", "tags"]
-
-        super().__init__( _readable_keys,
-                          _mutable_keys,
-                          created_time=created_time,
-                          filename=filename,
-                          id=id,
-                          location=location,
-                          modified_time=modified_time,
-                          photo_time=photo_time,
-                          resolution=resolution,
-                          rotation=rotation,
-                          state=state,
-                          tags=tags )
+        return self._mapping.get_string( "strings", index )
 
-    def __str__( self ):
+    def _get_strings( self, name, row ):
         """
-        Returns a string representation of the photo record.
+        Gets one record's list of strings from one of the export's list
+        columns.
 
-        Takes no arguments.
+        Takes 2 arguments:
+
+          name - Name of the list column.
+          row  - Row of the record.
 
         Returns 1 value:
 
-          string - String representation of the PhotoRecord object.
+          strings - List of strings.
 
         """
 
-        return "PhotoRecord({:d}, '{:s}')".format( self["id"],
-                                                   self["filename"] )
+        offsets = self._arrays[name + "_offsets"]
 
-class Database( object ):
-    """
-    Represents a database of photo and art records for analyzing street art.
-    """
+        return [self._get_string( index ) for index in self._arrays[name][offsets[row]:offsets[row + 1]].tolist()]
 
-    def __init__( self, filename=None ):
+    def _get_photo( self, row ):
         """
-        Initializes a Database object from the contents of the supplied file.
-        Commiting changes to the object will update the file supplied.  If no
-        file is supplied, a test database is constructed.
+        Constructs the PhotoRecord stored in one of the export's rows.
 
         Takes 1 argument:
 
-          filename - File name backing the database.  If omitted, a test
-                     database is constructed and changes will not be
-                     commited anywhere when save_database() is called.
+          row - Row of the photo.
 
         Returns 1 value:
 
-          database - The Database object.
+          photo - PhotoRecord object.
 
         """
 
-        self.filename = filename
+        arrays = self._arrays
 
-        # flag indicating whether we have data that needs to be written to the
-        # backing store.
-        self.modified_data = False
+        location   = arrays["photo_location"][row].tolist()
+        resolution = arrays["photo_resolution"][row].tolist()
 
-        self.load_database()
+        # lists match what the XML parser produces.
+        return PhotoRecord( int( arrays["photo_id"][row] ),
+                            self._get_string( arrays["photo_filename"][row] ),
+                            created_time=float( arrays["photo_created_time"][row] ),
+                            location=None if math.isnan( location[0] ) else location,
+                            modified_time=float( arrays["photo_modified_time"][row] ),
+                            photo_time=float( arrays["photo_photo_time"][row] ),
+                            resolution=None if resolution[0] < 0 else resolution,
+                            rotation=int( arrays["photo_rotation"][row] ),
+                            state=self._get_string( arrays["photo_state"][row] ),
+                            tags=self._get_strings( "photo_tags", row ) )
 
-    def __str__( self ):
+    def _get_art( self, row ):
         """
-        Returns a string representation of the database.
+        Constructs the ArtRecord stored in one of the export's rows.
 
-        Takes no arguments.
+        Takes 1 argument:
+
+          row - Row of the art.
 
         Returns 1 value:
 
-          string - String representation of the Database object.
+          art - ArtRecord object.
 
         """
 
-        return "Database('{:s}'{:s})".format( self.filename if self.filename is not None else "<testing>",
-                                              "*" if self.modified_data else "" )
-
-    def mark_data_dirty( self ):
+        arrays = self._arrays
+
+        region = tuple( arrays["art_region"][row].tolist() )
+
+        return ArtRecord( int( arrays["art_id"][row] ),
+                          int( arrays["art_photo_id"][row] ),
+                          self._get_string( arrays["art_type"][row] ),
+                          artists=self._get_strings( "art_artists", row ),
+                          associates=self._get_strings( "art_associates", row ),
+                          created_time=float( arrays["art_created_time"][row] ),
+                          date=self._get_string( arrays["art_date"][row] ),
+                          modified_time=float( arrays["art_modified_time"][row] ),
+                          quality=self._get_string( arrays["art_quality"][row] ),
+                          region=None if math.isnan( region[0] ) else region,
+                          size=self._get_string( arrays["art_size"][row] ),
+                          state=self._get_string( arrays["art_state"][row] ),
+                          tags=self._get_strings( "art_tags", row ),
+                          vandals=self._get_strings( "art_vandals", row ) )
+
+    def _find_rows( self, sorted_values, order, keys ):
         """
-        Sets an internal flag indicating that the database has changed and
-        needs to be saved, lest said changes be lost.
+        Finds the rows whose value matches each of the supplied keys.
 
-        Takes no arguments.
+        Takes 3 arguments:
+
+          sorted_values - Array of the rows' values, in sorted order.
+          order         - Array of rows in the order of sorted_values.
+          keys          - List of values to find.
+
+        Returns 1 value:
+
+          rows - List of arrays of rows, one per key, each in database order.
 
-        Returns nothing.
         """
 
-        self.modified_data = True
+        starts = np.searchsorted( sorted_values, keys, side="left" )
+        ends   = np.searchsorted( sorted_values, keys, side="right" )
 
-    def are_data_dirty( self ):
+        return [order[start:end] for start, end in zip( starts.tolist(), ends.tolist() )]
+
+    def get_photo_arrays( self ):
         """
-        Predicate indicating whether the database has dirty data and needs to
-        be saved to avoid losing changes.
+        Gets the arrays holding the PhotoRecords' values, one entry per
+        record in database order.  Strings are stored as indices, see
+        get_string(), and missing locations and resolutions as NaNs and -1s.
+        List columns, such as "tags", hold every record's list concatenated
+        with "<name>_offsets" holding where each record's list starts.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          photo_arrays - Dictionary mapping key names to read-only NumPy
+                         arrays.
+
         """
 
-        return self.modified_data
+        return {name[len( "photo_" ):]: array for name, array in self._arrays.items() if name.startswith( "photo_" )}
 
-    def load_database( self ):
+    def get_art_arrays( self ):
         """
-        Populates the database object from the backing store.  Uncommited
-        changes to the database are lost.
+        Gets the arrays holding the ArtRecords' values, one entry per record
+        in database order.  See get_photo_arrays() for their layout.
+        Missing regions are stored as NaNs.
 
         Takes no arguments.
 
-        Returns nothing.
-        """
+        Returns 1 value:
 
-        # figure out where our backing store is.
-        def read_database( filename ):
-            if filename is None:
-                return _read_memory_database()
-            else:
-                return _read_xml_database( filename )
+          art_arrays - Dictionary mapping key names to read-only NumPy
+                       arrays.
 
-        # load the database.
-        self.art_fields, self.processing_states, self.photos, self.arts = read_database( self.filename )
+        """
+
+        return {name[len( "art_" ):]: array for name, array in self._arrays.items() if name.startswith( "art_" )}
 
-    def save_database( self, filename=None ):
+    def get_string( self, index ):
         """
-        Commits changes to the database to the supplied backing store.
+        Gets a string stored as an index in the export's arrays.
 
         Takes 1 argument:
 
-          filename - Optional path to the on-disk file to commit changes to.
-                     If omitted, defaults to the file name supplied during
-                     the Database object's initialization.
-
-        Returns nothing.
-        """
+          index - Index of the string.
 
-        if filename is None:
-            if self.filename is None:
-                filename = "memory"
-            else:
-                filename = self.filename
+        Returns 1 value:
 
-        if filename == "memory":
-            print( "XXX: Writing out database to {:s}.".format( filename ) )
+          string - The string at index, or None if index is negative.
 
-        else:
-            _write_xml_database( filename,
-                                 self.art_fields,
-                                 self.processing_states,
-                                 self.photos,
-                                 self.arts )
+        """
 
-        # mark our data as clean again.
-        self.modified_data = False
+        return self._get_string( int( index ) )
 
     def get_photo_records( self, photo_ids=None ):
         """
         Retrieves all of the PhotoRecord's in the database matching the
-        supplied identifiers.  Records returned are in the same order of the
-        supplied photo identifiers.
+        supplied identifiers.  See Database.get_photo_records() for details.
 
         Takes 1 argument:
 
@@ -1230,14 +7260,13 @@ class Database( object ):
         Returns 1 value:
 
           requested_photos - A list of PhotoRecord's matching the requested
-                             identifiers.  If only a single identifier was requested
-                             then requested_photos will be scalar instead of a list
-                             as a convenience.
+                             identifiers, or a scalar if a single identifier
+                             was requested.
 
         """
 
         if photo_ids is None:
-            return self.photos
+            return [self._get_photo( row ) for row in range( len( self._arrays["photo_id"] ) )]
 
         if type( photo_ids ) != list:
             photo_ids  = [photo_ids]
@@ -1245,36 +7274,33 @@ class Database( object ):
         else:
             scalar_out = False
 
-        # build a list of the PhotoRecords in the same order requested.
-        requested_photos = []
-        for photo_id in photo_ids:
-            for photo in self.photos:
-                if photo["id"] == photo_id:
-                    requested_photos.append( photo )
+        requested_photos = [self._get_photo( row )
+                            for rows in self._find_rows( self._arrays["photo_id_sorted"],
+                                                         self._arrays["photo_id_order"],
+                                                         photo_ids )
+                            for row in rows.tolist()]
 
-        # help the user and return a scalar if they requested a single record.
-        #
-        # NOTE: this assumes that the identifiers are unique and can't return
-        #       multiple records...
-        #
         if scalar_out:
             requested_photos = requested_photos[0]
 
         return requested_photos
 
-    def get_photo_records_by_time( self, start_time=None, end_time=None ):
+    def get_photo_records_by_time( self, start_time=None, end_time=None, end_inclusive=True, reverse=False ):
         """
         Retrieves PhotoRecords in the database whose photo was taken within
-        the supplied time window.
+        the supplied time window.  See Database.get_photo_records_by_time()
+        for details.
 
-        Takes 2 arguments:
+        Takes 4 arguments:
 
-          start_time - Optional start time for the window.  If omitted,
-                       defaults to the timestamp for the oldest photo in the
-                       database.
-          end_time   - Optional end time for the window.  If omitted,
-                       defaults to the timestamp for the youngest photo in the
-                       database.
+          start_time    - Optional start time for the window.
+          end_time      - Optional end time for the window.
+          end_inclusive - Optional flag specifying whether photos taken at
+                          end_time are within the window.  If omitted,
+                          defaults to True.
+          reverse       - Optional flag specifying whether the records are
+                          returned youngest first.  If omitted, defaults to
+                          False.
 
         Returns 1 value:
 
@@ -1282,55 +7308,34 @@ class Database( object ):
 
         """
 
-        # if the user hasn't requested a specific time period, return
-        # everything we have.
-        if start_time is None and end_time is None:
-            return self.photos
-
-        # fill in the missing boundary.
-        if start_time is None:
-            start_time = min( [photo["photo_time"] for photo in self.photos] )
-        elif end_time is None:
-            end_time = max( [photo["photo_time"] for photo in self.photos] )
-
-        # find all of the photos that are in the time frame requested.
-        return [photo for photo in self.photos if start_time <= photo["photo_time"] <= end_time]
-
-    def new_photo_record( self, file_name, **kwargs ):
-        """
-        Inserts a new photo record for the supplied file into the database.
-        Aside from the resolution, default values are used for the record's
-        fields.
-
-        Takes 2 arguments:
-
-          file_name - Path to the photo on disk.
-          kwargs    - Optional keyword arguments containing the key/value
-                      pairs to initialize the PhotoRecord with.
-
-        Returns 1 value:
+        if start_time is None and end_time is None and not reverse:
+            return self.get_photo_records()
 
-          photo_record - The created PhotoRecord object.
+        order       = self._arrays["photo_time_order"]
+        photo_times = self._arrays["photo_time_sorted"]
 
-        """
+        if start_time is None:
+            start_index = 0
+        else:
+            start_index = int( np.searchsorted( photo_times, start_time, side="left" ) )
 
-        # compute a unique index that hasn't been used yet.
-        photo_id = max( [photo["id"] for photo in self.photos],
-                        default=0 ) + 1
+        if end_time is None:
+            end_index = len( photo_times )
+        else:
+            end_index = int( np.searchsorted( photo_times, end_time, side="right" if end_inclusive else "left" ) )
 
-        self.photos.append( PhotoRecord( photo_id,
-                                         file_name,
-                                         **kwargs ) )
+        rows = order[start_index:end_index].tolist()
 
-        self.mark_data_dirty()
+        if reverse:
+            rows.reverse()
 
-        return self.photos[-1]
+        return [self._get_photo( row ) for row in rows]
 
     def get_art_records( self, photo_ids=None ):
         """
         Retrieves all of the ArtRecord's in the database associated with the
-        supplied PhotoRecords identifiers.  Returned records are grouped in
-        the same order of the supplied photo identifiers.
+        supplied PhotoRecords identifiers.  See Database.get_art_records()
+        for details.
 
         Takes 1 argument:
 
@@ -1345,122 +7350,27 @@ class Database( object ):
 
         """
 
-        #
-        # NOTE: this interface isn't the most flexible though was designed to
-        #       directly support the following use cases:
-        #
-        #         * art records associated with a particular photo
-        #         * arbitrary art records (no use case through the OMI)
-        #         * all art records
-        #
-
         if photo_ids is None:
-            return self.arts
+            return [self._get_art( row ) for row in range( len( self._arrays["art_id"] ) )]
         elif type( photo_ids ) != list:
             photo_ids = [photo_ids]
 
-        # build a list of the ArtRecords in the same order requested.
-        requested_art = []
-        for photo_id in photo_ids:
-            for art in self.arts:
-                if art["photo_id"] == photo_id:
-                    requested_art.append( art )
-
-        return requested_art
-
-    def new_art_record( self, photo_id ):
-        """
-        Creates a new art record initialized with default values. XXX
-
-        Takes 1 argument:
-
-          photo_id - XXX
-
-        Returns 1 value:
-
-          art_record - XXX
-
-        """
-
-        # compute a unique index that hasn't been used yet.
-        art_id = max( [art["id"] for art in self.arts],
-                      default=0 ) + 1
-
-        # XXX: hardcoded constant
-        self.arts.append( ArtRecord( art_id, photo_id, "throwup" ) )
-
-        self.mark_data_dirty()
-
-        return self.arts[-1]
-
-    def delete_art_record( self, art_id ):
-        """
-        XXX
-        """
-
-        self.mark_data_dirty()
-
-        # filter our the records that match the supplied identifier.
-        self.arts = [art for art in self.arts if art["id"] != art_id]
+        return [self._get_art( row )
+                for rows in self._find_rows( self._arrays["art_photo_sorted"],
+                                             self._arrays["art_photo_order"],
+                                             photo_ids )
+                for row in rows.tolist()]
 
     def get_artists( self ):
         """
         Gets a list of artists known by the database.
-
-        Takes no arguments.
-
-        Returns 1 value:
-
-          artists - List of artist names.
-
         """
 
         return self.art_fields["artists"]
 
-    def new_artist( self, artist_name ):
-        """
-        Adds a new artist into the database.  If the artist name supplied is
-        already in the database, a ValueError exception is raised.  Insertion
-        is performed before the first artist name that would sort
-        lexiographically, ignoring case insensitivity, thus preserving the
-        existing artist name ordering.
-
-        Takes 1 argument:
-
-          artist_name - Artist name string to insert into the database.
-
-        Returns nothing.
-
-        """
-
-        if artist_name in self.art_fields["artists"]:
-            raise ValueError( "'{:s}' is already an artist in the database.".format( artist_name ) )
-
-        # find the first position where the new artist sorts (insensitively)
-        # after everything before it.
-        #
-        # NOTE: we don't use something like the bisect module so as to
-        #       preserve the existing order of the artists, which may or may
-        #       not be sorted.
-        #
-        for index, existing_artist_name in enumerate( self.art_fields["artists"] ):
-            if artist_name.lower() < existing_artist_name.lower():
-                break
-
-        self.art_fields["artists"].insert( index, artist_name )
-
-        self.mark_data_dirty()
-
     def get_art_types( self ):
         """
         Gets a list of the art types known by the database.
-
-        Takes no arguments.
-
-        Returns 1 value:
-
-          art_types - List of art types.
-
         """
 
         return self.art_fields["types"]
@@ -1468,13 +7378,6 @@ class Database( object ):
     def get_art_sizes( self ):
         """
         Gets a list of art sizes known by the database.
-
-        Takes no arguments.
-
-        Returns 1 value:
-
-          art_sizes - List of art sizes.
-
         """
 
         return self.art_fields["sizes"]
@@ -1482,13 +7385,6 @@ class Database( object ):
     def get_art_qualities( self ):
         """
         Gets a list of art qualities known by the database.
-
-        Takes no arguments.
-
-        Returns 1 value:
-
-          art_qualities - List of art qualities.
-
         """
 
         return self.art_fields["qualities"]
@@ -1496,13 +7392,6 @@ class Database( object ):
     def get_processing_states( self ):
         """
         Gets a list of processing states known by the database.
-
-        Takes no arguments.
-
-        Returns 1 value:
-
-          processing_states - List of processing states.
-
         """
 
         return self.processing_states
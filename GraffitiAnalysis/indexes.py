@@ -0,0 +1,944 @@
+import bisect
+import math
+
+# keys of ArtRecords that can be queried.  each entry is (criterion name,
+# record key, flag indicating whether the key's value is a list of values).
+ART_INDEX_KEYS = [("artist",    "artists",    True),
+                  ("associate", "associates", True),
+                  ("vandal",    "vandals",    True),
+                  ("type",      "type",       False),
+                  ("size",      "size",       False),
+                  ("quality",   "quality",    False),
+                  ("state",     "state",      False),
+                  ("tag",       "tags",       True),
+                  ("date",      "date",       False)]
+
+# mean radius of the Earth, in meters.
+EARTH_RADIUS = 6371008.8
+
+class InvertedIndex( object ):
+    """
+    Indexes a set of records by the values of some of their keys, mapping
+    each value to the set of identifiers of the records that have it, so
+    that records matching a set of criteria can be found without scanning
+    them.
+
+    The index is kept current by its owner as records are added, changed,
+    and removed.
+    """
+
+    def __init__( self, index_keys, records ):
+        """
+        Constructs an InvertedIndex from the supplied records.
+
+        Takes 2 arguments:
+
+          index_keys - List of index key specifications, such as
+                       ART_INDEX_KEYS.
+          records    - List of records to populate the index with.
+
+        Returns 1 value:
+
+          self - The newly created InvertedIndex object.
+
+        """
+
+        self._index_keys = index_keys
+
+        # map from each record key to its criterion name and whether it holds
+        # a list of values.
+        self._key_names  = {key: (name, multivalued) for name, key, multivalued in index_keys}
+
+        # map from each criterion name to a map from each value to the
+        # identifiers of the records having it.
+        self._postings   = {name: dict() for name, _, _ in index_keys}
+
+        self.add( records )
+
+    def _get_values( self, key, value ):
+        """
+        Gets the distinct values indexed for one of a record's keys.
+
+        Takes 2 arguments:
+
+          key   - Record key the value belongs to.
+          value - Value of the key.
+
+        Returns 1 value:
+
+          values - Set of values to index.
+
+        """
+
+        if self._key_names[key][1]:
+            return set( value )
+
+        return set( [value] )
+
+    def add( self, records ):
+        """
+        Adds records to the index.
+
+        Takes 1 argument:
+
+          records - List of records to add.
+
+        Returns nothing.
+
+        """
+
+        for name, key, multivalued in self._index_keys:
+            postings = self._postings[name]
+
+            for record in records:
+                record_id = record["id"]
+
+                if multivalued:
+                    for value in record[key]:
+                        postings.setdefault( value, set() ).add( record_id )
+                else:
+                    postings.setdefault( record[key], set() ).add( record_id )
+
+    def remove( self, record ):
+        """
+        Removes a record from the index.
+
+        Takes 1 argument:
+
+          record - Record to remove.  Must have the values it was last
+                   indexed with.
+
+        Returns nothing.
+
+        """
+
+        for _, key, _ in self._index_keys:
+            self._remove_values( record["id"], key, record[key] )
+
+    def _remove_values( self, record_id, key, value ):
+        """
+        Removes a record's identifier from the postings of one of its keys.
+        Postings that become empty are discarded.
+
+        Takes 3 arguments:
+
+          record_id - Identifier of the record.
+          key       - Record key whose postings are updated.
+          value     - Value of the key the record was indexed with.
+
+        Returns nothing.
+
+        """
+
+        postings = self._postings[self._key_names[key][0]]
+
+        for value in self._get_values( key, value ):
+            value_postings = postings.get( value )
+            if value_postings is None:
+                continue
+
+            value_postings.discard( record_id )
+            if len( value_postings ) == 0:
+                del postings[value]
+
+    def update( self, record, key, old_value ):
+        """
+        Updates the index after one of a record's keys has changed.  Nothing
+        is done for keys that aren't indexed.
+
+        Takes 3 arguments:
+
+          record    - Record whose value changed.  Must be in the index.
+          key       - Key whose value changed.
+          old_value - Value of the key the record was indexed with.
+
+        Returns nothing.
+
+        """
+
+        if key not in self._key_names:
+            return
+
+        self._remove_values( record["id"], key, old_value )
+
+        postings = self._postings[self._key_names[key][0]]
+        for value in self._get_values( key, record[key] ):
+            postings.setdefault( value, set() ).add( record["id"] )
+
+    def query( self, criteria ):
+        """
+        Finds the records matching all of the supplied criteria.
+
+        Each criterion's value is either a single value, or a list of
+        values.  For keys holding a list of values (e.g. artists), records
+        match when they have every value listed.  For other keys, records
+        match when they have any of the values listed.
+
+        Takes 1 argument:
+
+          criteria - Dictionary mapping criterion names to the values
+                     required.  See the index keys supplied during
+                     construction for the names available.
+
+        Returns 1 value:
+
+          record_ids - Set of identifiers of the matching records.
+
+        """
+
+        multivalued_names = {name: multivalued for name, _, multivalued in self._index_keys}
+
+        # gather the sets of identifiers that satisfy each constraint.  a
+        # constraint is satisfied by any of its sets.
+        constraints = []
+
+        for name, values in criteria.items():
+            if name not in self._postings:
+                raise KeyError( "{:s} is not an indexed criterion!".format( name ) )
+
+            postings = self._postings[name]
+
+            if not isinstance( values, (list, tuple, set, frozenset) ):
+                values = [values]
+
+            if multivalued_names[name]:
+                constraints.extend( [[postings.get( value, set() )] for value in values] )
+            else:
+                constraints.append( [postings.get( value, set() ) for value in values] )
+
+        if len( constraints ) == 0:
+            raise ValueError( "At least one criterion is required." )
+
+        # intersect the smallest constraints first so that the intermediate
+        # results are as small as possible.
+        #
+        # NOTE: constraints satisfied by several sets are intersected with
+        #       each set separately rather than combining the sets, since the
+        #       result is usually far smaller than they are.
+        #
+        constraints.sort( key=lambda sets: sum( map( len, sets ) ) )
+
+        record_ids = set().union( *constraints[0] )
+        for sets in constraints[1:]:
+            if len( record_ids ) == 0:
+                break
+
+            record_ids = set().union( *[record_ids & value_ids for value_ids in sets] )
+
+        return record_ids
+
+def normalize_tag( tag ):
+    """
+    Normalizes a tag so that variations in case and surrounding whitespace
+    refer to the same tag.
+
+    Takes 1 argument:
+
+      tag - Tag string to normalize.
+
+    Returns 1 value:
+
+      normalized_tag - Normalized tag string.  Empty if the tag was nothing
+                       but whitespace.
+
+    """
+
+    return tag.strip().lower()
+
+class TagIndex( object ):
+    """
+    Indexes photo and art records by their normalized tags, mapping each tag
+    to the identifiers of the records having it.  The tags are also kept
+    sorted so that tags beginning with a prefix can be found for
+    autocompletion.
+
+    Records are distinguished by kind, either "photo" or "art", since photo
+    and art identifiers overlap.  The index is kept current by its owner as
+    records are added, changed, and removed.
+    """
+
+    # kinds of records indexed.
+    KINDS = ["photo", "art"]
+
+    def __init__( self, photos, arts ):
+        """
+        Constructs a TagIndex from the supplied records.
+
+        Takes 2 arguments:
+
+          photos - List of PhotoRecords to populate the index with.
+          arts   - List of ArtRecords to populate the index with.
+
+        Returns 1 value:
+
+          self - The newly created TagIndex object.
+
+        """
+
+        # map from each kind to a map from each tag to the identifiers of the
+        # records of that kind having it.
+        self._record_ids = {kind: dict() for kind in self.KINDS}
+
+        # every tag used by at least one record, sorted.
+        self._tags       = []
+
+        self.add( "photo", photos )
+        self.add( "art", arts )
+
+    def _get_tags( self, tags ):
+        """
+        Gets the distinct normalized tags from a record's tags.
+
+        Takes 1 argument:
+
+          tags - List of tag strings.
+
+        Returns 1 value:
+
+          normalized_tags - Set of normalized tags, excluding empty ones.
+
+        """
+
+        normalized_tags = set( map( normalize_tag, tags ) )
+        normalized_tags.discard( "" )
+
+        return normalized_tags
+
+    def _is_used( self, tag ):
+        """
+        Predicate indicating whether any record has the supplied normalized
+        tag.
+        """
+
+        return any( tag in self._record_ids[kind] for kind in self.KINDS )
+
+    def _add_tags( self, kind, record_id, tags ):
+        """
+        Adds a record's identifier to the postings of its tags.
+
+        Takes 3 arguments:
+
+          kind      - Kind of the record, either "photo" or "art".
+          record_id - Identifier of the record.
+          tags      - Set of the record's normalized tags.
+
+        Returns 1 value:
+
+          new_tags - List of the tags that weren't used by any record before.
+
+        """
+
+        record_ids = self._record_ids[kind]
+        new_tags   = []
+
+        for tag in tags:
+            if tag not in record_ids:
+                if not self._is_used( tag ):
+                    new_tags.append( tag )
+
+                record_ids[tag] = set()
+
+            record_ids[tag].add( record_id )
+
+        return new_tags
+
+    def _remove_tags( self, kind, record_id, tags ):
+        """
+        Removes a record's identifier from the postings of its tags.  Tags
+        that are no longer used by any record are forgotten.
+
+        Takes 3 arguments:
+
+          kind      - Kind of the record, either "photo" or "art".
+          record_id - Identifier of the record.
+          tags      - Set of the record's normalized tags.
+
+        Returns nothing.
+
+        """
+
+        record_ids = self._record_ids[kind]
+
+        for tag in tags:
+            tag_record_ids = record_ids.get( tag )
+            if tag_record_ids is None:
+                continue
+
+            tag_record_ids.discard( record_id )
+            if len( tag_record_ids ) > 0:
+                continue
+
+            del record_ids[tag]
+
+            if not self._is_used( tag ):
+                del self._tags[bisect.bisect_left( self._tags, tag )]
+
+    def _insert_tags( self, tags ):
+        """
+        Inserts newly used tags into the sorted list of tags.
+
+        Takes 1 argument:
+
+          tags - List of tags that aren't in the list.
+
+        Returns nothing.
+
+        """
+
+        # insert a handful of tags individually, otherwise it's cheaper to
+        # sort everything at once.
+        if len( tags ) < 16:
+            for tag in tags:
+                bisect.insort( self._tags, tag )
+        else:
+            self._tags = sorted( self._tags + tags )
+
+    def add( self, kind, records ):
+        """
+        Adds records to the index.
+
+        Takes 2 arguments:
+
+          kind    - Kind of the records, either "photo" or "art".
+          records - List of records to add.
+
+        Returns nothing.
+
+        """
+
+        new_tags = []
+
+        for record in records:
+            new_tags.extend( self._add_tags( kind, record["id"], self._get_tags( record["tags"] ) ) )
+
+        self._insert_tags( new_tags )
+
+    def remove( self, kind, record ):
+        """
+        Removes a record from the index.
+
+        Takes 2 arguments:
+
+          kind   - Kind of the record, either "photo" or "art".
+          record - Record to remove.  Must have the tags it was last indexed
+                   with.
+
+        Returns nothing.
+
+        """
+
+        self._remove_tags( kind, record["id"], self._get_tags( record["tags"] ) )
+
+    def update( self, kind, record, old_tags ):
+        """
+        Updates the index after a record's tags have changed.
+
+        Takes 3 arguments:
+
+          kind     - Kind of the record, either "photo" or "art".
+          record   - Record whose tags changed.  Must be in the index.
+          old_tags - List of tags the record was indexed with.
+
+        Returns nothing.
+
+        """
+
+        old_tags = self._get_tags( old_tags )
+        new_tags = self._get_tags( record["tags"] )
+
+        self._remove_tags( kind, record["id"], old_tags - new_tags )
+        self._insert_tags( self._add_tags( kind, record["id"], new_tags - old_tags ) )
+
+    def get_record_ids( self, kind, tag ):
+        """
+        Gets the identifiers of the records with a tag.
+
+        Takes 2 arguments:
+
+          kind - Kind of the records, either "photo" or "art".
+          tag  - Tag to look up.  Normalized before it is looked up.
+
+        Returns 1 value:
+
+          record_ids - Set of identifiers of the records of the requested kind
+                       having tag.
+
+        """
+
+        return set( self._record_ids[kind].get( normalize_tag( tag ), [] ) )
+
+    def get_counts( self, tag ):
+        """
+        Gets the number of records with a tag.
+
+        Takes 1 argument:
+
+          tag - Tag to look up.  Normalized before it is looked up.
+
+        Returns 2 values:
+
+          photo_count - Number of photo records having tag.
+          art_count   - Number of art records having tag.
+
+        """
+
+        tag = normalize_tag( tag )
+
+        return (len( self._record_ids["photo"].get( tag, [] ) ),
+                len( self._record_ids["art"].get( tag, [] ) ))
+
+    def get_tags( self, prefix="" ):
+        """
+        Gets the tags beginning with a prefix, found by bisecting the sorted
+        tags.
+
+        Takes 1 argument:
+
+          prefix - Optional prefix the tags must begin with.  Normalized
+                   before it is looked up, though surrounding whitespace is
+                   kept so that multi-word tags can be completed.  If
+                   omitted, every tag is returned.
+
+        Returns 1 value:
+
+          tags - Sorted list of tags beginning with prefix.
+
+        """
+
+        prefix = prefix.lstrip().lower()
+        start  = bisect.bisect_left( self._tags, prefix )
+        end    = start
+
+        while end < len( self._tags ) and self._tags[end].startswith( prefix ):
+            end += 1
+
+        return self._tags[start:end]
+
+def _haversine( latitude1, longitude1, cos_latitude1, latitude2, longitude2, cos_latitude2 ):
+    """
+    Computes the great-circle distance between two points from their
+    coordinates in radians.  The cosines of the latitudes are supplied so
+    that callers computing many distances from one point only compute them
+    once.
+
+    Takes 6 arguments:
+
+      latitude1     - Latitude of the first point, in radians.
+      longitude1    - Longitude of the first point, in radians.
+      cos_latitude1 - Cosine of latitude1.
+      latitude2     - Latitude of the second point, in radians.
+      longitude2    - Longitude of the second point, in radians.
+      cos_latitude2 - Cosine of latitude2.
+
+    Returns 1 value:
+
+      distance - Distance between the points, in meters.
+
+    """
+
+    a = (math.sin( (latitude2 - latitude1) / 2 ) ** 2 +
+         cos_latitude1 * cos_latitude2 * math.sin( (longitude2 - longitude1) / 2 ) ** 2)
+
+    return 2 * EARTH_RADIUS * math.asin( math.sqrt( min( a, 1.0 ) ) )
+
+def haversine_distance( location1, location2 ):
+    """
+    Computes the great-circle distance between two locations on a spherical
+    Earth.  This is the distance used by SpatialIndex, so comparing against
+    it reproduces the index's results exactly.
+
+    Takes 2 arguments:
+
+      location1 - Sequence of (latitude, longitude) of the first location, in
+                  degrees.
+      location2 - Sequence of (latitude, longitude) of the second location,
+                  in degrees.
+
+    Returns 1 value:
+
+      distance - Distance between the locations, in meters.
+
+    """
+
+    latitude1, longitude1 = math.radians( location1[0] ), math.radians( location1[1] )
+    latitude2, longitude2 = math.radians( location2[0] ), math.radians( location2[1] )
+
+    return _haversine( latitude1, longitude1, math.cos( latitude1 ),
+                       latitude2, longitude2, math.cos( latitude2 ) )
+
+def _get_longitude_ranges( west, east ):
+    """
+    Splits a range of longitudes that may cross the antimeridian into ranges
+    that don't.
+
+    Takes 2 arguments:
+
+      west - Western longitude of the range, in degrees.
+      east - Eastern longitude of the range, in degrees.  If smaller than
+             west, the range crosses the antimeridian.
+
+    Returns 1 value:
+
+      ranges - List of (west, east) tuples with west no larger than east.
+
+    """
+
+    if west <= east:
+        return [(west, east)]
+
+    return [(west, 180.0), (-180.0, east)]
+
+class SpatialIndex( object ):
+    """
+    Indexes records by their locations so that the records within a bounding
+    box, within a distance of a point, or nearest to a point can be found
+    without examining every record.
+
+    Locations are bucketed into a grid of cells of equal size in latitude
+    and longitude, and queries examine only the records in the cells that
+    overlap their bounds.  Candidates are then checked exactly, so results
+    are identical to checking every record with the same test (see
+    haversine_distance()).  Records without a location, or with a
+    non-finite location, are not indexed.  Longitudes, of both records and
+    bounding boxes, are expected to be within [-180, 180].
+
+    The index is kept current by its owner as records are added, changed,
+    and removed.
+    """
+
+    # NOTE: bounds of distance queries are padded by this many degrees so
+    #       that rounding in computing the bounds can never exclude a record
+    #       that the exact distance check would accept.  the padding
+    #       corresponds to roughly a meter.
+    #
+    _BOUNDS_PADDING = 1e-5
+
+    def __init__( self, records, cell_size=0.001 ):
+        """
+        Constructs a SpatialIndex from the supplied records.
+
+        Takes 2 arguments:
+
+          records   - List of records to populate the index with.  Each
+                      must have a "location" key holding a sequence of
+                      (latitude, longitude) in degrees, or None.
+          cell_size - Optional size of the grid's cells, in degrees.  If
+                      omitted, defaults to 0.001 degrees, roughly a city
+                      block, which suits queries spanning a few blocks.
+
+        Returns 1 value:
+
+          self - The newly created SpatialIndex object.
+
+        """
+
+        self._cell_size = cell_size
+
+        # map from grid cell, as (row, column), to the identifiers of the
+        # records located within it.
+        self._cells     = dict()
+
+        # map from record identifier to its (latitude, longitude) in degrees
+        # and in radians, and the cosine of its latitude.
+        self._locations = dict()
+
+        self.add( records )
+
+    def __len__( self ):
+        """
+        Returns the number of records in the index.
+        """
+
+        return len( self._locations )
+
+    def _get_cell( self, latitude, longitude ):
+        """
+        Gets the grid cell containing a location.  Longitudes outside of
+        [-180, 180] are wrapped into it so that every location has a cell a
+        query can find.
+
+        Takes 2 arguments:
+
+          latitude  - Latitude of the location, in degrees.
+          longitude - Longitude of the location, in degrees.
+
+        Returns 1 value:
+
+          cell - Tuple of (row, column) identifying the cell.
+
+        """
+
+        if not (-180.0 <= longitude <= 180.0):
+            longitude = (longitude + 180.0) % 360.0 - 180.0
+
+        return (math.floor( latitude / self._cell_size ),
+                math.floor( longitude / self._cell_size ))
+
+    def add( self, records ):
+        """
+        Adds records to the index.
+
+        Takes 1 argument:
+
+          records - List of records to add.
+
+        Returns nothing.
+
+        """
+
+        for record in records:
+            location = record["location"]
+            if location is None:
+                continue
+
+            latitude, longitude = float( location[0] ), float( location[1] )
+            if not (math.isfinite( latitude ) and math.isfinite( longitude )):
+                continue
+
+            latitude_radians = math.radians( latitude )
+
+            self._locations[record["id"]] = (latitude,
+                                             longitude,
+                                             latitude_radians,
+                                             math.radians( longitude ),
+                                             math.cos( latitude_radians ))
+            self._cells.setdefault( self._get_cell( latitude, longitude ), set() ).add( record["id"] )
+
+    def remove( self, record_id ):
+        """
+        Removes a record from the index.  Nothing is done if the record isn't
+        in the index.
+
+        Takes 1 argument:
+
+          record_id - Identifier of the record to remove.
+
+        Returns nothing.
+
+        """
+
+        location = self._locations.pop( record_id, None )
+        if location is None:
+            return
+
+        cell            = self._get_cell( location[0], location[1] )
+        cell_record_ids = self._cells[cell]
+
+        cell_record_ids.discard( record_id )
+        if len( cell_record_ids ) == 0:
+            del self._cells[cell]
+
+    def update( self, record ):
+        """
+        Updates the index after a record's location has changed.
+
+        Takes 1 argument:
+
+          record - Record whose location changed.
+
+        Returns nothing.
+
+        """
+
+        self.remove( record["id"] )
+        self.add( [record] )
+
+    def _get_candidates( self, south, north, longitude_ranges ):
+        """
+        Gets the identifiers of the records in the cells overlapping a
+        region.  The region's cells are visited directly when there are
+        fewer of them than there are occupied cells, otherwise the occupied
+        cells are checked against the region.
+
+        Takes 3 arguments:
+
+          south            - Southern latitude of the region, in degrees.
+          north            - Northern latitude of the region, in degrees.
+          longitude_ranges - List of (west, east) longitude ranges of the
+                             region, in degrees, none of which cross the
+                             antimeridian.
+
+        Returns 1 value:
+
+          candidate_ids - List of sets of record identifiers.
+
+        """
+
+        first_row = math.floor( max( south, -90.0 ) / self._cell_size )
+        last_row  = math.floor( min( north, 90.0 ) / self._cell_size )
+
+        column_ranges = [(math.floor( max( west, -180.0 ) / self._cell_size ),
+                          math.floor( min( east, 180.0 ) / self._cell_size ))
+                         for west, east in longitude_ranges]
+
+        cell_count = (last_row - first_row + 1) * sum( last_column - first_column + 1
+                                                       for first_column, last_column in column_ranges )
+
+        if cell_count > len( self._cells ):
+            return [cell_record_ids for (row, column), cell_record_ids in self._cells.items()
+                    if first_row <= row <= last_row and
+                    any( first_column <= column <= last_column for first_column, last_column in column_ranges )]
+
+        candidate_ids = []
+
+        for row in range( first_row, last_row + 1 ):
+            for first_column, last_column in column_ranges:
+                for column in range( first_column, last_column + 1 ):
+                    cell_record_ids = self._cells.get( (row, column) )
+                    if cell_record_ids is not None:
+                        candidate_ids.append( cell_record_ids )
+
+        return candidate_ids
+
+    def get_ids_in_bbox( self, south, west, north, east ):
+        """
+        Finds the records located within a bounding box, including its edges.
+
+        Takes 4 arguments:
+
+          south - Southern latitude of the box, in degrees.
+          west  - Western longitude of the box, in degrees.
+          north - Northern latitude of the box, in degrees.
+          east  - Eastern longitude of the box, in degrees.  If smaller than
+                  west, the box crosses the antimeridian.
+
+        Returns 1 value:
+
+          record_ids - Set of identifiers of the records within the box.
+
+        """
+
+        record_ids = set()
+
+        if south > north:
+            return record_ids
+
+        crosses_antimeridian = west > east
+
+        for cell_record_ids in self._get_candidates( south, north, _get_longitude_ranges( west, east ) ):
+            for record_id in cell_record_ids:
+                latitude, longitude = self._locations[record_id][:2]
+
+                if not (south <= latitude <= north):
+                    continue
+
+                if crosses_antimeridian:
+                    if longitude >= west or longitude <= east:
+                        record_ids.add( record_id )
+                elif west <= longitude <= east:
+                    record_ids.add( record_id )
+
+        return record_ids
+
+    def get_ids_within( self, location, distance ):
+        """
+        Finds the records located within a distance of a point.
+
+        Takes 2 arguments:
+
+          location - Sequence of (latitude, longitude) of the point, in
+                     degrees.
+          distance - Maximum distance from the point, in meters.  Records at
+                     exactly this distance are included.
+
+        Returns 1 value:
+
+          records_distances - List of (distance, record identifier) tuples
+                              for the records within distance of location,
+                              sorted by distance and then identifier.
+
+        """
+
+        if distance < 0:
+            return []
+
+        latitude, longitude = float( location[0] ), float( location[1] )
+        latitude_radians    = math.radians( latitude )
+        longitude_radians   = math.radians( longitude )
+        cos_latitude        = math.cos( latitude_radians )
+
+        # bound the circle by latitude, and by longitude unless it contains a
+        # pole, in which case every longitude is within it.
+        angle = distance / EARTH_RADIUS
+        south = math.degrees( latitude_radians - angle ) - self._BOUNDS_PADDING
+        north = math.degrees( latitude_radians + angle ) + self._BOUNDS_PADDING
+
+        if angle >= math.pi / 2 or south <= -90.0 or north >= 90.0:
+            longitude_ranges = [(-180.0, 180.0)]
+        else:
+            longitude_delta = math.degrees( math.asin( min( math.sin( angle ) / cos_latitude, 1.0 ) ) ) + self._BOUNDS_PADDING
+
+            if longitude_delta >= 180.0:
+                longitude_ranges = [(-180.0, 180.0)]
+            else:
+                west = (longitude - longitude_delta + 180.0) % 360.0 - 180.0
+                east = (longitude + longitude_delta + 180.0) % 360.0 - 180.0
+
+                longitude_ranges = _get_longitude_ranges( west, east )
+
+        records_distances = []
+
+        for cell_record_ids in self._get_candidates( south, north, longitude_ranges ):
+            for record_id in cell_record_ids:
+                _, _, record_latitude, record_longitude, record_cos_latitude = self._locations[record_id]
+
+                record_distance = _haversine( latitude_radians, longitude_radians, cos_latitude,
+                                              record_latitude, record_longitude, record_cos_latitude )
+
+                if record_distance <= distance:
+                    records_distances.append( (record_distance, record_id) )
+
+        records_distances.sort()
+
+        return records_distances
+
+    def get_nearest_ids( self, location, count, max_distance=None ):
+        """
+        Finds the records nearest to a point.  Distance queries of increasing
+        size are made until enough records are found.
+
+        Takes 3 arguments:
+
+          location     - Sequence of (latitude, longitude) of the point, in
+                         degrees.
+          count        - Maximum number of records to find.
+          max_distance - Optional maximum distance from the point, in meters.
+                         If omitted, records are found regardless of their
+                         distance.
+
+        Returns 1 value:
+
+          records_distances - List of up to count (distance, record
+                              identifier) tuples for the records nearest to
+                              location, sorted by distance and then
+                              identifier.
+
+        """
+
+        if count <= 0 or len( self._locations ) == 0:
+            return []
+
+        # every point is within half the Earth's circumference of every
+        # other.
+        farthest_distance = math.pi * EARTH_RADIUS
+        if max_distance is not None:
+            farthest_distance = min( farthest_distance, max_distance )
+
+        # start with a search covering about a cell.
+        distance = math.radians( self._cell_size ) * EARTH_RADIUS
+
+        while True:
+            distance          = min( distance, farthest_distance )
+            records_distances = self.get_ids_within( location, distance )
+
+            # every record beyond this distance is farther than those found,
+            # so the nearest have been found once there are enough of them.
+            if len( records_distances ) >= count or distance >= farthest_distance:
+                return records_distances[:count]
+
+            # grow the search by the area needed to find the remaining records
+            # assuming they're spread evenly, but at least double it.
+            if len( records_distances ) == 0:
+                distance *= 4
+            else:
+                distance *= max( 2.0, 1.25 * math.sqrt( count / len( records_distances ) ) )
@@ -0,0 +1,385 @@
+import atexit
+import collections
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+# environment variable that enables instrumentation when this module is
+# imported.  "1" enables it, while anything else, aside from "0", is also
+# the path the statistics are written to when the process exits.
+ENVIRONMENT_VARIABLE = "GRAFFITI_INSTRUMENTATION"
+
+# number of buckets in each latency histogram.  bucket i counts the
+# durations below 2**i microseconds that weren't counted by the bucket
+# before it, and the last bucket counts everything else (over 2**38
+# microseconds, roughly three days).
+_BUCKET_COUNT = 40
+
+# timer returned when instrumentation is disabled.  it does nothing, so
+# instrumented code costs next to nothing.
+_NULL_TIMER = contextlib.nullcontext()
+
+# flag indicating whether timings and counts are being recorded.
+_enabled = False
+
+# statistics recorded so far, keyed by name, and the lock guarding them
+# since they may be recorded by several threads, e.g. by background saves.
+_lock     = threading.Lock()
+_timings  = dict()
+_counters = collections.Counter()
+
+class _Timing( object ):
+    """
+    Accumulates the durations recorded for one name.
+    """
+
+    __slots__ = ("count", "total", "minimum", "maximum", "buckets")
+
+    def __init__( self ):
+        """
+        Constructs an empty _Timing.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          self - The newly created _Timing object.
+
+        """
+
+        self.count   = 0
+        self.total   = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.buckets = [0] * _BUCKET_COUNT
+
+    def add( self, duration ):
+        """
+        Records a duration.
+
+        Takes 1 argument:
+
+          duration - Duration to record, in seconds.
+
+        Returns nothing.
+
+        """
+
+        self.count += 1
+        self.total += duration
+
+        if self.minimum is None or duration < self.minimum:
+            self.minimum = duration
+        if self.maximum is None or duration > self.maximum:
+            self.maximum = duration
+
+        # durations are bucketed by the number of bits needed to hold them in
+        # microseconds, i.e. by powers of two.
+        bucket = min( int( duration * 1e6 ).bit_length(), _BUCKET_COUNT - 1 )
+        self.buckets[bucket] += 1
+
+    def get_percentile( self, fraction ):
+        """
+        Estimates a percentile of the recorded durations from the histogram.
+        The estimate is the upper bound of the bucket holding the percentile,
+        so it's within a factor of two of the actual value.
+
+        Takes 1 argument:
+
+          fraction - Fraction of the durations at or below the percentile,
+                     e.g. 0.9 for the 90th percentile.
+
+        Returns 1 value:
+
+          duration - Estimated percentile, in seconds, or None if nothing has
+                     been recorded.
+
+        """
+
+        if self.count == 0:
+            return None
+
+        threshold = fraction * self.count
+        count     = 0
+
+        for bucket, bucket_count in enumerate( self.buckets ):
+            count += bucket_count
+            if count >= threshold:
+                break
+
+        return min( (2 ** bucket) / 1e6, self.maximum )
+
+    def get_statistics( self ):
+        """
+        Summarizes the recorded durations.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          statistics - Dictionary containing the number of durations, their
+                       total, mean, minimum, and maximum, estimates of their
+                       50th, 90th, and 99th percentiles, all in seconds, and
+                       their histogram as a list of [upper bound, count]
+                       pairs for the buckets that aren't empty.
+
+        """
+
+        return { "count":     self.count,
+                 "total":     self.total,
+                 "mean":      self.total / self.count if self.count > 0 else None,
+                 "min":       self.minimum,
+                 "max":       self.maximum,
+                 "p50":       self.get_percentile( 0.5 ),
+                 "p90":       self.get_percentile( 0.9 ),
+                 "p99":       self.get_percentile( 0.99 ),
+                 "histogram": [[(2 ** bucket) / 1e6 if bucket < _BUCKET_COUNT - 1 else None, bucket_count]
+                               for bucket, bucket_count in enumerate( self.buckets )
+                               if bucket_count > 0] }
+
+class _Timer( object ):
+    """
+    Context manager that records how long its body takes under a name.
+    """
+
+    __slots__ = ("name", "start_time")
+
+    def __init__( self, name ):
+        """
+        Constructs a _Timer for the supplied name.
+
+        Takes 1 argument:
+
+          name - Name the duration is recorded under.
+
+        Returns 1 value:
+
+          self - The newly created _Timer object.
+
+        """
+
+        self.name       = name
+        self.start_time = None
+
+    def __enter__( self ):
+        self.start_time = time.perf_counter()
+
+        return self
+
+    def __exit__( self, exception_type, exception_value, traceback ):
+        add_time( self.name, time.perf_counter() - self.start_time )
+
+        return False
+
+def is_enabled():
+    """
+    Predicate indicating whether timings and counts are being recorded.
+    """
+
+    return _enabled
+
+def enable():
+    """
+    Starts recording timings and counts.  Statistics recorded previously are
+    kept.
+
+    Takes no arguments.
+
+    Returns nothing.
+
+    """
+
+    global _enabled
+
+    _enabled = True
+
+def disable():
+    """
+    Stops recording timings and counts.  Statistics recorded so far are
+    kept.
+
+    Takes no arguments.
+
+    Returns nothing.
+
+    """
+
+    global _enabled
+
+    _enabled = False
+
+def reset():
+    """
+    Forgets every timing and count recorded so far.
+
+    Takes no arguments.
+
+    Returns nothing.
+
+    """
+
+    with _lock:
+        _timings.clear()
+        _counters.clear()
+
+def add_time( name, duration ):
+    """
+    Records a duration under the supplied name.  Nothing is recorded unless
+    instrumentation is enabled.
+
+    Takes 2 arguments:
+
+      name     - Name the duration is recorded under, e.g. "xml.parse".
+      duration - Duration to record, in seconds.
+
+    Returns nothing.
+
+    """
+
+    if not _enabled:
+        return
+
+    with _lock:
+        timing = _timings.get( name )
+        if timing is None:
+            timing         = _Timing()
+            _timings[name] = timing
+
+        timing.add( duration )
+
+def increment( name, count=1 ):
+    """
+    Adds to the counter of the supplied name.  Nothing is counted unless
+    instrumentation is enabled.
+
+    Takes 2 arguments:
+
+      name  - Name of the counter, e.g. "xml.photos_read".
+      count - Optional amount to add.  If omitted, defaults to 1.
+
+    Returns nothing.
+
+    """
+
+    if not _enabled:
+        return
+
+    with _lock:
+        _counters[name] += count
+
+def timed( name ):
+    """
+    Gets a context manager that records how long its body takes under the
+    supplied name.  Durations are recorded even if the body raises an
+    exception.
+
+        with grafinstr.timed( "xml.parse" ):
+            ...
+
+    Takes 1 argument:
+
+      name - Name the duration is recorded under.
+
+    Returns 1 value:
+
+      timer - Context manager timing its body, or one doing nothing if
+              instrumentation is disabled.
+
+    """
+
+    if not _enabled:
+        return _NULL_TIMER
+
+    return _Timer( name )
+
+def instrumented( name=None ):
+    """
+    Decorates a function so that its calls are timed whenever
+    instrumentation is enabled.  Calls are counted by the number of
+    durations recorded.
+
+    Takes 1 argument:
+
+      name - Optional name the durations are recorded under.  If omitted,
+             the function's qualified name, e.g. "Database.load_database",
+             is used.
+
+    Returns 1 value:
+
+      decorator - Function decorator.
+
+    """
+
+    def decorator( function ):
+        timing_name = name if name is not None else function.__qualname__
+
+        @functools.wraps( function )
+        def wrapper( *args, **kwargs ):
+            if not _enabled:
+                return function( *args, **kwargs )
+
+            start_time = time.perf_counter()
+            try:
+                return function( *args, **kwargs )
+            finally:
+                add_time( timing_name, time.perf_counter() - start_time )
+
+        return wrapper
+
+    return decorator
+
+def get_statistics():
+    """
+    Gets the timings and counts recorded so far.
+
+    Takes no arguments.
+
+    Returns 1 value:
+
+      statistics - Dictionary with the keys "enabled", indicating whether
+                   instrumentation is enabled, "timings", mapping names to
+                   summaries of their durations (see _Timing.get_statistics()),
+                   and "counters", mapping names to counts.
+
+    """
+
+    with _lock:
+        return { "enabled":  _enabled,
+                 "timings":  {name: timing.get_statistics() for name, timing in sorted( _timings.items() )},
+                 "counters": dict( sorted( _counters.items() ) ) }
+
+def dump( destination ):
+    """
+    Writes the timings and counts recorded so far as JSON.  See
+    get_statistics() for their structure.
+
+    Takes 1 argument:
+
+      destination - Path of the file to write, which is replaced if it
+                    exists, or a text file object to write to.
+
+    Returns nothing.
+
+    """
+
+    statistics = get_statistics()
+
+    if hasattr( destination, "write" ):
+        json.dump( statistics, destination, indent=4 )
+        return
+
+    with open( destination, "w" ) as f:
+        json.dump( statistics, f, indent=4 )
+
+# enable ourselves when asked to by the environment, dumping what we record
+# when the process exits if we were given somewhere to put it.
+_environment_value = os.environ.get( ENVIRONMENT_VARIABLE, "" )
+
+if _environment_value not in ("", "0"):
+    enable()
+
+    if _environment_value != "1":
+        atexit.register( dump, _environment_value )
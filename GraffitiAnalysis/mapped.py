@@ -0,0 +1,300 @@
+import json
+import mmap
+import struct
+
+import numpy as np
+
+# identifies files written by write_arrays() and the version of their layout.
+MAPPED_MAGIC   = b"GRAFMAP\0"
+MAPPED_VERSION = 1
+
+# arrays are aligned so that every element is naturally aligned, whatever
+# its type, and so that arrays start on their own cache line.
+_ALIGNMENT     = 64
+
+# the magic is followed by the length of the JSON header.
+_PREAMBLE      = struct.Struct( "<8sQ" )
+
+def _get_padding( position ):
+    """
+    Computes the number of bytes needed to align a position within a file.
+
+    Takes 1 argument:
+
+      position - Byte offset to align.
+
+    Returns 1 value:
+
+      padding - Number of bytes to skip so that position is aligned.
+
+    """
+
+    return -position % _ALIGNMENT
+
+class StringTable( object ):
+    """
+    Assigns indices to strings, in the order they're first added, so that
+    columns of strings, or lists of strings, can be stored as integer arrays.
+    The strings themselves are stored as one array of UTF-8 bytes and an
+    array of offsets into it.
+    """
+
+    def __init__( self ):
+        """
+        Constructs an empty StringTable.
+
+        Takes no arguments.
+
+        Returns 1 value:
+
+          self - The newly created StringTable object.
+
+        """
+
+        self._strings = []
+        self._indices = dict()
+
+    def add( self, string ):
+        """
+        Gets a string's index, adding it to the table if it isn't there.
+
+        Takes 1 argument:
+
+          string - String to add.  May be None.
+
+        Returns 1 value:
+
+          index - Non-negative index of the string, or -1 if string is None.
+
+        """
+
+        if string is None:
+            return -1
+
+        index = self._indices.get( string )
+
+        if index is None:
+            index                 = len( self._strings )
+            self._indices[string] = index
+            self._strings.append( string )
+
+        return index
+
+    def encode( self, strings ):
+        """
+        Converts a sequence of strings into an array of their indices.
+
+        Takes 1 argument:
+
+          strings - Sequence of strings, or Nones, to convert.
+
+        Returns 1 value:
+
+          indices - NumPy array of int32 string indices.
+
+        """
+
+        return np.fromiter( map( self.add, strings ), dtype=np.int32, count=len( strings ) )
+
+    def encode_lists( self, lists ):
+        """
+        Converts a sequence of lists of strings into an array of the
+        concatenated lists' string indices and an array of offsets into it.
+        The strings of the i-th list are at indices[offsets[i]:offsets[i + 1]].
+
+        Takes 1 argument:
+
+          lists - Sequence of lists of strings to convert.
+
+        Returns 2 values:
+
+          offsets - NumPy array of len( lists ) + 1 int64 offsets.
+          indices - NumPy array of int32 string indices.
+
+        """
+
+        offsets     = np.zeros( len( lists ) + 1, dtype=np.int64 )
+        offsets[1:] = np.cumsum( [len( strings ) for strings in lists] )
+
+        indices = np.fromiter( (self.add( string ) for strings in lists for string in strings),
+                               dtype=np.int32,
+                               count=offsets[-1] )
+
+        return (offsets, indices)
+
+    def get_arrays( self ):
+        """
+        Gets the table's strings in the form stored.
+
+        Takes no arguments.
+
+        Returns 2 values:
+
+          offsets - NumPy array of len( strings ) + 1 int64 offsets into data.
+          data    - NumPy array of the strings' concatenated UTF-8 bytes.
+
+        """
+
+        encoded_strings = [string.encode( "utf-8" ) for string in self._strings]
+
+        offsets     = np.zeros( len( encoded_strings ) + 1, dtype=np.int64 )
+        offsets[1:] = np.cumsum( [len( encoded_string ) for encoded_string in encoded_strings] )
+
+        data = np.frombuffer( b"".join( encoded_strings ), dtype=np.uint8 )
+
+        return (offsets, data)
+
+def write_arrays( f, metadata, arrays ):
+    """
+    Writes a set of NumPy arrays to a file so that they can be mapped into
+    memory by MappedArrays.  The file holds a small JSON header describing
+    each array, followed by the arrays' contents, each aligned to a 64 byte
+    boundary.  Arrays are written in little endian byte order.
+
+    Takes 3 arguments:
+
+      f        - Binary file object to write to.  Must be positioned at the
+                 start of the file.
+      metadata - JSON serializable object stored alongside the arrays.
+      arrays   - Dictionary mapping array names to NumPy arrays.  Object
+                 arrays cannot be written.
+
+    Returns nothing.
+
+    """
+
+    arrays = {name: np.ascontiguousarray( array, dtype=array.dtype.newbyteorder( "<" ) )
+              for name, array in arrays.items()}
+
+    # lay the arrays out as if the header were empty, and then shift them
+    # past it once its size is known.  the header's size depends on the
+    # offsets it contains, so we grow the shift until the header fits.
+    layout   = dict()
+    position = 0
+    for name, array in arrays.items():
+        if array.dtype.hasobject:
+            raise ValueError( "Cannot write object array {:s}.".format( name ) )
+
+        layout[name] = [array.dtype.str, position, list( array.shape )]
+        position    += array.nbytes + _get_padding( array.nbytes )
+
+    def encode_header( data_offset ):
+        return json.dumps( { "version":  MAPPED_VERSION,
+                             "metadata": metadata,
+                             "arrays":   {name: [dtype, offset + data_offset, shape]
+                                          for name, (dtype, offset, shape) in layout.items()} } ).encode( "utf-8" )
+
+    data_offset = 0
+    while True:
+        header = encode_header( data_offset )
+        end    = _PREAMBLE.size + len( header )
+
+        if end <= data_offset:
+            break
+
+        data_offset = end + _get_padding( end )
+
+    f.write( _PREAMBLE.pack( MAPPED_MAGIC, len( header ) ) )
+    f.write( header )
+    f.write( b"\0" * (data_offset - end) )
+
+    for array in arrays.values():
+        f.write( array.tobytes() )
+        f.write( b"\0" * _get_padding( array.nbytes ) )
+
+class MappedArrays( object ):
+    """
+    Provides read-only access to the arrays in a file written by
+    write_arrays().  The file is mapped into memory rather than read, so
+    opening it is cheap regardless of its size, and every process mapping the
+    same file shares the same pages of the operating system's page cache.
+
+    The arrays are NumPy views of the mapping and are not writable.
+    """
+
+    def __init__( self, filename ):
+        """
+        Maps the supplied file into memory.  A RuntimeError is raised if the
+        file wasn't written by write_arrays(), or was written with a
+        different layout version.
+
+        Takes 1 argument:
+
+          filename - Path to the file to map.
+
+        Returns 1 value:
+
+          self - The newly created MappedArrays object.
+
+        """
+
+        with open( filename, "rb" ) as f:
+            self._mapping = mmap.mmap( f.fileno(), 0, access=mmap.ACCESS_READ )
+
+        try:
+            magic, header_length = _PREAMBLE.unpack_from( self._mapping, 0 )
+            if magic != MAPPED_MAGIC:
+                raise RuntimeError( "{:s} is not a mapped database.".format( filename ) )
+
+            header = json.loads( self._mapping[_PREAMBLE.size:_PREAMBLE.size + header_length].decode( "utf-8" ) )
+            if header["version"] != MAPPED_VERSION:
+                raise RuntimeError( "{:s} has an unsupported layout version ({:d}).".format( filename,
+                                                                                              header["version"] ) )
+        except:
+            self._mapping.close()
+            raise
+
+        self.metadata = header["metadata"]
+        self.arrays   = dict()
+
+        for name, (dtype, offset, shape) in header["arrays"].items():
+            dtype = np.dtype( dtype )
+            count = int( np.prod( shape, dtype=np.int64 ) )
+
+            self.arrays[name] = np.frombuffer( self._mapping,
+                                               dtype=dtype,
+                                               count=count,
+                                               offset=offset ).reshape( shape )
+
+    def close( self ):
+        """
+        Releases the mapping.  The arrays must not be used afterwards.  Should
+        views of them still exist, the mapping is released once they are.
+
+        Takes no arguments.
+
+        Returns nothing.
+
+        """
+
+        self.arrays = dict()
+
+        try:
+            self._mapping.close()
+        except BufferError:
+            pass
+
+    def get_string( self, name, index ):
+        """
+        Gets a string from a string table written as the arrays
+        "<name>_offsets" and "<name>_data" (see StringTable.get_arrays()).
+
+        Takes 2 arguments:
+
+          name  - Name of the string table.
+          index - Index of the string.  May be negative to indicate a missing
+                  string.
+
+        Returns 1 value:
+
+          string - The string at index, or None if index is negative.
+
+        """
+
+        if index < 0:
+            return None
+
+        offsets = self.arrays[name + "_offsets"]
+        data    = self.arrays[name + "_data"]
+
+        return data[offsets[index]:offsets[index + 1]].tobytes().decode( "utf-8" )
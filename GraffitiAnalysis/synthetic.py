@@ -0,0 +1,357 @@
+import math
+import random
+
+import GraffitiAnalysis.database as grafdb
+
+# center of the area photographed and the spread, in degrees, of the
+# neighborhoods that photo walks start in.
+AREA_CENTER = (37.7749, -122.4194)
+AREA_SPREAD = 0.03
+
+# first and last times, in seconds since the Epoch, that photos are taken.
+# roughly 2014 through 2017.
+FIRST_PHOTO_TIME = 1388534400
+LAST_PHOTO_TIME  = 1514764800
+
+# number of photos in a photo walk is geometrically distributed with this
+# mean, and each walk takes at least this many photos.
+MEAN_WALK_LENGTH    = 120
+MINIMUM_WALK_LENGTH = 5
+
+# mean distance, in meters, and time, in seconds, between photos of a walk,
+# and the standard deviation, in degrees, of the change in heading between
+# them.
+MEAN_STEP_DISTANCE = 25.0
+MEAN_STEP_TIME     = 40.0
+STEP_TURN_SPREAD   = 35.0
+
+# fraction of photos whose location wasn't recorded, e.g. when the GPS lost
+# its fix.
+MISSING_LOCATION_FRACTION = 0.03
+
+# weights of the number of art records per photo, starting with zero.
+ART_COUNT_WEIGHTS = [15, 30, 22, 13, 8, 5, 3, 2, 2]
+
+# weights of the art types, sizes, qualities, and processing states.  values
+# the database knows that aren't listed get DEFAULT_WEIGHT.
+DEFAULT_WEIGHT = 2
+
+ART_TYPE_WEIGHTS = { "tag":        40,
+                     "throwup":    20,
+                     "sticker":    12,
+                     "text":       10,
+                     "other":      5,
+                     "wild_style": 5,
+                     "piece":      5,
+                     "mural":      3 }
+
+# sizes depend on the type of art.  types not listed use medium-ish sizes.
+ART_SIZE_WEIGHTS = { "tag":        { "tiny": 25, "small": 55, "medium": 15, "large": 5,  "huge": 0 },
+                     "sticker":    { "tiny": 60, "small": 38, "medium": 2,  "large": 0,  "huge": 0 },
+                     "throwup":    { "tiny": 0,  "small": 10, "medium": 45, "large": 40, "huge": 5 },
+                     "wild_style": { "tiny": 0,  "small": 0,  "medium": 20, "large": 50, "huge": 30 },
+                     "piece":      { "tiny": 0,  "small": 0,  "medium": 20, "large": 50, "huge": 30 },
+                     "mural":      { "tiny": 0,  "small": 0,  "medium": 5,  "large": 35, "huge": 60 } }
+DEFAULT_SIZE_WEIGHTS = { "tiny": 10, "small": 35, "medium": 35, "large": 15, "huge": 5 }
+
+ART_QUALITY_WEIGHTS = { "bad":       10,
+                        "poor":      25,
+                        "fair":      35,
+                        "good":      22,
+                        "excellent": 8 }
+
+PHOTO_STATE_WEIGHTS = { "reviewed":     70,
+                        "unreviewed":   25,
+                        "needs_review": 5 }
+ART_STATE_WEIGHTS   = { "reviewed":     85,
+                        "unreviewed":   5,
+                        "needs_review": 10 }
+
+# tags applied to photos and art, with their weights, and the fraction of
+# records that are tagged at all.
+PHOTO_TAG_WEIGHTS = { "alley":    30,
+                      "wall":     25,
+                      "door":     15,
+                      "rooftop":  8,
+                      "truck":    8,
+                      "freeway":  6,
+                      "buffed":   5,
+                      "blurry":   3 }
+ART_TAG_WEIGHTS   = { "partial":      40,
+                      "faded":        30,
+                      "crossed":      15,
+                      "roller":       10,
+                      "extinguisher": 5 }
+PHOTO_TAG_FRACTION = 0.25
+ART_TAG_FRACTION   = 0.05
+
+# number of artists relative to the number of photos, and the bounds on it.
+PHOTOS_PER_ARTIST = 50
+MINIMUM_ARTISTS   = 100
+MAXIMUM_ARTISTS   = 2000
+
+# exponent of the Zipf distribution of artists' popularity.  a handful of
+# artists are everywhere, while most are seldom seen.
+ARTIST_POPULARITY_EXPONENT = 1.1
+
+# number of artists active in the neighborhood of a photo walk, and the
+# fraction of art by them rather than by artists from elsewhere.
+LOCAL_ARTIST_COUNT    = 25
+LOCAL_ARTIST_FRACTION = 0.7
+
+# fractions of art whose artist is unknown, that has associates, that has
+# been vandalized, and that is dated.
+UNKNOWN_ARTIST_FRACTION = 0.25
+ASSOCIATES_FRACTION     = 0.1
+VANDALS_FRACTION        = 0.03
+DATED_FRACTION          = 0.05
+
+# syllables artist names are built from.
+NAME_SYLLABLES = ["ak", "bo", "da", "ek", "fu", "gro", "hex", "iz", "jo", "ka",
+                  "lo", "mi", "no", "ox", "pe", "qu", "ru", "sa", "te", "uv",
+                  "vo", "wa", "xo", "yo", "ze", "kr", "sm", "st", "tr", "zr"]
+
+# meters per degree of latitude.
+METERS_PER_DEGREE = 2 * math.pi * 6371008.8 / 360
+
+def _get_weights( values, weights ):
+    """
+    Looks up the weights of a list of values.
+
+    Takes 2 arguments:
+
+      values  - List of values to weigh.
+      weights - Dictionary mapping values to their weights.  Values that
+                aren't present get DEFAULT_WEIGHT.
+
+    Returns 1 value:
+
+      weights - List of weights, one per value.
+
+    """
+
+    return [weights.get( value, DEFAULT_WEIGHT ) for value in values]
+
+def _generate_artist_names( rng, count, existing_names ):
+    """
+    Generates unique, pronounceable artist names.
+
+    Takes 3 arguments:
+
+      rng            - random.Random object to draw from.
+      count          - Number of names to generate.
+      existing_names - Iterable of names that must not be generated.
+
+    Returns 1 value:
+
+      names - List of count names.
+
+    """
+
+    taken_names = set( [name.lower() for name in existing_names] )
+    names       = []
+
+    while len( names ) < count:
+        name = "".join( rng.choice( NAME_SYLLABLES ) for _ in range( rng.randint( 2, 3 ) ) )
+
+        # short, all caps names are common among writers.
+        if len( name ) <= 4 or rng.random() < 0.2:
+            name = name.upper()
+        else:
+            name = name.capitalize()
+
+        if name.lower() not in taken_names:
+            taken_names.add( name.lower() )
+            names.append( name )
+
+    return names
+
+def _generate_walk( rng, photo_count, first_photo_number ):
+    """
+    Generates the fields of the photos taken during a photo walk.  The
+    photographer wanders from a random starting point, taking photos every
+    few tens of meters.
+
+    Takes 3 arguments:
+
+      rng                - random.Random object to draw from.
+      photo_count        - Number of photos taken during the walk.
+      first_photo_number - Number of the walk's first photo, used to name
+                           its file.
+
+    Returns 1 value:
+
+      photos_fields - List of dictionaries, one per photo, suitable for
+                      Database.new_photo_records().
+
+    """
+
+    latitude   = rng.gauss( AREA_CENTER[0], AREA_SPREAD )
+    longitude  = rng.gauss( AREA_CENTER[1], AREA_SPREAD )
+    heading    = rng.uniform( 0, 360 )
+
+    # walks start during the day.
+    photo_time = rng.uniform( FIRST_PHOTO_TIME, LAST_PHOTO_TIME )
+    photo_time = photo_time - photo_time % 86400 + rng.uniform( 9, 17 ) * 3600
+
+    photos_fields = []
+
+    for photo_number in range( first_photo_number, first_photo_number + photo_count ):
+        heading   += rng.gauss( 0, STEP_TURN_SPREAD )
+        distance   = rng.expovariate( 1 / MEAN_STEP_DISTANCE )
+
+        latitude  += distance * math.cos( math.radians( heading ) ) / METERS_PER_DEGREE
+        longitude += (distance * math.sin( math.radians( heading ) ) /
+                      (METERS_PER_DEGREE * math.cos( math.radians( latitude ) )))
+
+        photo_time += rng.expovariate( 1 / MEAN_STEP_TIME )
+
+        # most photos are taken in landscape.
+        if rng.random() < 0.8:
+            resolution, rotation = (4608, 3456), 0
+        else:
+            resolution, rotation = (3456, 4608), rng.choice( [90, 270] )
+
+        if rng.random() < PHOTO_TAG_FRACTION:
+            tags = sorted( set( rng.choices( list( PHOTO_TAG_WEIGHTS.keys() ),
+                                             weights=list( PHOTO_TAG_WEIGHTS.values() ),
+                                             k=rng.randint( 1, 2 ) ) ) )
+        else:
+            tags = []
+
+        photos_fields.append( { "filename":      "images/P{:03d}{:04d}.JPG".format( 100 + photo_number // 9999 % 900,
+                                                                                   photo_number % 9999 + 1 ),
+                                "resolution":    resolution,
+                                "rotation":      rotation,
+                                "location":      ((latitude, longitude) if rng.random() >= MISSING_LOCATION_FRACTION
+                                                  else None),
+                                "photo_time":    int( photo_time ),
+                                "created_time":  int( photo_time ) + rng.randint( 86400, 30 * 86400 ),
+                                "modified_time": int( photo_time ) + rng.randint( 30 * 86400, 60 * 86400 ),
+                                "state":         rng.choices( list( PHOTO_STATE_WEIGHTS.keys() ),
+                                                              weights=list( PHOTO_STATE_WEIGHTS.values() ) )[0],
+                                "tags":          tags } )
+
+    return photos_fields
+
+def generate_database( photo_count, seed=None ):
+    """
+    Generates a test database of synthetic, but realistic, photo and art
+    records for benchmarking.  Photos are taken on photo walks of a
+    city-sized area over several years and are followed by the art in them.
+    A few artists are prolific while most are seldom seen, and artists are
+    more likely to be seen in neighborhoods where they're active.  Types,
+    sizes, qualities, and tags follow fixed distributions, with sizes
+    depending on the type of art.
+
+    The records are generated in addition to the test database's own
+    records, and are not saved.  Use Database.save_database() with a file
+    name to write them to disk.
+
+    Takes 2 arguments:
+
+      photo_count - Number of photos to generate.  Roughly 1.8 art records
+                    are generated per photo.
+      seed        - Optional seed for the random number generator, so that
+                    the same database can be generated again.  If omitted,
+                    a different database is generated each time.
+
+    Returns 1 value:
+
+      db - Database object containing the generated records.
+
+    """
+
+    rng = random.Random( seed )
+    db  = grafdb.Database()
+
+    # create the artists.
+    artist_count = min( MAXIMUM_ARTISTS, max( MINIMUM_ARTISTS, photo_count // PHOTOS_PER_ARTIST ) )
+
+    artists = _generate_artist_names( rng, artist_count, db.get_artists() )
+    for artist in artists:
+        db.new_artist( artist )
+
+    artist_weights = [1 / (rank ** ARTIST_POPULARITY_EXPONENT) for rank in range( 1, artist_count + 1 )]
+
+    art_types           = db.get_art_types()
+    art_type_weights    = _get_weights( art_types, ART_TYPE_WEIGHTS )
+    art_sizes           = db.get_art_sizes()
+    art_size_weights    = { art_type: _get_weights( art_sizes, ART_SIZE_WEIGHTS.get( art_type, DEFAULT_SIZE_WEIGHTS ) )
+                            for art_type in art_types }
+    art_qualities       = db.get_art_qualities()
+    art_quality_weights = _get_weights( art_qualities, ART_QUALITY_WEIGHTS )
+    art_states          = db.get_processing_states()
+    art_state_weights   = _get_weights( art_states, ART_STATE_WEIGHTS )
+
+    # sizes of art relative to the photos they're in.
+    art_extents = dict( zip( art_sizes, [0.05, 0.1, 0.25, 0.5, 0.9] ) )
+
+    photo_number = 0
+    while photo_number < photo_count:
+        # walk lengths are geometrically distributed.
+        walk_length = max( MINIMUM_WALK_LENGTH,
+                           int( rng.expovariate( 1 / MEAN_WALK_LENGTH ) ) )
+        walk_length = min( walk_length, photo_count - photo_number )
+
+        photos = db.new_photo_records( _generate_walk( rng, walk_length, photo_number ) )
+
+        photo_number += walk_length
+
+        # the artists active in the walk's neighborhood.
+        local_artists = rng.choices( artists, weights=artist_weights, k=LOCAL_ARTIST_COUNT )
+
+        arts_fields = []
+        for photo in photos:
+            for _ in range( rng.choices( range( len( ART_COUNT_WEIGHTS ) ), weights=ART_COUNT_WEIGHTS )[0] ):
+                art_type = rng.choices( art_types, weights=art_type_weights )[0]
+                art_size = rng.choices( art_sizes, weights=art_size_weights[art_type] )[0]
+
+                if rng.random() < UNKNOWN_ARTIST_FRACTION:
+                    art_artists = ["Unknown"]
+                elif rng.random() < LOCAL_ARTIST_FRACTION:
+                    art_artists = [rng.choice( local_artists )]
+                else:
+                    art_artists = rng.choices( artists, weights=artist_weights )
+
+                if rng.random() < ASSOCIATES_FRACTION:
+                    associates = sorted( set( rng.choices( local_artists, k=rng.randint( 1, 2 ) ) ) - set( art_artists ) )
+                else:
+                    associates = []
+
+                if rng.random() < VANDALS_FRACTION:
+                    vandals = [rng.choice( local_artists )]
+                else:
+                    vandals = []
+
+                if rng.random() < ART_TAG_FRACTION:
+                    tags = [rng.choices( list( ART_TAG_WEIGHTS.keys() ),
+                                         weights=list( ART_TAG_WEIGHTS.values() ) )[0]]
+                else:
+                    tags = []
+
+                # place the art somewhere within the photo.
+                width  = min( 1.0, art_extents.get( art_size, 0.25 ) * rng.uniform( 0.5, 1.5 ) )
+                height = min( 1.0, art_extents.get( art_size, 0.25 ) * rng.uniform( 0.5, 1.5 ) )
+
+                arts_fields.append( { "photo_id":      photo["id"],
+                                      "type":          art_type,
+                                      "size":          art_size,
+                                      "quality":       rng.choices( art_qualities, weights=art_quality_weights )[0],
+                                      "artists":       art_artists,
+                                      "associates":    associates,
+                                      "vandals":       vandals,
+                                      "tags":          tags,
+                                      "date":          (str( rng.randint( 2005, 2017 ) ) if rng.random() < DATED_FRACTION
+                                                        else None),
+                                      "state":         rng.choices( art_states, weights=art_state_weights )[0],
+                                      "region":        (rng.uniform( 0, 1 - width ),
+                                                        rng.uniform( 0, 1 - height ),
+                                                        width,
+                                                        height),
+                                      "created_time":  photo["modified_time"],
+                                      "modified_time": photo["modified_time"] } )
+
+        db.new_art_records( arts_fields )
+
+    return db
@@ -467,6 +467,94 @@ class ArtistSelector( QWidget ):
         if self.selection_list.count() > 0:
             self.selection_list.takeItem( self.selection_list.currentRow() )
 
+class TagCompleter( QCompleter ):
+    """
+    Completer for line edits containing comma separated tags. The tag
+    currently being typed, following the last comma, is completed from
+    suggestions requested each time it is edited, while the tags preceding
+    it are left untouched.
+
+    """
+
+    def __init__( self, line_edit, suggest_tags, parent=None ):
+        """
+        Constructs a new TagCompleter and attaches it to a line edit.
+
+        Takes 3 arguments:
+
+          line_edit    - QLineEdit containing the comma separated tags.
+          suggest_tags - Callable taking a prefix and returning a list of
+                         tags beginning with it, in the order they should be
+                         suggested.
+          parent       - QObject parent of this TagCompleter.
+
+        Returns 1 value:
+
+          self - The newly created TagCompleter object.
+
+        """
+
+        super().__init__( parent )
+
+        self.suggest_tags = suggest_tags
+
+        self.tags_model = QStringListModel( self )
+        self.setModel( self.tags_model )
+        self.setCaseSensitivity( Qt.CaseInsensitive )
+
+        # NOTE: we aren't installed as the line edit's completer since it
+        #       would complete the entire line rather than the last tag.
+        #       instead we track its edits ourselves and insert whichever
+        #       suggestion is activated.
+        #
+        self.setWidget( line_edit )
+
+        line_edit.textEdited.connect( self.update_suggestions )
+        self.activated[str].connect( self.insert_tag )
+
+    @pyqtSlot( str )
+    def update_suggestions( self, text ):
+        """
+        Slot invoked whenever the line edit's text is edited. Suggests tags
+        beginning with the last tag in the text.
+
+        Takes 1 argument:
+
+          text - The line edit's new text.
+
+        Returns nothing.
+        """
+
+        prefix = text.split( "," )[-1].strip()
+
+        if len( prefix ) == 0:
+            self.popup().hide()
+            return
+
+        self.tags_model.setStringList( self.suggest_tags( prefix ) )
+        self.setCompletionPrefix( prefix )
+        self.complete()
+
+    @pyqtSlot( str )
+    def insert_tag( self, tag ):
+        """
+        Slot invoked whenever a suggested tag is activated. Replaces the last
+        tag in the line edit with it.
+
+        Takes 1 argument:
+
+          tag - The suggested tag.
+
+        Returns nothing.
+        """
+
+        preceding_tags, comma, _ = self.widget().text().rpartition( "," )
+
+        if comma:
+            self.widget().setText( preceding_tags + ", " + tag )
+        else:
+            self.widget().setText( tag )
+
 class RubberBandedWidget( QWidget ):
     """
     Adds an interactive rubberband box to a widget.
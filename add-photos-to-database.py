@@ -37,8 +37,9 @@ with open( files_list_filename, "rt" ) as f:
 
     # XXX: check for duplicates.
 
-# acquire all of the photo records so we can update/add to them.
-db     = grafdb.Database( database_filename )
+# acquire all of the photo records so we can update/add to them.  the
+# database is shared since others may be editing it while we run.
+db     = grafdb.Database( database_filename, shared=True )
 photos = db.get_photo_records()
 
 # build a map from filename to PhotoRecord so we know when we need to update
@@ -47,6 +48,10 @@ known_files = dict()
 for photo in photos:
     known_files[photo["filename"]] = photo
 
+# fields for each of the photos we need to insert.  these are inserted in
+# one go once we know them all.
+new_photos_fields = []
+
 for file_name in files_list:
     fields = dict()
 
@@ -74,9 +79,10 @@ for file_name in files_list:
         print( "'{:s}' already exists in the database, skipping.".format( file_name ) )
         continue
 
-    photo = db.new_photo_record( file_name, **fields )
+    fields["filename"] = file_name
+    new_photos_fields.append( fields )
 
-    db.mark_data_dirty()
+db.new_photo_records( new_photos_fields )
 
 # only update the database if we made changes.
 if db.are_data_dirty():
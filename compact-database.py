@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+
+# Folds a journaled database's journal back into the database, leaving a
+# single, up to date XML file behind.
+
+import sys
+
+import GraffitiAnalysis.database as grafdb
+
+if len( sys.argv ) != 2:
+    print( "Usage: {:s} <database>".format( sys.argv[0] ),
+           file=sys.stderr )
+    sys.exit( 1 )
+
+database_filename = sys.argv[1]
+
+# loading the database replays its journal, so writing it back out captures
+# everything.  the database is shared so that what others have saved since is
+# merged rather than overwritten.
+db = grafdb.Database( database_filename, journal=True, shared=True )
+db.compact_database()
@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+
+# Exports a database in the read-only, memory mapped format used by analysis
+# jobs.  See GraffitiAnalysis.database.MappedDatabase.
+
+import sys
+
+import GraffitiAnalysis.database as grafdb
+
+if len( sys.argv ) != 3:
+    print( "Usage: {:s} <database> <export>".format( sys.argv[0] ),
+           file=sys.stderr )
+    sys.exit( 1 )
+
+database_filename = sys.argv[1]
+export_filename   = sys.argv[2]
+
+# the database is shared so that it isn't read while others write it.
+db = grafdb.Database( database_filename, shared=True )
+db.export_mapped_database( export_filename )
@@ -40,7 +40,7 @@ database_filename = args[0]
 track_file_names  = args[1:]
 
 # load the database and get all of the records.
-db     = grafdb.Database( database_filename )
+db     = grafdb.Database( database_filename, shared=True )
 photos = db.get_photo_records()
 
 # create a single track DataFrame from the GPX files supplied.
@@ -338,6 +338,10 @@ class PhotoRecordViewer( RecordWindow ):
     STATE_COLUMN = 2
     NUM_COLUMNS = 3
 
+    # signal emitted when a background save of the database completes.
+    # carries the exception raised by the save, or None if it succeeded.
+    saved = pyqtSignal( object )
+
     def __init__( self, database_file_name=None ):
         """
         XXX
@@ -346,8 +350,10 @@ class PhotoRecordViewer( RecordWindow ):
         if database_file_name is None:
             database_file_name = "database.xml"
 
-        # set the state for the window.
-        self.db     = grafdb.Database( database_file_name )
+        # set the state for the window.  art records are loaded as photos are
+        # viewed since a session rarely looks at more than a handful.  the
+        # database may be edited by others at the same time.
+        self.db     = grafdb.Database( database_file_name, lazy=True, shared=True )
         self.photos = self.db.get_photo_records()
 
         # map keeping track of the open photo editor windows.  each photo
@@ -362,6 +368,10 @@ class PhotoRecordViewer( RecordWindow ):
         # XXX: specify a callback to save the database.
         super().__init__( window_size=QSize( 1024, 768 ) )
 
+        # saves complete on a worker thread.  the signal delivers their
+        # outcome back to us on the GUI thread.
+        self.saved.connect( self.database_saved )
+
         self.setWindowTitle( "Photo Record Viewer" )
         self.show()
 
@@ -592,8 +602,58 @@ class PhotoRecordViewer( RecordWindow ):
         """
         """
 
-        # save the database back to the file that we loaded it from.
-        self.db.save_database()
+        def report_save( future ):
+            self.saved.emit( None if future.cancelled() else future.exception() )
+
+        # save the database back to the file that we loaded it from without
+        # blocking the interface while it's written.  changes saved by others
+        # in the meantime are merged first, unless they touch the same
+        # records we did.
+        try:
+            self.db.save_database( background=True, callback=report_save )
+            return
+        except grafdb.DatabaseConflictError as error:
+            conflict_error = error
+
+        # ask the user if they want to overwrite the other changes.
+        confirmation_dialog = QMessageBox()
+        confirmation_dialog.setInformativeText( "{:d} photo record(s) and {:d} art record(s) were also changed "
+                                                "by someone else.  Are you sure you want to overwrite "
+                                                "their changes?".format( len( conflict_error.photo_ids ),
+                                                                         len( conflict_error.art_ids ) ) )
+        confirmation_dialog.setStandardButtons( QMessageBox.Ok | QMessageBox.Cancel )
+        confirmation_dialog.setDefaultButton( QMessageBox.Cancel )
+
+        result = confirmation_dialog.exec_()
+
+        # nothing to do if we were told this was an accident.
+        if result == QMessageBox.Cancel:
+            return
+
+        # take everything else they changed and keep our versions of the
+        # conflicting records.
+        self.db.reload_database()
+        self.db.save_database( background=True, callback=report_save )
+
+    def database_saved( self, error ):
+        """
+        Reports the outcome of a background save of the database.
+
+        Takes 1 argument:
+
+          error - Exception raised by the save, or None if the save
+                  succeeded.
+
+        Returns nothing.
+        """
+
+        if error is None:
+            print( "Saved the database." )
+            return
+
+        QMessageBox.critical( self,
+                              "Save Failed",
+                              "Failed to save the database: {:s}".format( str( error ) ) )
 
     def get_photo_id_from_selection( self ):
         """
@@ -681,6 +741,10 @@ class PhotoRecordViewer( RecordWindow ):
         """
         """
 
+        # let any save in progress finish so that we know whether it
+        # succeeded.
+        self.db.wait_for_saves()
+
         # prevent closing when we have open records.
         if len( self.photo_record_editors ) > 0:
             event.ignore()
@@ -1031,6 +1095,11 @@ class PhotoRecordEditor( RecordEditor ):
         self.photoTagsLabel    = QLabel( "Ta&gs:" )
         self.photoTagsLabel.setBuddy( self.photoTagsLineEdit )
 
+        # suggest the most popular tags as they're typed.
+        self.photoTagsCompleter = grafwidgets.TagCompleter( self.photoTagsLineEdit,
+                                                            lambda prefix: self.db.complete_tag( prefix, 50 ),
+                                                            self )
+
         # XXX: need to add
         #
         #  * description
@@ -1735,6 +1804,11 @@ class ArtRecordEditor( RecordEditor ):
         self.artTagsLabel    = QLabel( "Ta&gs:" )
         self.artTagsLabel.setBuddy( self.artTagsLineEdit )
 
+        # suggest the most popular tags as they're typed.
+        self.artTagsCompleter = grafwidgets.TagCompleter( self.artTagsLineEdit,
+                                                          lambda prefix: self.db.complete_tag( prefix, 50 ),
+                                                          self )
+
     def create_layout( self ):
         """
         Lays out the widgets within an ArtRecordEditor.
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+
+# Benchmarks loading, saving, and querying synthetic databases of increasing
+# size, and converting them into DataFrames.  Each operation is timed over
+# several runs and, optionally, run once more while tracing memory
+# allocations to measure the memory it needs (peak) and keeps (retained).
+# Results are written as JSON so that runs against different versions of the
+# code can be compared.
+#
+# Run it from anywhere within the repository, e.g.:
+#
+#   python tools/benchmark-database.py -n 10000,100000 -o results.json
+
+import getopt
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# we live beneath the repository, so make its packages importable when run
+# as a script.
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), ".." ) )
+
+import GraffitiAnalysis.analysis as grafanal
+import GraffitiAnalysis.database as grafdb
+import GraffitiAnalysis.synthetic as grafsynth
+
+# default sizes, in photos, of the databases benchmarked.
+DEFAULT_PHOTO_COUNTS = [10000, 100000, 1000000]
+
+# default number of times each operation is timed.
+DEFAULT_RUN_COUNT = 3
+
+# number of records requested by identifier, and of time windows requested,
+# per run of the lookup operations.
+LOOKUP_COUNT = 1000
+WINDOW_COUNT = 100
+
+# length, in seconds, of the time windows requested.
+WINDOW_LENGTH = 86400
+
+def usage( script_name ):
+    """
+    Takes a name of the script (full path, name, etc) and prints its usage to
+    standard error.
+
+    Takes 1 argument:
+
+      script_name - Name of the script.
+
+    Returns nothing.
+
+    """
+
+    print( "Usage: {:s} [-h] [-d <directory>] [-M] [-n <photos>[,<photos>...]] [-o <output>] [-r <runs>] [-s <seed>]".format( script_name ),
+           file=sys.stderr )
+    print( "", file=sys.stderr )
+    print( "  -d <directory>  Keep the generated databases in <directory>, reusing any already", file=sys.stderr )
+    print( "                  there, rather than in a temporary directory.", file=sys.stderr )
+    print( "  -M              Don't measure memory.  Tracing allocations is slow.", file=sys.stderr )
+    print( "  -n <photos>     Comma separated sizes of the databases benchmarked.  Defaults to", file=sys.stderr )
+    print( "                  {:s}.".format( ",".join( map( str, DEFAULT_PHOTO_COUNTS ) ) ), file=sys.stderr )
+    print( "  -o <output>     Write the results to <output> rather than standard output.", file=sys.stderr )
+    print( "  -r <runs>       Number of times each operation is timed.  Defaults to {:d}.".format( DEFAULT_RUN_COUNT ),
+           file=sys.stderr )
+    print( "  -s <seed>       Seed used to generate the databases.  Defaults to 0.", file=sys.stderr )
+
+def get_code_version():
+    """
+    Gets the version of the code being benchmarked, as described by git.
+
+    Takes no arguments.
+
+    Returns 1 value:
+
+      version - Output of "git describe", or None if it isn't available.
+
+    """
+
+    try:
+        return subprocess.check_output( ["git", "describe", "--always", "--dirty"],
+                                        cwd=os.path.dirname( os.path.abspath( grafdb.__file__ ) ),
+                                        stderr=subprocess.DEVNULL ).decode( "utf-8" ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def benchmark( function, run_count, memory_flag, setup=None ):
+    """
+    Times an operation over several runs and, optionally, measures the
+    memory it allocates.
+
+    Takes 4 arguments:
+
+      function    - Callable performing the operation.  Its return value is
+                    kept until the memory it retains has been measured.
+      run_count   - Number of times the operation is timed.
+      memory_flag - Flag specifying whether the operation is run once more
+                    while tracing memory allocations.
+      setup       - Optional callable invoked, untimed, before each run.
+
+    Returns 1 value:
+
+      results - Dictionary of the operation's results: the times of each
+                run, their minimum and median, in seconds, and, if
+                memory_flag is True, the peak and retained memory, in bytes.
+
+    """
+
+    times = []
+    for _ in range( run_count ):
+        if setup is not None:
+            setup()
+
+        start_time = time.perf_counter()
+        function()
+        times.append( time.perf_counter() - start_time )
+
+    sorted_times = sorted( times )
+    results      = { "times":  times,
+                     "min":    sorted_times[0],
+                     "median": sorted_times[len( sorted_times ) // 2] }
+
+    if memory_flag:
+        if setup is not None:
+            setup()
+
+        tracemalloc.start()
+        try:
+            start_size, _       = tracemalloc.get_traced_memory()
+            value               = function()
+            end_size, peak_size = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        results["peak_memory"]     = peak_size - start_size
+        results["retained_memory"] = end_size - start_size
+
+        del value
+
+    return results
+
+def benchmark_database( path, photo_count, seed, run_count, memory_flag ):
+    """
+    Benchmarks a synthetic database, generating it first if it doesn't
+    exist.
+
+    Takes 5 arguments:
+
+      path        - Path to the XML database.
+      photo_count - Number of photos in the database.
+      seed        - Seed used to generate the database.
+      run_count   - Number of times each operation is timed.
+      memory_flag - Flag specifying whether memory is measured.
+
+    Returns 1 value:
+
+      results - Dictionary describing the database and the results of each
+                operation benchmarked.
+
+    """
+
+    cache_path = grafdb._get_cache_filename( path )
+
+    if not os.path.exists( path ):
+        start_time = time.perf_counter()
+        db         = grafsynth.generate_database( photo_count, seed=seed )
+        db.save_database( path )
+        print( "Generated {:d} photos in {:.2f} seconds.".format( photo_count, time.perf_counter() - start_time ),
+               file=sys.stderr )
+
+        del db
+
+    def remove_cache():
+        if os.path.exists( cache_path ):
+            os.remove( cache_path )
+
+    operations = dict()
+
+    # loading parses the database, unless a snapshot cache from a previous
+    # load is available.
+    operations["load_database"]        = benchmark( lambda: grafdb.Database( path ),
+                                                    run_count,
+                                                    memory_flag,
+                                                    setup=remove_cache )
+
+    db = grafdb.Database( path )
+
+    operations["load_database_cached"] = benchmark( db.load_database,
+                                                    run_count,
+                                                    memory_flag )
+
+    # every record is written whether or not it has changed.
+    operations["save_database"]        = benchmark( db.save_database,
+                                                    run_count,
+                                                    memory_flag )
+
+    # each run requests different records so that nothing is cached
+    # between them.
+    rng           = random.Random( seed )
+    photo_ids     = [photo["id"] for photo in db.get_photo_records()]
+    photo_lookups = [rng.sample( photo_ids, min( LOOKUP_COUNT, len( photo_ids ) ) ) for _ in range( run_count + 1 )]
+    art_lookups   = [rng.sample( photo_ids, min( LOOKUP_COUNT, len( photo_ids ) ) ) for _ in range( run_count + 1 )]
+
+    photo_times = [photo["photo_time"] for photo in db.get_photo_records()]
+    windows     = [[(window_start, window_start + WINDOW_LENGTH)
+                    for window_start in [rng.uniform( min( photo_times ), max( photo_times ) )
+                                         for _ in range( WINDOW_COUNT )]]
+                   for _ in range( run_count + 1 )]
+
+    def get_photo_records():
+        return db.get_photo_records( photo_lookups.pop() )
+
+    def get_art_records():
+        return db.get_art_records( art_lookups.pop() )
+
+    def get_photo_records_by_time():
+        return [db.get_photo_records_by_time( start_time, end_time ) for start_time, end_time in windows.pop()]
+
+    operations["get_photo_records"]         = benchmark( get_photo_records, run_count, memory_flag )
+    operations["get_art_records"]           = benchmark( get_art_records, run_count, memory_flag )
+    operations["get_photo_records_by_time"] = benchmark( get_photo_records_by_time, run_count, memory_flag )
+
+    photos = db.get_photo_records()
+    arts   = db.get_art_records()
+
+    operations["photos_to_dataframe"] = benchmark( lambda: grafanal.photos_to_dataframe( photos ),
+                                                   run_count,
+                                                   memory_flag )
+
+    photos_df = grafanal.photos_to_dataframe( photos )
+
+    operations["arts_to_dataframe"]   = benchmark( lambda: grafanal.arts_to_dataframe( arts, photos_df ),
+                                                   run_count,
+                                                   memory_flag )
+
+    return { "photo_count": len( photos ),
+             "art_count":   len( arts ),
+             "file_size":   os.path.getsize( path ),
+             "operations":  operations }
+
+# parse our command line options.
+try:
+    opts, args = getopt.getopt( sys.argv[1:], "hd:Mn:o:r:s:" )
+except getopt.GetoptError as error:
+    sys.stderr.write( "Error processing option: {:s}\n".format( str( error ) ) )
+    sys.exit( 1 )
+
+directory    = None
+memory_flag  = True
+photo_counts = DEFAULT_PHOTO_COUNTS
+output_path  = None
+run_count    = DEFAULT_RUN_COUNT
+seed         = 0
+
+for opt, arg in opts:
+    if opt == "-h":
+        usage( sys.argv[0] )
+        sys.exit( 0 )
+    elif opt == "-d":
+        directory = arg
+    elif opt == "-M":
+        memory_flag = False
+    elif opt == "-n":
+        photo_counts = [int( photo_count ) for photo_count in arg.split( "," )]
+    elif opt == "-o":
+        output_path = arg
+    elif opt == "-r":
+        run_count = int( arg )
+    elif opt == "-s":
+        seed = int( arg )
+
+if len( args ) != 0:
+    usage( sys.argv[0] )
+    sys.exit( 1 )
+
+if directory is None:
+    database_directory = tempfile.mkdtemp( prefix="benchmark-database-" )
+else:
+    database_directory = directory
+    os.makedirs( database_directory, exist_ok=True )
+
+results = { "version":   get_code_version(),
+            "python":    platform.python_version(),
+            "platform":  platform.platform(),
+            "timestamp": time.strftime( "%Y-%m-%dT%H:%M:%S%z" ),
+            "seed":      seed,
+            "runs":      run_count,
+            "databases": [] }
+
+try:
+    for photo_count in photo_counts:
+        path = os.path.join( database_directory, "synthetic-{:d}-{:d}.xml".format( photo_count, seed ) )
+
+        database_results = benchmark_database( path, photo_count, seed, run_count, memory_flag )
+        results["databases"].append( database_results )
+
+        for name, operation_results in database_results["operations"].items():
+            print( "{:d} photos, {:s}: {:.3f} seconds (median){:s}.".format(
+                photo_count,
+                name,
+                operation_results["median"],
+                ", {:.1f} MB peak, {:.1f} MB retained".format( operation_results["peak_memory"] / 2**20,
+                                                               operation_results["retained_memory"] / 2**20 )
+                if memory_flag else "" ),
+                   file=sys.stderr )
+finally:
+    if directory is None:
+        shutil.rmtree( database_directory )
+
+if output_path is None:
+    json.dump( results, sys.stdout, indent=4 )
+    print()
+else:
+    with open( output_path, "w" ) as output_file:
+        json.dump( results, output_file, indent=4 )
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+
+# Benchmarks the photo location queries of a synthetic database against
+# brute force searches of every photo, verifying that both find exactly the
+# same photos.  Photos are scattered around a city-sized area so that queries
+# of a few hundred meters find a realistic number of them.
+#
+# Run it from anywhere within the repository, e.g.:
+#
+#   python tools/benchmark-spatial-index.py -n 100000
+
+import getopt
+import heapq
+import os
+import random
+import sys
+import time
+
+# we live beneath the repository, so make its packages importable when run
+# as a script.
+sys.path.insert( 0, os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), ".." ) )
+
+import GraffitiAnalysis.database as grafdb
+import GraffitiAnalysis.indexes as grafindexes
+
+# default number of photos in the synthetic database.
+DEFAULT_PHOTO_COUNT = 1000000
+
+# default number of each kind of query made.
+DEFAULT_QUERY_COUNT = 20
+
+# center and extent, in degrees, of the area photographed.
+AREA_CENTER = (37.7749, -122.4194)
+AREA_EXTENT = 0.2
+
+# parameters of the queries made.
+QUERY_DISTANCE = 200.0
+QUERY_BOX_SIZE = 0.005
+QUERY_NEAREST  = 10
+
+def usage( script_name ):
+    """
+    Takes a name of the script (full path, name, etc) and prints its usage to
+    standard error.
+
+    Takes 1 argument:
+
+      script_name - Name of the script.
+
+    Returns nothing.
+
+    """
+
+    print( "Usage: {:s} [-n <photos>] [-q <queries>] [-s <seed>]".format( script_name ),
+           file=sys.stderr )
+
+def random_location():
+    """
+    Returns a random (latitude, longitude) within the area photographed.
+    """
+
+    return (AREA_CENTER[0] + random.uniform( -AREA_EXTENT, AREA_EXTENT ) / 2,
+            AREA_CENTER[1] + random.uniform( -AREA_EXTENT, AREA_EXTENT ) / 2)
+
+def time_queries( label, queries, indexed_query, brute_force_query ):
+    """
+    Times a set of queries answered with and without the index, and verifies
+    that their results are identical.
+
+    Takes 4 arguments:
+
+      label             - Description of the queries printed with the results.
+      queries           - List of queries, each a tuple of arguments to the
+                          query functions.
+      indexed_query     - Function answering a query with the index.
+      brute_force_query - Function answering a query by examining every
+                          photo.
+
+    Returns 1 value:
+
+      matched_flag - True if both functions gave the same results for every
+                     query, False otherwise.
+
+    """
+
+    indexed_times     = []
+    brute_force_times = []
+    result_count      = 0
+    matched_flag      = True
+
+    for query in queries:
+        start_time       = time.perf_counter()
+        indexed_results  = indexed_query( *query )
+        indexed_times.append( time.perf_counter() - start_time )
+
+        start_time          = time.perf_counter()
+        brute_force_results = brute_force_query( *query )
+        brute_force_times.append( time.perf_counter() - start_time )
+
+        result_count += len( indexed_results )
+        matched_flag  = matched_flag and (indexed_results == brute_force_results)
+
+    indexed_times.sort()
+    brute_force_times.sort()
+
+    print( "{:s}: {:.1f} photos per query, {:.3f} ms indexed, {:.1f} ms brute force (medians), {:s}.".format(
+        label,
+        result_count / len( queries ),
+        indexed_times[len( queries ) // 2] * 1000,
+        brute_force_times[len( queries ) // 2] * 1000,
+        "identical" if matched_flag else "MISMATCHED" ) )
+
+    return matched_flag
+
+# parse our command line options.
+try:
+    opts, args = getopt.getopt( sys.argv[1:], "hn:q:s:" )
+except getopt.GetoptError as error:
+    sys.stderr.write( "Error processing option: {:s}\n".format( str( error ) ) )
+    sys.exit( 1 )
+
+photo_count = DEFAULT_PHOTO_COUNT
+query_count = DEFAULT_QUERY_COUNT
+seed        = 0
+
+for opt, arg in opts:
+    if opt == "-h":
+        usage( sys.argv[0] )
+        sys.exit( 0 )
+    elif opt == "-n":
+        photo_count = int( arg )
+    elif opt == "-q":
+        query_count = int( arg )
+    elif opt == "-s":
+        seed = int( arg )
+
+random.seed( seed )
+
+# build an in-memory database of photos, leaving some without a location.
+db = grafdb.Database()
+
+start_time = time.perf_counter()
+photos     = db.new_photo_records( [{ "filename": "photo{:d}.jpg".format( photo_number ),
+                                      "location": random_location() if photo_number % 20 else None }
+                                    for photo_number in range( photo_count )] )
+print( "Created {:d} photos in {:.2f} seconds.".format( photo_count, time.perf_counter() - start_time ) )
+
+start_time = time.perf_counter()
+db.get_nearest_photo_records( AREA_CENTER, 1 )
+print( "Indexed locations in {:.2f} seconds.".format( time.perf_counter() - start_time ) )
+
+located_photos = [photo for photo in photos if photo["location"] is not None]
+
+def brute_force_bbox( south, west, north, east ):
+    return [photo for photo in located_photos
+            if south <= photo["location"][0] <= north and west <= photo["location"][1] <= east]
+
+def brute_force_within( location, distance ):
+    photo_distances = [(grafindexes.haversine_distance( location, photo["location"] ), photo)
+                       for photo in located_photos]
+
+    return sorted( [(photo_distance, photo) for photo_distance, photo in photo_distances
+                    if photo_distance <= distance],
+                   key=lambda photo_distance: (photo_distance[0], photo_distance[1]["id"]) )
+
+def brute_force_nearest( location, count ):
+    photo_distances = [(grafindexes.haversine_distance( location, photo["location"] ), photo)
+                       for photo in located_photos]
+
+    return heapq.nsmallest( count,
+                            photo_distances,
+                            key=lambda photo_distance: (photo_distance[0], photo_distance[1]["id"]) )
+
+bbox_queries = []
+for _ in range( query_count ):
+    south, west = random_location()
+    bbox_queries.append( (south, west, south + QUERY_BOX_SIZE, west + QUERY_BOX_SIZE) )
+
+matched_flag = time_queries( "Bounding box ({:g} degrees)".format( QUERY_BOX_SIZE ),
+                             bbox_queries,
+                             db.get_photo_records_in_bbox,
+                             brute_force_bbox )
+
+matched_flag &= time_queries( "Radius ({:g} m)".format( QUERY_DISTANCE ),
+                              [(random_location(), QUERY_DISTANCE) for _ in range( query_count )],
+                              lambda location, distance: db.get_photo_records_within( location, distance, return_distances=True ),
+                              brute_force_within )
+
+matched_flag &= time_queries( "Nearest {:d}".format( QUERY_NEAREST ),
+                              [(random_location(), QUERY_NEAREST) for _ in range( query_count )],
+                              lambda location, count: db.get_nearest_photo_records( location, count, return_distances=True ),
+                              brute_force_nearest )
+
+# move some photos and make sure the index follows them.
+for photo in random.sample( located_photos, min( 1000, len( located_photos ) ) ):
+    photo["location"] = random_location()
+
+matched_flag &= time_queries( "Radius after moving photos",
+                              [(random_location(), QUERY_DISTANCE) for _ in range( query_count )],
+                              lambda location, distance: db.get_photo_records_within( location, distance, return_distances=True ),
+                              brute_force_within )
+
+sys.exit( 0 if matched_flag else 1 )